@@ -156,6 +156,45 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # Redis Configuration
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+# Redis used by the quiz app; 'local://' keeps data in-process (tests, benchmarks)
+QUIZ_REDIS_URL = os.environ.get('QUIZ_REDIS_URL', REDIS_URL)
+
+# Shared Django cache (answer keys, catalog responses; see quiz/cache.py).
+# CACHE_URL: redis://host:port/db for production, file:///path/to/dir or
+# locmem:// (per-process, the default) for local runs.
+CACHE_URL = os.environ.get('CACHE_URL', 'locmem://')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    _cache_backend = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}
+elif CACHE_URL.startswith('file://'):
+    _cache_backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': CACHE_URL[len('file://'):]}
+else:
+    _cache_backend = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'exam-engine'}
+CACHES = {'default': {**_cache_backend, 'KEY_PREFIX': 'exam-engine'}}
+
+# Cached catalog responses (seconds); tags invalidate them earlier on admin edits
+QUIZ_CACHE_TIMEOUT = int(os.environ.get('QUIZ_CACHE_TIMEOUT', 60 * 15))
+
+# Write-behind answer buffering (see quiz/answer_buffer.py for crash-safety notes)
+# When enabled, run `python manage.py flush_answer_buffer --loop` alongside the web workers.
+QUIZ_ANSWER_WRITE_BEHIND = os.environ.get('QUIZ_ANSWER_WRITE_BEHIND', 'False') == 'True'
+QUIZ_ANSWER_BUFFER_TTL = int(os.environ.get('QUIZ_ANSWER_BUFFER_TTL', 60 * 60 * 24))
+
+# Answer key cache used for grading (see quiz/answer_key.py)
+# LRU_SIZE: exams kept in each worker's memory
+# LOCAL_TTL: seconds a worker trusts its copy before re-checking the shared version
+QUIZ_ANSWER_KEY_LRU_SIZE = int(os.environ.get('QUIZ_ANSWER_KEY_LRU_SIZE', 256))
+QUIZ_ANSWER_KEY_LOCAL_TTL = int(os.environ.get('QUIZ_ANSWER_KEY_LOCAL_TTL', 5))
+
+# Global leaderboard store (see quiz/rankings.py): 'database' or 'redis'
+QUIZ_GLOBAL_RANKING_BACKEND = os.environ.get('QUIZ_GLOBAL_RANKING_BACKEND', 'database')
+
+# Regrade past answers in a background thread when an answer key is corrected
+# (see quiz/regrade.py); turn off for bulk imports and run `manage.py regrade`
+QUIZ_AUTO_REGRADE = os.environ.get('QUIZ_AUTO_REGRADE', 'True') == 'True'
+
+# Similar-question TF-IDF index (see quiz/similarity.py); build it with
+# `manage.py build_similarity_index`. Workers on a host share it through mmap.
+QUIZ_SIMILARITY_DIR = os.environ.get('QUIZ_SIMILARITY_DIR', os.path.join(BASE_DIR, 'similarity_index'))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
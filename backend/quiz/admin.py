@@ -1,8 +1,19 @@
 
 
-from django.contrib import admin
-from .models import Exam, Question, Answer, UserAnswer, Category, SubCategory, ContactMessage
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.db.models import Q
+from django.urls import path
+
+from .models import Exam, Question, Answer, UserAnswer, ExamAttempt, QuestionStats, Category, SubCategory, ContactMessage
 from .ai import generate_questions_from_pdf
+from . import search
+
+ADMIN_SEARCH_LIMIT = 500
 
 
 @admin.action(description='Generate questions from PDF using AI')
@@ -16,6 +27,10 @@ def generate_questions(modeladmin, request, queryset):
                 modeladmin.message_user(request, f"Error generating questions for {exam.title}: {str(e)}", level='ERROR')
 
 
+class AnswerSheetForm(forms.Form):
+    sheet = forms.FileField(help_text='CSV with columns candidate, name, email, 1, 2, 3, ... (one row per candidate)')
+
+
 class AnswerInline(admin.TabularInline):
     model = Answer
     extra = 1
@@ -145,6 +160,49 @@ class ExamAdmin(admin.ModelAdmin):
     
     inlines = [QuestionInline]
     actions = [generate_questions]
+    change_form_template = 'admin/quiz/exam/change_form.html'
+
+    def get_urls(self):
+        urls = [
+            path(
+                '<int:exam_id>/import-sheet/',
+                self.admin_site.admin_view(self.import_sheet_view),
+                name='quiz_exam_import_sheet',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def import_sheet_view(self, request, exam_id):
+        from .offline_import import SheetError, import_sheet
+
+        exam = get_object_or_404(Exam, pk=exam_id)
+        if not self.has_change_permission(request, exam):
+            return redirect('admin:quiz_exam_changelist')
+
+        form = AnswerSheetForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            lines = io.TextIOWrapper(form.cleaned_data['sheet'].file, encoding='utf-8-sig', newline='')
+            try:
+                summary = import_sheet(exam.id, lines)
+            except (SheetError, UnicodeDecodeError) as e:
+                form.add_error('sheet', str(e))
+            else:
+                self.message_user(
+                    request,
+                    f"Imported {summary['imported']} candidates ({summary['skipped']} already imported) "
+                    f"in {summary['seconds']:.1f}s.",
+                    level=messages.SUCCESS,
+                )
+                return redirect('admin:quiz_exam_change', exam.id)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'original': exam,
+            'title': f'Import answer sheet: {exam.title}',
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/quiz/exam/import_sheet.html', context)
 
     def save_model(self, request, obj, form, change):
         import traceback
@@ -189,6 +247,15 @@ class QuestionAdmin(admin.ModelAdmin):
 
     inlines = [AnswerInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        # Question text goes through the full-text index instead of an
+        # icontains scan; exam titles still match as substrings.
+        if not search.tokenize(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        hits = search.search_questions(search_term, limit=ADMIN_SEARCH_LIMIT, published_only=False)
+        matches = Q(id__in=[question_id for question_id, _ in hits]) | Q(exam__title__icontains=search_term)
+        return queryset.filter(matches), False
+
 
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
@@ -205,6 +272,23 @@ class UserAnswerAdmin(admin.ModelAdmin):
     readonly_fields = ('answered_at',)
 
 
+@admin.register(ExamAttempt)
+class ExamAttemptAdmin(admin.ModelAdmin):
+    list_display = ('session_id', 'exam', 'user', 'state', 'started_at', 'finished_at')
+    list_filter = ('state', 'started_at', 'exam')
+    search_fields = ('session_id', 'user__username', 'exam__title')
+    readonly_fields = ('started_at', 'finished_at')
+    raw_id_fields = ('user',)
+
+
+@admin.register(QuestionStats)
+class QuestionStatsAdmin(admin.ModelAdmin):
+    list_display = ('question', 'exam', 'attempts', 'p_value', 'point_biserial', 'computed_at')
+    list_filter = ('exam',)
+    search_fields = ('question__question_text',)
+    readonly_fields = [f.name for f in QuestionStats._meta.fields]
+
+
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
     """Admin interface for viewing and managing contact support messages"""
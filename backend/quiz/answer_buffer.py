@@ -0,0 +1,147 @@
+"""
+Optional write-behind buffering of in-progress answers.
+
+With QUIZ_ANSWER_WRITE_BEHIND enabled, submit_answer writes each click into a
+per-session Redis hash (question id -> selection) instead of PostgreSQL. The
+hash is flushed to UserAnswer with a single bulk upsert:
+
+  * on submit_exam, before grading;
+  * on a timer, by `python manage.py flush_answer_buffer --loop`;
+  * before eviction: every buffered session is listed in a "dirty" set and
+    the timer flushes it long before its hash reaches QUIZ_ANSWER_BUFFER_TTL.
+
+Crash safety
+------------
+  * A Redis crash loses answers clicked since the last flush, unless Redis
+    persistence (AOF with appendfsync everysec) is enabled, in which case at
+    most about one second is lost. Submitted exams are never affected: grading
+    always reads UserAnswer after flushing.
+  * A worker crash during a flush loses nothing. The hash is first renamed to a
+    "flushing" key and only deleted after the database transaction commits;
+    any leftover flushing key is written again by the next flush. Replays are
+    harmless because the flush is an upsert on (attempt, question).
+  * Redis must not evict these keys under memory pressure: use the
+    `noeviction` or a `volatile-*` maxmemory policy and size the timer well
+    below the TTL.
+
+Submitted sessions
+------------------
+Every click carries its time. A flush drops clicks made before the session's
+latest submission: they belong to a paper that is already graded (a timer
+flush can race with submit_exam, which flushes the same hash first), and
+writing them would open a fresh attempt full of stale answers. Clicks after
+a submission start a retake, as they do without buffering.
+
+If Redis is unreachable, submit_answer falls back to a direct database write.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .grading import open_attempt
+from .kv import get_redis, ResponseError
+from .models import ExamAttempt, UserAnswer
+
+ENABLED = getattr(settings, 'QUIZ_ANSWER_WRITE_BEHIND', False)
+BUFFER_TTL = getattr(settings, 'QUIZ_ANSWER_BUFFER_TTL', 60 * 60 * 24)
+
+DIRTY_KEY = 'quiz:answers:dirty'
+
+
+def _buffer_key(exam_id, session_id):
+    return f'quiz:answers:{exam_id}:{session_id}'
+
+
+def _flushing_key(exam_id, session_id):
+    return f'quiz:answers:flushing:{exam_id}:{session_id}'
+
+
+def buffer_answer(exam_id, session_id, question_id, answer_id, text_answer, is_correct):
+    """Records one graded selection in Redis. Later clicks overwrite earlier ones."""
+    key = _buffer_key(exam_id, session_id)
+    # One round trip (MULTI/EXEC) instead of three
+    get_redis().pipeline().hset(
+        key, question_id, json.dumps([answer_id, is_correct, text_answer, time.time()])
+    ).expire(key, BUFFER_TTL).sadd(DIRTY_KEY, f'{exam_id}:{session_id}').execute()
+
+
+def _write(exam_id, session_id, entries):
+    submitted_at = ExamAttempt.objects.filter(
+        exam_id=exam_id, session_id=session_id, state='submitted'
+    ).aggregate(latest=Max('finished_at'))['latest']
+    # Entries buffered by older workers carry no click time and are kept
+    cutoff = submitted_at.timestamp() if submitted_at else None
+    rows = []
+    for question_id, payload in entries.items():
+        answer_id, is_correct, text_answer, *clicked_at = json.loads(payload)
+        if cutoff is not None and clicked_at and clicked_at[0] <= cutoff:
+            continue
+        rows.append(UserAnswer(
+            exam_id=exam_id,
+            session_id=session_id,
+            question_id=int(question_id),
+            selected_answer_id=answer_id,
+            text_answer=text_answer or '',
+            is_correct=is_correct,
+        ))
+    if not rows:
+        return 0
+    attempt = open_attempt(exam_id, session_id)
+    for row in rows:
+        row.attempt = attempt
+    UserAnswer.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['attempt', 'question'],
+        update_fields=['exam', 'selected_answer', 'text_answer', 'is_correct'],
+    )
+    return len(rows)
+
+
+def flush_session(exam_id, session_id):
+    """
+    Moves every buffered answer for one session into UserAnswer.
+    Returns the number of answers written.
+    """
+    client = get_redis()
+    live = _buffer_key(exam_id, session_id)
+    flushing = _flushing_key(exam_id, session_id)
+    written = 0
+
+    # Two passes: the first may only replay a flush left behind by a crash,
+    # the second then picks up everything clicked since.
+    for _ in range(2):
+        if not client.exists(flushing):
+            try:
+                client.rename(live, flushing)
+            except ResponseError:
+                break  # nothing buffered
+        entries = client.hgetall(flushing)
+        if entries:
+            with transaction.atomic():
+                written += _write(exam_id, session_id, entries)
+        client.delete(flushing)
+
+    # Remove first and re-add if needed, so a click racing with the flush
+    # can never leave a buffered session out of the dirty set.
+    member = f'{exam_id}:{session_id}'
+    client.srem(DIRTY_KEY, member)
+    if client.exists(live, flushing):
+        client.sadd(DIRTY_KEY, member)
+    return written
+
+
+def flush_all():
+    """Flushes every dirty session. Returns (sessions, answers) written."""
+    client = get_redis()
+    sessions = 0
+    answers = 0
+    for member in client.smembers(DIRTY_KEY):
+        exam_id, session_id = member.split(':', 1)
+        answers += flush_session(int(exam_id), session_id)
+        sessions += 1
+    return sessions, answers
+
@@ -0,0 +1,185 @@
+"""
+Per-exam answer keys used by the grading hot paths.
+
+An answer key is a compact, read-only map of
+question id -> (correct answer ids, points, valid option ids)
+built once from the Question/Answer tables. Keys are held in a small
+process-local LRU backed by the shared Django cache, and every exam has a
+version counter in the shared cache that is bumped whenever an admin edits
+the exam, one of its questions or one of their answers (see signals.py).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Exam, Question, Answer
+
+
+# Bump when the pickled AnswerKey layout changes so old entries are ignored.
+KEY_FORMAT = 1
+
+LRU_SIZE = getattr(settings, 'QUIZ_ANSWER_KEY_LRU_SIZE', 256)
+LOCAL_TTL = getattr(settings, 'QUIZ_ANSWER_KEY_LOCAL_TTL', 5)
+SHARED_TIMEOUT = getattr(settings, 'QUIZ_ANSWER_KEY_TIMEOUT', 60 * 60 * 24)
+
+
+class AnswerKey:
+    """
+    Immutable answer key for one exam.
+
+    `entries` maps question_id -> (correct_ids, points, option_ids), where
+    both id collections are small tuples (usually four options).
+    """
+    __slots__ = ('exam_id', 'version', 'entries', 'max_points')
+
+    def __init__(self, exam_id, version, entries):
+        self.exam_id = exam_id
+        self.version = version
+        self.entries = entries
+        self.max_points = sum(points for _, points, _ in entries.values())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, question_id):
+        return question_id in self.entries
+
+    def is_valid_option(self, question_id, answer_id):
+        entry = self.entries.get(question_id)
+        return entry is not None and answer_id in entry[2]
+
+    def is_correct(self, question_id, answer_id):
+        entry = self.entries.get(question_id)
+        return entry is not None and answer_id in entry[0]
+
+    def score(self, selections):
+        """
+        Grades an iterable of (question_id, answer_id) pairs.
+        Returns (correct_answers, score) without touching the database.
+        """
+        correct = 0
+        score = 0
+        entries = self.entries
+        for question_id, answer_id in selections:
+            entry = entries.get(question_id)
+            if entry is not None and answer_id in entry[0]:
+                correct += 1
+                score += entry[1]
+        return correct, score
+
+
+# ---------------------------------
+# SHARED CACHE KEYS & VERSIONING
+# ---------------------------------
+def _version_key(exam_id):
+    return f'quiz:answer_key:{exam_id}:version'
+
+
+def _data_key(exam_id, version):
+    return f'quiz:answer_key:{exam_id}:f{KEY_FORMAT}:v{version}'
+
+
+def _current_version(exam_id):
+    version = cache.get(_version_key(exam_id))
+    if version is None:
+        # Seed with a timestamp rather than 1 so a version key that was
+        # evicted from the shared cache can never collide with an old one.
+        cache.add(_version_key(exam_id), int(time.time() * 1000), timeout=None)
+        version = cache.get(_version_key(exam_id))
+    return version
+
+
+# ---------------------------------
+# PROCESS-LOCAL LRU
+# ---------------------------------
+_local = OrderedDict()  # exam_id -> (AnswerKey, checked_at)
+_lock = threading.Lock()
+
+
+def _remember(key):
+    with _lock:
+        _local[key.exam_id] = (key, time.monotonic())
+        _local.move_to_end(key.exam_id)
+        while len(_local) > LRU_SIZE:
+            _local.popitem(last=False)
+
+
+def build_answer_key(exam_id, version=None, published_only=True):
+    """
+    Loads the answer key for an exam straight from the DB.
+    Returns None if the exam is not available to students, unless
+    published_only is False (archival and analytics jobs).
+    """
+    exams = Exam.objects.filter(pk=exam_id)
+    if published_only:
+        exams = exams.filter(is_active=True, status='published')
+    if not exams.exists():
+        return None
+
+    # Questions without options (e.g. short answer) can never be auto-graded
+    # correct, but still count towards the exam's total.
+    entries = {
+        question_id: ((), points, ())
+        for question_id, points in Question.objects.filter(exam_id=exam_id)
+        .order_by('order', 'id').values_list('id', 'points')
+    }
+
+    rows = Answer.objects.filter(question__exam_id=exam_id).values_list(
+        'question_id', 'id', 'is_correct'
+    ).order_by('order', 'id')
+
+    for question_id, answer_id, is_correct in rows:
+        correct_ids, points, option_ids = entries[question_id]
+        if is_correct:
+            correct_ids += (answer_id,)
+        entries[question_id] = (correct_ids, points, option_ids + (answer_id,))
+
+    return AnswerKey(exam_id, version, entries)
+
+
+def get_answer_key(exam_id):
+    """
+    Returns the current AnswerKey for an exam, or None if the exam is not
+    published. Served from the local LRU when fresh; otherwise from the
+    shared cache; otherwise rebuilt from the database.
+    """
+    exam_id = int(exam_id)
+    with _lock:
+        hit = _local.get(exam_id)
+        if hit is not None:
+            _local.move_to_end(exam_id)
+
+    if hit is not None and time.monotonic() - hit[1] < LOCAL_TTL:
+        return hit[0]
+
+    version = _current_version(exam_id)
+    if hit is not None and hit[0].version == version:
+        _remember(hit[0])
+        return hit[0]
+
+    key = cache.get(_data_key(exam_id, version))
+    if key is None:
+        key = build_answer_key(exam_id, version)
+        if key is None:
+            return None
+        cache.set(_data_key(exam_id, version), key, timeout=SHARED_TIMEOUT)
+
+    _remember(key)
+    return key
+
+
+def invalidate_answer_key(exam_id):
+    """
+    Moves the exam to a new key version. Other processes pick it up once
+    their local entry is older than QUIZ_ANSWER_KEY_LOCAL_TTL seconds.
+    """
+    exam_id = int(exam_id)
+    with _lock:
+        _local.pop(exam_id, None)
+    try:
+        cache.incr(_version_key(exam_id))
+    except ValueError:
+        cache.set(_version_key(exam_id), int(time.time() * 1000), timeout=None)
@@ -3,37 +3,162 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Sum
-from django.db import models 
+from django.http import Http404
+from django.db.models import Count, Exists, Max, OuterRef
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+import hashlib
 from django.contrib.auth.models import User
 
 from .ai import generate_explanation_for_question, parse_exam_paper_with_ai
+from .answer_key import get_answer_key
+from .grading import SubmissionError, open_attempt, submit_attempt
+from .packing import attempt_answers
+from . import leaderboard as leaderboard_store
+from . import histograms, mastery, rankings
+from . import user_stats
+from . import answer_buffer
+from . import cache as quiz_cache
+from . import search as question_search
+from . import similarity
+from . import practice
+from . import shuffling
+from .assembly import BlueprintError, assemble_exam
+from .kv import RedisError
+from .pagination import KeysetPagination
 
-from .models import Exam, Question, Answer, UserAnswer, UserExamResult, Category, SubCategory
+from .models import Exam, Question, UserAnswer, UserExamResult, Category, SubCategory
 from .serializers import (
     ExamSerializer,
     QuestionSerializer,
+    QuestionBankSerializer,
     UserAnswerSerializer,
     ExamResultSerializer,
     CategorySerializer,
     SubCategorySerializer,
+    sparse_queryset,
 )
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CachedReadMixin:
+    """
+    Serves list / retrieve responses from the tag-versioned cache
+    (quiz/cache.py). Both depend on the whole catalog; exam-scoped data
+    such as exam details and questions are tagged with the exam instead.
+    """
+    cache_name = None
+
+    def cache_params(self, request, **kwargs):
+        return {**request.query_params.dict(), **kwargs, 'host': request.get_host()}
+
+    def list(self, request, *args, **kwargs):
+        data = quiz_cache.cached(
+            f'{self.cache_name}:list', [quiz_cache.CATALOG], self.cache_params(request),
+            lambda: super(CachedReadMixin, self).list(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+    def retrieve_tags(self, **kwargs):
+        return [quiz_cache.CATALOG]
+
+    def retrieve(self, request, *args, **kwargs):
+        data = quiz_cache.cached(
+            f'{self.cache_name}:detail', self.retrieve_tags(**kwargs), self.cache_params(request, **kwargs),
+            lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+
+class ConditionalReadMixin:
+    """
+    ETag / Last-Modified on list and retrieve, checked before anything is
+    serialized. Validators are one aggregate (Max('updated_at'), row count)
+    over the filtered queryset plus the versions of the response's cache
+    tags, which move on every edit signals.py sees (including questions and
+    answers, which have no updated_at). Matching If-None-Match /
+    If-Modified-Since requests get a 304.
+    """
+    list_cache_control = {'public': True, 'max_age': 60}
+    detail_cache_control = {'public': True, 'max_age': 60}
+
+    def validator_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def conditional_response(self, request, queryset, tags, cache_control, respond, lookup=None):
+        try:
+            validators = queryset.filter(**(lookup or {})).aggregate(last=Max('updated_at'), rows=Count('pk'))
+        except (TypeError, ValueError):
+            return respond()  # malformed lookup: let the view answer 404
+        if not validators['rows']:
+            return respond()  # 404 or an empty page: nothing worth validating
+
+        versions = quiz_cache.tag_versions(tags)
+        last_modified = max([validators['last'].timestamp()] + [version / 1000 for version in versions])
+        fingerprint = f"{request.get_host()}|{request.get_full_path()}|{validators['last']}|{validators['rows']}|{versions}"
+        etag = quote_etag(hashlib.blake2b(fingerprint.encode(), digest_size=12).hexdigest())
+
+        response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+        if response is None:
+            response = respond()
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, **cache_control)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.validator_queryset(), [quiz_cache.CATALOG], self.list_cache_control,
+            lambda: super(ConditionalReadMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.conditional_response(
+            request, self.validator_queryset(), self.retrieve_tags(**kwargs), self.detail_cache_control,
+            lambda: super(ConditionalReadMixin, self).retrieve(request, *args, **kwargs),
+            lookup={self.lookup_field: kwargs[lookup_url_kwarg]},
+        )
+
+
+class SparseFieldsViewMixin:
+    """
+    ?fields= / ?omit= on list and retrieve (see serializers.SparseFieldsMixin):
+    columns the response does not include are deferred in the queryset.
+    """
+    sparse_keep = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = sparse_queryset(queryset, self.get_serializer(), keep=self.sparse_keep)
+        return queryset
+
+
+class CategoryViewSet(ConditionalReadMixin, CachedReadMixin, SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing all active categories with exam counts.
     """
+    cache_name = 'categories'
+    list_cache_control = detail_cache_control = {'public': True, 'max_age': 300}
     queryset = Category.objects.filter(is_active=True).prefetch_related('subcategories')
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
     lookup_field = 'slug'
 
 
-class SubCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class SubCategoryViewSet(ConditionalReadMixin, CachedReadMixin, SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing subcategories, optionally filtered by category slug.
     """
+    cache_name = 'subcategories'
+    list_cache_control = detail_cache_control = {'public': True, 'max_age': 300}
     queryset = SubCategory.objects.filter(is_active=True).select_related('category')
     serializer_class = SubCategorySerializer
     permission_classes = [AllowAny]
@@ -47,18 +172,32 @@ class SubCategoryViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
-class ExamViewSet(viewsets.ReadOnlyModelViewSet):
+# Seconds a client waits before submitting again when the answer buffer is down
+SUBMIT_RETRY_AFTER = 5
+
+
+class ExamViewSet(ConditionalReadMixin, CachedReadMixin, SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing and retrieving published exams.
     """
-    queryset = Exam.objects.filter(is_active=True, status='published').annotate(
-        question_count=Count('questions')
-    ).select_related('subcategory__category')
+    cache_name = 'exams'
+    queryset = Exam.objects.filter(is_active=True, status='published').select_related('subcategory__category')
     serializer_class = ExamSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    sparse_keep = (KeysetPagination.date_field,)
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = self._filter_exams(super().get_queryset())
+        if self.action in ('list', 'retrieve') and 'question_count' in self.get_serializer().fields:
+            queryset = queryset.annotate(question_count=Count('questions'))
+        return queryset
+
+    def validator_queryset(self):
+        # Same rows without the question_count join
+        return self._filter_exams(Exam.objects.filter(is_active=True, status='published'))
+
+    def _filter_exams(self, queryset):
         category_slug = self.request.query_params.get('category')  # e.g. 'ssc'
         subcategory_slug = self.request.query_params.get('subcategory')  # e.g. 'ssc-cgl'
         
@@ -69,6 +208,10 @@ class ExamViewSet(viewsets.ReadOnlyModelViewSet):
             
         return queryset
 
+    def retrieve_tags(self, pk=None, **kwargs):
+        # Details repeat category and subcategory names, so also 'catalog'
+        return [quiz_cache.CATALOG, quiz_cache.tag('exam', pk)]
+
     # -------------------------------------------------
     # PARSE EXAM PDF (AI)
     # -------------------------------------------------
@@ -109,29 +252,59 @@ class ExamViewSet(viewsets.ReadOnlyModelViewSet):
     # -------------------------------------------------
     @action(detail=True, methods=['get'])
     def questions(self, request, pk=None):
-        exam = self.get_object()
-        questions = exam.questions.all().prefetch_related('answers')
+        # Always revalidated: a corrected question must show up immediately
+        return self.conditional_response(
+            request, self.validator_queryset(), [quiz_cache.tag('exam', pk)],
+            {'public': True, 'no_cache': True},
+            lambda: self._questions(request, pk),
+            lookup={'pk': pk},
+        )
 
-        serializer = QuestionSerializer(
-            questions,
-            many=True,
-            context={
+    def _questions(self, request, pk):
+        # One cached payload for all sessions; ?session_id= only picks the order
+        params = self.cache_params(request, pk=pk)
+        session_id = params.pop('session_id', None)
+
+        def build():
+            exam = self.get_object()
+            context = {
                 'request': request,
                 'hide_correct': True
             }
-        )
-        return Response(serializer.data)
+            # ?fields= / ?omit=: unrequested columns (e.g. explanation) are not fetched
+            sparse = QuestionSerializer(context=context)
+            questions = sparse_queryset(exam.questions.all(), sparse)
+            if 'answers' in sparse.fields:
+                questions = questions.prefetch_related('answers')
+
+            serializer = QuestionSerializer(
+                questions,
+                many=True,
+                context=context
+            )
+            return {'questions': serializer.data, 'pinned': shuffling.pinned_questions(serializer.data)}
+
+        # ':v2': entries used to be the bare list
+        payload = quiz_cache.cached('exams:questions:v2', [quiz_cache.tag('exam', pk)], params, build)
+        data = payload['questions']
+        if session_id:
+            # Per-session order (see quiz/shuffling.py); answers are graded by id
+            data = shuffling.shuffle_questions(data, shuffling.seed_for(session_id, pk), payload['pinned'])
+        return Response(data)
 
     # -------------------------------------------------
     # SUBMIT ANSWER
     # -------------------------------------------------
     @action(detail=True, methods=['post'])
     def submit_answer(self, request, pk=None):
-        exam = self.get_object()
+        # Graded against the cached answer key: no Exam/Question/Answer reads.
+        key = get_answer_key(pk)
+        if key is None:
+            raise Http404
 
         session_id = request.data.get('session_id')
-        question_id = request.data.get('question_id')
-        answer_id = request.data.get('answer_id')
+        question_id = _to_int(request.data.get('question_id'))
+        answer_id = _to_int(request.data.get('answer_id'))
         text_answer = request.data.get('text_answer', '')
 
         if not session_id:
@@ -140,32 +313,58 @@ class ExamViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        question = get_object_or_404(Question, id=question_id, exam=exam)
+        if question_id not in key:
+            raise Http404
 
-        selected_answer = None
         is_correct = False
 
         if answer_id:
-            selected_answer = get_object_or_404(
-                Answer,
-                id=answer_id,
-                question=question
-            )
-            is_correct = selected_answer.is_correct
+            if not key.is_valid_option(question_id, answer_id):
+                raise Http404
+            is_correct = key.is_correct(question_id, answer_id)
+
+        if answer_buffer.ENABLED:
+            try:
+                answer_buffer.buffer_answer(
+                    key.exam_id, session_id, question_id, answer_id, text_answer, is_correct
+                )
+                return Response({
+                    'id': None,
+                    'question': question_id,
+                    'selected_answer': answer_id,
+                    'text_answer': text_answer,
+                    'is_correct': is_correct,
+                    'answered_at': None,
+                    'buffered': True,
+                })
+            except RedisError as e:
+                print(f"Answer buffer unavailable, writing directly: {e}")
+
+        user = request.user if request.user.is_authenticated else None
+        attempt = open_attempt(key.exam_id, session_id, user)
 
         user_answer, _ = UserAnswer.objects.update_or_create(
-            session_id=session_id,
-            question=question,
+            attempt=attempt,
+            question_id=question_id,
             defaults={
-                'exam': exam,
-                'selected_answer': selected_answer,
+                'exam_id': key.exam_id,
+                'session_id': session_id,
+                'selected_answer_id': answer_id or None,
                 'text_answer': text_answer,
                 'is_correct': is_correct
             }
         )
 
-        serializer = UserAnswerSerializer(user_answer)
-        return Response(serializer.data)
+        # Plain fields only; the full UserAnswerSerializer would re-read the
+        # question and its answers for every click.
+        return Response({
+            'id': user_answer.id,
+            'question': question_id,
+            'selected_answer': user_answer.selected_answer_id,
+            'text_answer': user_answer.text_answer,
+            'is_correct': is_correct,
+            'answered_at': user_answer.answered_at,
+        })
 
 
     @action(detail=True, methods=['post'], permission_classes=[AllowAny])
@@ -183,68 +382,50 @@ class ExamViewSet(viewsets.ReadOnlyModelViewSet):
             guest_name = request.data.get("name", "Guest")
             guest_email = request.data.get("email", "")
 
-            print(f"SUBMIT EXAM: User={user}, Session={session_id}, Guest={guest_name}")
-
             if not session_id:
                 return Response(
                     {'error': 'Session ID required.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Quick: Calculate answers from DB
-            user_answers = UserAnswer.objects.filter(exam=exam, session_id=session_id)
-            total_questions = exam.questions.count()
-            correct_answers = user_answers.filter(is_correct=True).count()
-            
-            # SANITY CHECK: Remove duplicates if they exist
-            if user:
-                existing_results = UserExamResult.objects.filter(user=user, exam=exam)
-            else:
-                # For guests, check by session_id to avoid duplicates for same session
-                existing_results = UserExamResult.objects.filter(session_id=session_id, exam=exam)
-                
-            if existing_results.count() > 1:
-                print(f"Found duplicate results for {user or session_id}. Cleaning up...")
-                existing_results.delete()
-
-            # Calculate Score
-            score = user_answers.filter(is_correct=True).aggregate(
-                total=models.Sum('question__points')
-            )['total'] or 0
-
-            # Create Result
-            defaults = {
-                'score': score,
-                'total_questions': total_questions,
-                'correct_answers': correct_answers,
-                'percentage': round((correct_answers / total_questions * 100) if total_questions > 0 else 0, 2),
-                'guest_name': guest_name if not user else None,
-                'guest_email': guest_email if not user else None,
-            }
-            
-            if user:
-                result, created = UserExamResult.objects.update_or_create(
-                    user=user,
-                    exam=exam,
-                    defaults={**defaults, 'session_id': session_id}
-                )
-            else:
-                # For guests, we rely on session_id + exam to identify the attempt
-                result, created = UserExamResult.objects.update_or_create(
-                    session_id=session_id,
-                    exam=exam,
-                    defaults={**defaults, 'user': None}
-                )
+            if answer_buffer.ENABLED:
+                try:
+                    answer_buffer.flush_session(exam.id, session_id)
+                except RedisError as e:
+                    # Grading without the buffered clicks would store a result
+                    # that misses answers; ask the client to try again instead.
+                    print(f"Answer buffer unavailable, submission deferred: {e}")
+                    return Response(
+                        {'error': 'Answers are being saved, please submit again shortly.'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': str(SUBMIT_RETRY_AFTER)},
+                    )
+
+            idempotency_key = (
+                request.headers.get('Idempotency-Key') or request.data.get('idempotency_key')
+            )
+
+            result, replayed = submit_attempt(
+                exam,
+                session_id,
+                user=user,
+                guest_name=guest_name,
+                guest_email=guest_email,
+                idempotency_key=idempotency_key,
+            )
 
             return Response({
                 'success': True,
                 'message': 'Exam submitted successfully!',
                 'result_id': result.id,
-                'score': score,
-                'total': total_questions,
+                'score': result.score,
+                'total': result.total_questions,
                 'percentage': result.percentage,
-                'attempt_id': result.id 
+                'attempt_id': result.id,
+                'replayed': replayed,
             })
+        except SubmissionError as e:
+            return Response({'error': str(e)}, status=e.status)
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -291,28 +472,11 @@ class ExamViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # FETCH USER'S ANSWERS using the session_id from their result
-        user_answers = UserAnswer.objects.filter(
-            exam=exam,
-            session_id=user_result.session_id
-        ).select_related('question', 'selected_answer')
-
-        total_questions = exam.questions.count()
-        correct_answers = user_answers.filter(is_correct=True).count()
-
-        total_points = user_answers.filter(is_correct=True).aggregate(
-            total=Sum('question__points')
-        )['total'] or 0
-
-        max_points = exam.questions.aggregate(
-            total=Sum('points')
-        )['total'] or 0
-        
-        percentage = round(
-            (correct_answers / total_questions * 100)
-            if total_questions > 0 else 0,
-            2
-        )
+        # FETCH USER'S ANSWERS through the attempt that produced the result
+        user_answers = attempt_answers(user_result.attempt) if user_result.attempt_id else []
+
+        key = get_answer_key(exam.id)
+        max_points = key.max_points if key else 0
 
         # SUMMARY DATA (using saved result)
         summary_data = {
@@ -320,7 +484,7 @@ class ExamViewSet(viewsets.ReadOnlyModelViewSet):
             'exam_title': exam.title,
             'session_id': user_result.session_id,
             'total_questions': user_result.total_questions,
-            'answered_questions': user_answers.count(),
+            'answered_questions': len(user_answers),
             'correct_answers': user_result.correct_answers,
             'total_points': user_result.score,
             'max_points': max_points,
@@ -347,59 +511,121 @@ class ExamViewSet(viewsets.ReadOnlyModelViewSet):
         return Response({
             **summary_serializer.data,
             "answers": answers_data,
-            "questions": questions_data # New Field
+            "questions": questions_data, # New Field
+            # "You beat N% of candidates", estimated from the exam's score histogram
+            "score_distribution": histograms.score_distribution(exam.id, user_result.percentage),
         })
 
+    # -------------------------------------------------
+    # RESULT HISTORY (KEYSET PAGINATED)
+    # -------------------------------------------------
+    @action(detail=False, methods=['get'])
+    def results_history(self, request):
+        """
+        The authenticated user's results, newest first.
+        ?cursor= from the previous page's `next`, ?limit=, ?count=approx.
+        """
+        if not request.user.is_authenticated:
+            return Response(
+                {'error': 'Authentication required'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        paginator = KeysetPagination()
+        paginator.date_field = 'completed_at'
+        results = paginator.paginate_queryset(
+            UserExamResult.objects.filter(user=request.user).select_related('exam'), request
+        )
+        return paginator.get_paginated_response([
+            {
+                'id': result.id,
+                'exam_id': result.exam_id,
+                'exam_title': result.exam.title,
+                'score': result.score,
+                'total_questions': result.total_questions,
+                'correct_answers': result.correct_answers,
+                'percentage': result.percentage,
+                'completed_at': result.completed_at,
+            }
+            for result in results
+        ])
+
     # -------------------------------------------------
     # DASHBOARD STATS
     # -------------------------------------------------
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
-        print(f"DASHBOARD DEBUG: User={request.user}, Auth={request.auth}")
         if not request.user.is_authenticated:
             return Response(
                 {'error': 'Authentication required'}, 
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        results = UserExamResult.objects.filter(user=request.user)
-        
-        total_tests = results.count()
-        avg_score = results.aggregate(avg=models.Avg('percentage'))['avg'] or 0
-        tests_passed = results.filter(percentage__gte=50).count()
+        # One read of the precomputed UserStats row (see quiz/user_stats.py)
+        stats = user_stats.get_user_stats(request.user)
 
         return Response({
-            'total_tests': total_tests,
-            'average_score': round(avg_score, 1),
-            'tests_passed': tests_passed,
+            'total_tests': stats.total_tests,
+            'average_score': round(stats.average_score, 1),
+            'tests_passed': stats.tests_passed,
             'history': [
                 {
-                    'name': r.exam.title[:10] + '...',  # Shorten for chart
-                    'date': r.completed_at.strftime('%Y-%m-%d'),
-                    'score': r.percentage
+                    'name': item['exam_title'][:10] + '...',  # Shorten for chart
+                    'date': item['date'][:10],
+                    'score': item['percentage']
                 }
-                for r in results.order_by('-completed_at')[:7][::-1] # Last 7, reversed for chrono order
+                for item in stats.recent[:7][::-1] # Last 7, reversed for chrono order
             ],
             'subject_performance': [
                 {
-                    'name': item['exam__subcategory__category__name'], 
-                    'score': round(item['avg_score'], 1)
+                    'name': name, 
+                    'score': round(total / count, 1)
                 }
-                for item in results.values('exam__subcategory__category__name').annotate(avg_score=models.Avg('percentage'))
-                if item['exam__subcategory__category__name']  # Filter out None values
+                for name, (total, count) in stats.categories.items()
+                if count
             ],
             'recent_activities': [
                 {
-                    'id': r.id,
-                    'exam_title': r.exam.title,
-                    'score': r.percentage,
-                    'date': r.completed_at.isoformat(),
-                    'category': r.exam.subcategory.category.name if r.exam.subcategory and r.exam.subcategory.category else 'Uncategorized'
+                    'id': item['result_id'],
+                    'exam_title': item['exam_title'],
+                    'score': item['percentage'],
+                    'date': item['date'],
+                    'category': item['category'] or 'Uncategorized'
                 }
-                for r in results.order_by('-completed_at')[:5]
+                for item in stats.recent[:5]
             ]
         })
 
+    @action(detail=False, methods=['get'])
+    def topic_mastery(self, request):
+        """
+        The user's strongest and weakest topics by accuracy.
+        ?min_attempts= (default 3) ignores topics with fewer answers.
+        """
+        if not request.user.is_authenticated:
+            return Response(
+                {'error': 'Authentication required'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        min_attempts = _to_int(request.query_params.get('min_attempts')) or mastery.MIN_ATTEMPTS
+        strengths, weaknesses = mastery.strengths_and_weaknesses(request.user, min_attempts)
+
+        def topic_data(row):
+            return {
+                'subject': row.subject or 'General',
+                'topic': row.topic or 'General',
+                'attempts': row.attempts,
+                'correct': row.correct,
+                'accuracy': round(row.accuracy, 1),
+                'last_seen': row.last_seen,
+            }
+
+        return Response({
+            'strengths': [topic_data(row) for row in strengths],
+            'weaknesses': [topic_data(row) for row in weaknesses],
+        })
+
     @action(detail=False, methods=['post'])
     def explain_question(self, request):
         # ... (implementation remains same) ...
@@ -432,60 +658,82 @@ class ExamViewSet(viewsets.ReadOnlyModelViewSet):
         leaderboard_data = []
 
         if exam_id:
-            # Per-Exam Leaderboard (Highest Score per User)
-            # We want each user to appear only once with their BEST score for this exam.
-            
-            # Subquery to find the best score for each user for this exam
-            all_results = UserExamResult.objects.filter(exam_id=exam_id)
-            
-            # Group by user and find max score (using annotation tricks or python sorting)
-            # For simplicity and cross-db compatibility:
-            # We fetch all, then distinct by user keeping highest score.
-            
-            # Using Django's distinct on fields is only for Postgres, so we do it in Python for SQLite safety
-            results = UserExamResult.objects.filter(exam_id=exam_id).select_related('user', 'exam').order_by('user', '-score')
-            
-            user_best_map = {}
-            for r in results:
-                if r.user_id not in user_best_map:
-                    user_best_map[r.user_id] = r
-            
-            sorted_results = sorted(user_best_map.values(), key=lambda x: x.score, reverse=True)
-            
-            rank = 1
-            for r in sorted_results:
-                leaderboard_data.append({
-                    "rank": rank,
-                    "username": r.user.username,
-                    "score": r.score,
-                    "total_questions": r.total_questions,
-                    "percentage": r.percentage,
-                    "date": r.completed_at,
-                    "exam_title": r.exam.title
-                })
-                rank += 1
-                
+            # Per-Exam Leaderboard: one best entry per registered user, kept up
+            # to date on submit. Keyset-paginated with ?cursor= and ?limit=.
+            exam = get_object_or_404(Exam, pk=_to_int(exam_id))
+            limit = min(_to_int(request.query_params.get('limit')) or leaderboard_store.PAGE_SIZE, leaderboard_store.MAX_PAGE_SIZE)
+            try:
+                entries, next_cursor = leaderboard_store.exam_leaderboard_page(
+                    exam.id, request.query_params.get('cursor'), limit
+                )
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            def entry_data(entry):
+                return {
+                    "rank": entry.rank,
+                    "username": entry.user.username,
+                    "score": entry.score,
+                    "total_questions": entry.total_questions,
+                    "percentage": entry.percentage,
+                    "date": entry.achieved_at,
+                    "exam_title": exam.title
+                }
+
+            me = None
+            if request.user.is_authenticated:
+                my_entry = leaderboard_store.exam_rank_of(exam.id, request.user)
+                if my_entry:
+                    my_entry.user = request.user
+                    me = entry_data(my_entry)
+
+            return Response({
+                'results': [entry_data(entry) for entry in entries],
+                'next': next_cursor,
+                'me': me,
+            })
+
+        # Global Leaderboard (Reputation / Total Score sum), served from the
+        # incrementally maintained ranking store. Paged with ?cursor= (the
+        # offset returned as `next`) and ?limit=; ?around_me=true returns the
+        # current user's neighbourhood instead of a page.
+        limit = min(_to_int(request.query_params.get('limit')) or rankings.PAGE_SIZE, rankings.MAX_PAGE_SIZE)
+        offset = max(_to_int(request.query_params.get('cursor')) or 0, 0)
+        around_me = request.query_params.get('around_me') == 'true' and request.user.is_authenticated
+
+        if around_me:
+            page = rankings.global_around(request.user.id)
         else:
-            # Global Leaderboard (Reputation / Total Score sum)
-            # Sum of all scores for each user
-            users = User.objects.annotate(
-                total_score=Sum('exam_results__score'),
-                exams_taken=Count('exam_results')
-            ).filter(total_score__isnull=False).order_by('-total_score')
-
-            rank = 1
-            for u in users:
-                leaderboard_data.append({
-                    "rank": rank,
-                    "username": u.username,
-                    "score": u.total_score,
-                    "exams_taken": u.exams_taken,
-                    "date": "-", # Global doesn't have a single date
-                    "exam_title": "All Exams"
-                })
-                rank += 1
+            page = rankings.global_page(offset, limit)
+        users = User.objects.only('username').in_bulk([row.user_id for row in page])
 
-        return Response(leaderboard_data)
+        def ranking_data(row, username):
+            return {
+                "rank": row.rank,
+                "username": username,
+                "score": row.total_score,
+                "exams_taken": row.exams_taken,
+                "date": "-", # Global doesn't have a single date
+                "exam_title": "All Exams"
+            }
+
+        for row in page:
+            # Users deleted since their last submission linger in Redis until a rebuild
+            if row.user_id in users:
+                leaderboard_data.append(ranking_data(row, users[row.user_id].username))
+
+        me = None
+        if request.user.is_authenticated:
+            my_row = rankings.global_rank_of(request.user.id)
+            if my_row:
+                me = ranking_data(my_row, request.user.username)
+
+        has_more = not around_me and len(page) == limit
+        return Response({
+            'results': leaderboard_data,
+            'next': str(offset + limit) if has_more else None,
+            'me': me,
+        })
 
 
 # ==================================================
@@ -522,12 +770,14 @@ def submit_contact_message(request):
 @permission_classes([IsAuthenticated, IsAdminUser])
 def list_contact_messages(request):
     """
-    Admin-only API endpoint to list all contact messages.
-    Ordered by newest first.
+    Admin-only API endpoint to list contact messages, newest first.
+    Keyset paginated: ?cursor= from the previous page's `next`, ?limit=,
+    ?count=approx for an estimated total.
     """
-    messages = ContactMessage.objects.all()
+    paginator = KeysetPagination()
+    messages = paginator.paginate_queryset(ContactMessage.objects.all(), request)
     serializer = ContactMessageSerializer(messages, many=True)
-    return Response(serializer.data)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['PATCH'])
@@ -563,3 +813,240 @@ def delete_contact_message(request, message_id):
                        status=status.HTTP_204_NO_CONTENT)
     except ContactMessage.DoesNotExist:
         return Response({'error': 'Message not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+# ==================================================
+# EXPORT API ENDPOINTS (ADMIN)
+# ==================================================
+
+from django.http import StreamingHttpResponse
+from .exports import ExportStream, export_filters
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def export_data(request, kind):
+    """
+    Admin-only streaming export of 'results' or 'answers'.
+    Query params: output=csv|ndjson, exam, category (id or slug),
+    since / until (YYYY-MM-DD), gzip=true.
+    """
+    params = request.query_params
+    try:
+        stream = ExportStream(
+            kind,
+            params.get('output', 'csv'),
+            export_filters(params.get('exam'), params.get('category'), params.get('since'), params.get('until')),
+            compress=params.get('gzip') == 'true',
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(stream, content_type=stream.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{stream.filename}"'
+    return response
+
+
+# ==================================================
+# CACHE STATS (ADMIN)
+# ==================================================
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def cache_stats(request):
+    """
+    Admin-only hit / miss / invalidation counts of the response cache,
+    summed over all workers. ?reset=true starts the counters over.
+    """
+    return Response(quiz_cache.cache_stats(reset=request.query_params.get('reset') == 'true'))
+
+
+# ==================================================
+# QUESTION BANK
+# ==================================================
+
+def question_bank_queryset(params):
+    """Published questions matching the question bank filters in `params`."""
+    # Assembled mock papers only hold copies of bank questions
+    exams = Exam.objects.filter(is_active=True, status='published', blueprint__isnull=True)
+    if params.get('category'):
+        exams = exams.filter(subcategory__category__slug=params['category'])
+    if params.get('subcategory'):
+        exams = exams.filter(subcategory__slug=params['subcategory'])
+    if _to_int(params.get('year')):
+        exams = exams.filter(year=_to_int(params['year']))
+
+    # A correlated EXISTS, unlike exam_id IN (...), leaves the planner
+    # walking a (filter, created_at, id) index in page order
+    questions = Question.objects.filter(Exists(exams.filter(pk=OuterRef('exam_id'))))
+    if _to_int(params.get('exam')):
+        questions = questions.filter(exam_id=_to_int(params['exam']))
+    for name in ('subject', 'topic', 'difficulty'):
+        if params.get(name):
+            questions = questions.filter(**{name: params[name]})
+    return questions
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def question_bank(request):
+    """
+    Questions of all published exams, newest first, without correct
+    answers. Filters: ?subject=, ?topic=, ?difficulty= (exact values),
+    ?year=, ?category=, ?subcategory= (slugs), ?exam=. Keyset paginated
+    like the exam list (?cursor=, ?limit=, ?count=approx); every filter
+    has a (filter, created_at, id) index, so deep pages cost the same as
+    the first. Supports ?fields= / ?omit=.
+    """
+    questions = question_bank_queryset(request.query_params)
+    context = {'request': request, 'hide_correct': True}
+    sparse = QuestionBankSerializer(context=context)
+    questions = sparse_queryset(questions, sparse, keep=(KeysetPagination.date_field,))
+    if 'answers' in sparse.fields:
+        questions = questions.prefetch_related('answers')
+
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(questions, request)
+    serializer = QuestionBankSerializer(page, many=True, context=context)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def practice_set(request):
+    """
+    A random practice set from the question bank, without correct answers.
+    ?count= (default 20, max practice.MAX_COUNT), optional ?subject=,
+    ?topic=, ?difficulty=. Questions already answered by the user (or, for
+    guests, by ?session_id=) are left out while enough others remain.
+    """
+    params = request.query_params
+    count = max(1, min(_to_int(params.get('count')) or 20, practice.MAX_COUNT))
+    if request.user.is_authenticated:
+        seen = practice.seen_question_ids(user_id=request.user.id)
+    else:
+        seen = practice.seen_question_ids(session_id=params.get('session_id'))
+
+    questions = practice.sample_questions(
+        count,
+        subject=params.get('subject') or None,
+        topic=params.get('topic') or None,
+        difficulty=params.get('difficulty') or None,
+        exclude=seen,
+    )
+    serializer = QuestionBankSerializer(questions, many=True, context={'request': request, 'hide_correct': True})
+    return Response({'results': serializer.data})
+
+
+SIMILAR_MAX_LIMIT = 20
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def similar_questions(request, question_id):
+    """
+    Published bank questions most like the given one (TF-IDF cosine over
+    text and options; see quiz/similarity.py), without correct answers,
+    each with its `similarity`. ?limit= (default 10). 404 for an unknown
+    question, 503 until the index has been built.
+    """
+    get_object_or_404(Question.objects.only('id'), id=question_id)
+    limit = max(1, min(_to_int(request.query_params.get('limit')) or 10, SIMILAR_MAX_LIMIT))
+    # Over-fetch: some hits may be unpublished by now
+    hits = similarity.similar_questions(question_id, k=limit * 2)
+    if hits is None:
+        return Response({'error': 'The similarity index has not been built'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    scores = {hit_id: score for hit_id, _, score in hits}
+    found = question_bank_queryset({}).filter(id__in=scores).select_related('exam').prefetch_related('answers').in_bulk()
+    questions = [found[hit_id] for hit_id, _, _ in hits if hit_id in found][:limit]
+    serializer = QuestionBankSerializer(questions, many=True, context={'request': request, 'hide_correct': True})
+    return Response({'results': [
+        dict(data, similarity=round(scores[question.id], 4)) for question, data in zip(questions, serializer.data)
+    ]})
+
+
+# ==================================================
+# MOCK PAPER ASSEMBLY (ADMIN)
+# ==================================================
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def assemble_mock_exam(request):
+    """
+    Admin-only: creates a draft exam from bank questions by blueprint (see
+    quiz/assembly.py for the format). Optional `user_id` and
+    `last_attempts` leave out questions that user answered in their last N
+    attempts. 400 with the reason when the bank cannot fill a section.
+    """
+    data = request.data
+    try:
+        exam = assemble_exam(
+            data,
+            user_id=_to_int(data.get('user_id')),
+            last_attempts=_to_int(data.get('last_attempts')),
+        )
+    except BlueprintError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(ExamSerializer(exam).data, status=status.HTTP_201_CREATED)
+
+
+# ==================================================
+# QUESTION SEARCH
+# ==================================================
+
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_OFFSET = 1000
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_questions(request):
+    """
+    Full-text search over questions of published exams, best match first.
+    ?q= (the last word matches as a prefix), optional filters ?exam=,
+    ?category=, ?subcategory= (slugs), ?subject=, ?topic=, ?difficulty=;
+    paged with ?limit= and ?offset= from the previous page's `next`.
+    Results carry no answers, so they reveal nothing about the key.
+    """
+    params = request.query_params
+    query = params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(_to_int(params.get('limit')) or 20, SEARCH_MAX_LIMIT))
+    offset = max(0, min(_to_int(params.get('offset')) or 0, SEARCH_MAX_OFFSET))
+
+    hits = question_search.search_questions(
+        query,
+        exam=_to_int(params.get('exam')),
+        category=params.get('category'),
+        subcategory=params.get('subcategory'),
+        subject=params.get('subject'),
+        topic=params.get('topic'),
+        difficulty=params.get('difficulty'),
+        limit=limit,
+        offset=offset,
+    )
+    questions = Question.objects.select_related('exam').only(
+        'question_text', 'subject', 'topic', 'difficulty', 'exam__title'
+    ).in_bulk([question_id for question_id, _ in hits])
+    results = []
+    for question_id, rank in hits:
+        question = questions.get(question_id)
+        if question is None:
+            continue
+        results.append({
+            'id': question.id,
+            'exam': {'id': question.exam_id, 'title': question.exam.title},
+            'question_text': question.question_text,
+            'subject': question.subject,
+            'topic': question.topic,
+            'difficulty': question.difficulty,
+            'rank': round(rank, 4),
+        })
+
+    has_more = len(hits) == limit and offset + limit <= SEARCH_MAX_OFFSET
+    return Response({
+        'results': results,
+        'next': str(offset + limit) if has_more else None,
+    })
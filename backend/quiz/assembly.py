@@ -0,0 +1,255 @@
+"""
+Mock papers assembled from the question bank by blueprint.
+
+A blueprint lists sections (a subject, optionally a topic, and a question
+count) and a target difficulty mix, for example:
+
+    {
+        "title": "SSC CGL Mock 1",
+        "sections": [
+            {"subject": "Reasoning", "count": 25},
+            {"subject": "Quantitative Aptitude", "count": 25},
+            {"subject": "English", "count": 25},
+            {"subject": "General Awareness", "count": 25}
+        ],
+        "difficulty_mix": {"Easy": 30, "Medium": 50, "Hard": 20}
+    }
+
+Questions are picked greedily from the in-memory buckets of practice.py,
+with no database query once they are cached:
+
+1. Each section's count is split over the difficulty mix by largest
+   remainder (a section may carry its own "difficulty_mix").
+2. Each (section, difficulty) share is spread as evenly as the supply
+   allows over the topic buckets it covers (water filling), so a paper is
+   not dominated by the largest topic, then drawn from each bucket.
+3. A shortfall in one cell, for instance too few unseen Hard questions, is
+   drawn from the rest of the cell, then from the section at any
+   difficulty. If the section still cannot be filled the blueprint is
+   rejected rather than served with repeats.
+
+Questions the user answered in their last N attempts are excluded, and no
+question is picked twice. The paper is then written as a new draft Exam
+whose questions and options are bulk-created copies of the picked ones
+(Question.source_question links each copy to its original), so grading,
+answer keys and results work as for any other exam, and later edits to
+the bank do not change a paper that was already taken. Assembled exams
+are left out of the bank, practice sets and search.
+"""
+import numpy as np
+from django.db import transaction
+
+from . import practice
+from .models import Answer, Exam, Question, SubCategory
+
+MAX_QUESTIONS = 500
+
+
+class BlueprintError(ValueError):
+    """The blueprint is invalid or the bank cannot satisfy it; the message says why."""
+
+
+# ---------------------------------
+# BLUEPRINT
+# ---------------------------------
+def _positive_int(value, name):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise BlueprintError(f'{name} must be a whole number')
+    if value <= 0:
+        raise BlueprintError(f'{name} must be positive')
+    return value
+
+
+def _difficulty_mix(mix, name):
+    if mix is None:
+        return None
+    if not isinstance(mix, dict) or not mix:
+        raise BlueprintError(f'{name} must map difficulty names to weights')
+    try:
+        weights = {str(label): float(weight) for label, weight in mix.items()}
+    except (TypeError, ValueError):
+        raise BlueprintError(f'{name} weights must be numbers')
+    if any(weight < 0 for weight in weights.values()) or not sum(weights.values()):
+        raise BlueprintError(f'{name} weights must be non-negative and not all zero')
+    return weights
+
+
+def parse_blueprint(data):
+    """A validated, normalized copy of a blueprint dict; raises BlueprintError."""
+    if not isinstance(data, dict):
+        raise BlueprintError('The blueprint must be an object')
+    title = str(data.get('title') or '').strip()
+    if not title:
+        raise BlueprintError('title is required')
+    sections = data.get('sections')
+    if not isinstance(sections, list) or not sections:
+        raise BlueprintError('sections must be a non-empty list')
+
+    mix = _difficulty_mix(data.get('difficulty_mix'), 'difficulty_mix')
+    parsed = []
+    for i, section in enumerate(sections, start=1):
+        if not isinstance(section, dict) or not str(section.get('subject') or '').strip():
+            raise BlueprintError(f'Section {i} needs a subject')
+        parsed.append({
+            'subject': str(section['subject']).strip(),
+            'topic': str(section.get('topic') or '').strip() or None,
+            'count': _positive_int(section.get('count'), f'Section {i} count'),
+            'difficulty_mix': _difficulty_mix(section.get('difficulty_mix'), f'Section {i} difficulty_mix') or mix,
+        })
+    total = sum(section['count'] for section in parsed)
+    if total > MAX_QUESTIONS:
+        raise BlueprintError(f'A paper can have at most {MAX_QUESTIONS} questions, not {total}')
+
+    return {
+        'title': title,
+        'description': str(data.get('description') or ''),
+        'subcategory': data.get('subcategory') or None,
+        'duration_minutes': _positive_int(data.get('duration_minutes', 60), 'duration_minutes'),
+        'sections': parsed,
+    }
+
+
+# ---------------------------------
+# SELECTION
+# ---------------------------------
+def apportion(count, weights):
+    """Splits count over {label: weight} by largest remainder; {label: share}."""
+    total = sum(weights.values())
+    exact = {label: count * weight / total for label, weight in weights.items()}
+    shares = {label: int(value) for label, value in exact.items()}
+    # Ties go to the label listed first
+    by_remainder = sorted(exact, key=lambda label: shares[label] - exact[label])
+    for label in by_remainder[:count - sum(shares.values())]:
+        shares[label] += 1
+    return shares
+
+
+def spread(quota, supplies, rng):
+    """
+    Splits quota over buckets as evenly as their supplies allow (water
+    filling): small buckets are used up first and the larger ones share
+    the rest. Equal buckets are taken in random order, so the odd extra
+    question does not always go to the same topic.
+    """
+    counts = [0] * len(supplies)
+    order = sorted(rng.permutation(len(supplies)).tolist(), key=lambda i: supplies[i])
+    remaining = quota
+    for position, i in enumerate(order):
+        counts[i] = min(supplies[i], remaining // (len(order) - position))
+        remaining -= counts[i]
+    return counts
+
+
+def _draw_cell(buckets, quota, taken, rng):
+    """Up to quota ids from the buckets, spread over them; adds them to `taken`."""
+    if not buckets or quota <= 0:
+        return []
+    names = list(buckets)
+    arrays = practice.load_buckets(names)
+    picked = []
+    for ids, count in zip(arrays, spread(quota, [len(ids) for ids in arrays], rng)):
+        drawn = practice.draw([ids], count, taken, rng)
+        taken.update(drawn)
+        picked += drawn
+    if len(picked) < quota:
+        # Some buckets were mostly seen; take the rest from anywhere in the cell
+        drawn = practice.draw(arrays, quota - len(picked), taken, rng)
+        taken.update(drawn)
+        picked += drawn
+    return picked
+
+
+def pick_questions(blueprint, exclude=frozenset(), rng=None):
+    """
+    Question ids for a parsed blueprint, section by section, none of them
+    in `exclude`. Raises BlueprintError when a section cannot be filled.
+    """
+    rng = rng or np.random.default_rng()
+    taken = set(exclude)
+    picked = []
+    for section in blueprint['sections']:
+        subject, topic, count = section['subject'], section['topic'], section['count']
+        ids = []
+        if section['difficulty_mix']:
+            for difficulty, share in apportion(count, section['difficulty_mix']).items():
+                ids += _draw_cell(practice.matching_buckets(subject, topic, difficulty), share, taken, rng)
+        if len(ids) < count:
+            ids += _draw_cell(practice.matching_buckets(subject, topic), count - len(ids), taken, rng)
+        if len(ids) < count:
+            where = f'{subject} / {topic}' if topic else subject
+            raise BlueprintError(f'Only {len(ids)} unused questions for {where}, {count} needed')
+        # Shuffle within the section so difficulties and topics interleave
+        picked += rng.permutation(ids).tolist()
+    return picked
+
+
+# ---------------------------------
+# MATERIALIZATION
+# ---------------------------------
+def create_exam(blueprint, question_ids):
+    """
+    Writes a draft Exam holding copies of the questions (in the given order)
+    and their options: one INSERT for the exam and one bulk INSERT each for
+    questions and options.
+    """
+    subcategory = None
+    if blueprint['subcategory']:
+        subcategory = SubCategory.objects.filter(slug=blueprint['subcategory']).first()
+        if subcategory is None:
+            raise BlueprintError(f"Unknown subcategory '{blueprint['subcategory']}'")
+
+    sources = Question.objects.in_bulk(question_ids)
+    if len(sources) < len(question_ids):
+        raise BlueprintError('Questions were removed from the bank while assembling; try again')
+    options = {}
+    for question_id, text, is_correct in Answer.objects.filter(question_id__in=question_ids).order_by(
+        'order', 'id'
+    ).values_list('question_id', 'answer_text', 'is_correct'):
+        options.setdefault(question_id, []).append((text, is_correct))
+
+    with transaction.atomic():
+        exam = Exam.objects.create(
+            title=blueprint['title'],
+            description=blueprint['description'],
+            subcategory=subcategory,
+            duration_minutes=blueprint['duration_minutes'],
+            total_questions=len(question_ids),
+            status='draft',
+            blueprint=blueprint,
+        )
+        copies = Question.objects.bulk_create(
+            Question(
+                exam=exam,
+                source_question=source,
+                question_text=source.question_text,
+                image=source.image.name,
+                is_image_based=source.is_image_based,
+                question_type=source.question_type,
+                order=order,
+                points=source.points,
+                explanation=source.explanation,
+                subject=source.subject,
+                topic=source.topic,
+                difficulty=source.difficulty,
+            )
+            for order, source in enumerate(sources[question_id] for question_id in question_ids)
+        )
+        Answer.objects.bulk_create(
+            Answer(question=copy, answer_text=text, is_correct=is_correct, order=order)
+            for copy, question_id in zip(copies, question_ids)
+            for order, (text, is_correct) in enumerate(options.get(question_id, ()))
+        )
+    exam.question_count = len(copies)
+    return exam
+
+
+def assemble_exam(data, user_id=None, last_attempts=None, rng=None):
+    """
+    Parses the blueprint, picks questions the user has not answered in
+    their `last_attempts` most recent attempts and creates the exam.
+    """
+    blueprint = parse_blueprint(data)
+    seen = practice.seen_question_ids(user_id=user_id, last_attempts=last_attempts) if user_id else set()
+    return create_exam(blueprint, pick_questions(blueprint, seen, rng))
@@ -0,0 +1,159 @@
+"""
+Tag-versioned response cache for the quiz catalog.
+
+Every cached value is stored under a key that embeds the current version of
+each of its tags:
+
+    quiz:cache:<name>:<params hash>:<tag versions>
+
+Tags are 'catalog' (anything listed by the category / subcategory / exam
+endpoints), 'practice' (the question buckets of practice.py, which only
+change with which questions are published under which labels) and one per
+object: 'category:<id>', 'subcategory:<id>', 'exam:<id>', 'question:<id>'. A tag's version is the millisecond timestamp
+of its last invalidation (or of its first use), so versions also serve as
+last-modified times for HTTP validators. Invalidating a tag moves it to a
+new version, so every key built from the old version is never read again
+and simply expires. signals.py invalidates the tags of any category,
+subcategory, exam, question or answer that is saved or deleted, after the
+transaction commits.
+
+A read is two cache round trips (tag versions via get_many, then the value).
+The backend is whatever CACHES['default'] is (see CACHE_URL in settings):
+with locmem every worker has its own cache and invalidation only reaches
+the process that made the edit, so use Redis when running several workers.
+
+Hits, misses and invalidations are counted per process and added to shared
+counters every STATS_FLUSH_EVERY events; cache_stats() reports the totals.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+TIMEOUT = getattr(settings, 'QUIZ_CACHE_TIMEOUT', 60 * 15)
+STATS_FLUSH_EVERY = 50
+STAT_NAMES = ('hits', 'misses', 'invalidations')
+
+CATALOG = 'catalog'
+PRACTICE = 'practice'
+
+
+def tag(kind, pk):
+    return f'{kind}:{pk}'
+
+
+# ---------------------------------
+# TAG VERSIONS
+# ---------------------------------
+def _tag_key(name):
+    return f'quiz:cache:tag:{name}'
+
+
+def tag_versions(tags):
+    """Current versions of the tags: millisecond timestamps of their last change."""
+    keys = [_tag_key(name) for name in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed with a timestamp (see answer_key._current_version): an
+            # evicted counter can never come back at an old version.
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*tags):
+    """Moves each tag to a new version, orphaning every value cached under it."""
+    now = int(time.time() * 1000)
+    for name in tags:
+        key = _tag_key(name)
+        cache.set(key, max(now, (cache.get(key) or 0) + 1), timeout=None)
+    _count('invalidations', len(tags))
+
+
+# ---------------------------------
+# READS
+# ---------------------------------
+def _params_hash(params):
+    raw = '&'.join(f'{k}={v}' for k, v in sorted(params.items())) if params else ''
+    return hashlib.blake2b(raw.encode(), digest_size=10).hexdigest()
+
+
+def cache_key(name, tags, params=None):
+    return cache_keys(name, tags, [params])[0]
+
+
+def cache_keys(name, tags, params_list):
+    """Keys for several parameter sets under the same tags, with one version lookup."""
+    versions = '.'.join(str(v) for v in tag_versions(tags))
+    return [f'quiz:cache:{name}:{_params_hash(params)}:{versions}' for params in params_list]
+
+
+def cached(name, tags, params, build, timeout=None):
+    """
+    Returns the value cached for (name, params) under the current versions
+    of `tags`, calling build() and storing its result on a miss. Exceptions
+    from build() (e.g. Http404) propagate and nothing is stored.
+    """
+    key = cache_key(name, tags, params)
+    value = cache.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+    _count('misses')
+    value = build()
+    cache.set(key, value, timeout=TIMEOUT if timeout is None else timeout)
+    return value
+
+
+# ---------------------------------
+# STATS
+# ---------------------------------
+_pending = dict.fromkeys(STAT_NAMES, 0)
+_pending_lock = threading.Lock()
+
+
+def _stat_key(name):
+    return f'quiz:cache:stats:{name}'
+
+
+def _count(name, n=1):
+    with _pending_lock:
+        _pending[name] += n
+        if sum(_pending.values()) < STATS_FLUSH_EVERY:
+            return
+        counts = dict(_pending)
+        for stat in STAT_NAMES:
+            _pending[stat] = 0
+    _flush(counts)
+
+
+def _flush(counts):
+    for name, n in counts.items():
+        if not n:
+            continue
+        try:
+            cache.incr(_stat_key(name), n)
+        except ValueError:
+            cache.add(_stat_key(name), 0, timeout=None)
+            cache.incr(_stat_key(name), n)
+
+
+def cache_stats(reset=False):
+    """Totals across processes (plus this process's unflushed counts) and the hit ratio."""
+    with _pending_lock:
+        counts = dict(_pending)
+        for stat in STAT_NAMES:
+            _pending[stat] = 0
+    _flush(counts)
+
+    stored = cache.get_many([_stat_key(name) for name in STAT_NAMES])
+    totals = {name: stored.get(_stat_key(name), 0) for name in STAT_NAMES}
+    if reset:
+        cache.delete_many([_stat_key(name) for name in STAT_NAMES])
+    reads = totals['hits'] + totals['misses']
+    totals['hit_ratio'] = round(totals['hits'] / reads, 4) if reads else None
+    totals['backend'] = settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]
+    return totals
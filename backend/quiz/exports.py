@@ -0,0 +1,195 @@
+"""
+Streaming exports of exam results and answers as CSV or NDJSON.
+
+Rows are read with values_list().iterator(chunk_size=...), so neither model
+instances nor the whole result set are held in memory, and encoded into
+chunks of roughly FLUSH_BYTES. With compress=True every chunk goes through a
+single zlib stream in gzip format, so output is gzipped on the fly. Memory
+use is constant whatever the export size.
+
+Answers cover UserAnswer rows and compacted (packed) attempts; packed
+answers carry the attempt's finish time as answered_at and no text answer.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime, time as dt_time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import ExamAttempt, UserAnswer, UserExamResult
+from .packing import unpack_answers
+
+CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+FORMATS = ('csv', 'ndjson')
+
+RESULT_COLUMNS = (
+    'result_id', 'exam_id', 'exam_title', 'user_id', 'username', 'guest_name', 'guest_email',
+    'session_id', 'score', 'total_questions', 'correct_answers', 'percentage', 'completed_at',
+)
+ANSWER_COLUMNS = (
+    'attempt_id', 'exam_id', 'session_id', 'user_id', 'question_id', 'selected_answer_id',
+    'is_correct', 'text_answer', 'answered_at',
+)
+
+
+# ---------------------------------
+# FILTERS
+# ---------------------------------
+def _parse_day(name, value, end_of_day=False):
+    """A YYYY-MM-DD (or full ISO) string as an aware datetime; raises ValueError naming the filter."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be YYYY-MM-DD') from None
+    if len(value) <= 10 and end_of_day:
+        parsed = datetime.combine(parsed.date(), dt_time.max)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def export_filters(exam=None, category=None, since=None, until=None):
+    """
+    Normalises user-supplied filters into a dict for the row generators.
+    `category` may be an id or a slug. Raises ValueError on bad input.
+    """
+    filters = {}
+    if exam:
+        if not str(exam).isdigit():
+            raise ValueError('exam must be an exam id')
+        filters['exam_id'] = int(exam)
+    if category:
+        key = 'category_id' if str(category).isdigit() else 'category_slug'
+        filters[key] = int(category) if key == 'category_id' else category
+    if since:
+        filters['since'] = _parse_day('since', since)
+    if until:
+        filters['until'] = _parse_day('until', until, end_of_day=True)
+    return filters
+
+
+def _scope(queryset, filters, exam_path, date_field):
+    if 'exam_id' in filters:
+        queryset = queryset.filter(**{f'{exam_path}_id': filters['exam_id']})
+    if 'category_id' in filters:
+        queryset = queryset.filter(**{f'{exam_path}__subcategory__category_id': filters['category_id']})
+    if 'category_slug' in filters:
+        queryset = queryset.filter(**{f'{exam_path}__subcategory__category__slug': filters['category_slug']})
+    if 'since' in filters:
+        queryset = queryset.filter(**{f'{date_field}__gte': filters['since']})
+    if 'until' in filters:
+        queryset = queryset.filter(**{f'{date_field}__lte': filters['until']})
+    return queryset
+
+
+# ---------------------------------
+# ROW GENERATORS
+# ---------------------------------
+def result_rows(filters):
+    results = _scope(UserExamResult.objects.all(), filters, 'exam', 'completed_at')
+    return results.order_by('id').values_list(
+        'id', 'exam_id', 'exam__title', 'user_id', 'user__username', 'guest_name', 'guest_email',
+        'session_id', 'score', 'total_questions', 'correct_answers', 'percentage', 'completed_at',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def answer_rows(filters):
+    answers = _scope(UserAnswer.objects.all(), filters, 'exam', 'answered_at')
+    yield from answers.order_by('id').values_list(
+        'attempt_id', 'exam_id', 'session_id', 'attempt__user_id', 'question_id', 'selected_answer_id',
+        'is_correct', 'text_answer', 'answered_at',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+    packed = _scope(ExamAttempt.objects.filter(packed_answers__isnull=False), filters, 'exam', 'finished_at')
+    attempts = packed.order_by('id').values_list(
+        'id', 'exam_id', 'session_id', 'user_id', 'finished_at', 'packed_answers'
+    )
+    for attempt_id, exam_id, session_id, user_id, finished_at, blob in attempts.iterator(chunk_size=500):
+        for question_id, answer_id, is_correct in unpack_answers(blob):
+            yield attempt_id, exam_id, session_id, user_id, question_id, answer_id, is_correct, '', finished_at
+
+
+EXPORTS = {
+    'results': (RESULT_COLUMNS, result_rows),
+    'answers': (ANSWER_COLUMNS, answer_rows),
+}
+
+
+# ---------------------------------
+# ENCODING
+# ---------------------------------
+def _encode_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(value.isoformat() if isinstance(value, datetime) else value for value in row)
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _encode_ndjson(columns, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    lines, size = [], 0
+    for row in rows:
+        line = encoder.encode(dict(zip(columns, row)))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= FLUSH_BYTES:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines, size = [], 0
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ExportStream:
+    """
+    Iterable of encoded bytes for one export. `rows` counts the rows written
+    so far, for progress and throughput reporting.
+    """
+
+    def __init__(self, kind, fmt='csv', filters=None, compress=False):
+        if kind not in EXPORTS:
+            raise ValueError(f"Unknown export '{kind}'")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'")
+        self.kind, self.fmt, self.compress = kind, fmt, compress
+        self.filters = filters or {}
+        self.rows = 0
+
+    @property
+    def filename(self):
+        scope = f"-exam{self.filters['exam_id']}" if 'exam_id' in self.filters else ''
+        return f"{self.kind}{scope}.{self.fmt}{'.gz' if self.compress else ''}"
+
+    @property
+    def content_type(self):
+        if self.compress:
+            return 'application/gzip'
+        return 'text/csv' if self.fmt == 'csv' else 'application/x-ndjson'
+
+    def _counted(self, rows):
+        for row in rows:
+            self.rows += 1
+            yield row
+
+    def __iter__(self):
+        columns, source = EXPORTS[self.kind]
+        encode = _encode_csv if self.fmt == 'csv' else _encode_ndjson
+        chunks = encode(columns, self._counted(source(self.filters)))
+        return _gzip(chunks) if self.compress else chunks
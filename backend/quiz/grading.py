@@ -0,0 +1,181 @@
+import copy
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import histograms, leaderboard, mastery, rankings, user_stats
+from .answer_key import get_answer_key
+from .models import ExamAttempt, UserAnswer, UserExamResult
+from .packing import unpack_answers
+
+
+class SubmissionError(ValueError):
+    """A submission that cannot be graded; the API answers with `status`."""
+
+    def __init__(self, message, status=422):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------------------------------
+# ATTEMPTS
+# ---------------------------------
+def open_attempt(exam_id, session_id, user=None):
+    """
+    Returns the session's in-progress attempt for an exam, starting one if
+    needed. A session that already submitted gets a fresh attempt (retake).
+    """
+    attempt = ExamAttempt.objects.filter(
+        exam_id=exam_id, session_id=session_id, state='in_progress'
+    ).first()
+    if attempt is None:
+        try:
+            with transaction.atomic():
+                attempt = ExamAttempt.objects.create(exam_id=exam_id, session_id=session_id, user=user)
+        except IntegrityError:
+            attempt = ExamAttempt.objects.get(exam_id=exam_id, session_id=session_id, state='in_progress')
+    return attempt
+
+
+def attempt_to_submit(exam, session_id, user=None):
+    """
+    Locks the attempt a submission should grade: the open one, else the
+    latest submitted one (a repeated submit regrades it instead of grading an
+    empty new attempt), else a new empty attempt.
+    """
+    attempts = ExamAttempt.objects.select_for_update().filter(exam=exam, session_id=session_id)
+    attempt = (
+        attempts.filter(state='in_progress').first()
+        or attempts.filter(state='submitted').order_by('-finished_at', '-id').first()
+    )
+    if attempt is None:
+        attempt = open_attempt(exam.id, session_id, user)
+    return attempt
+
+
+# ---------------------------------
+# SUBMIT EXAM (ATOMIC, IDEMPOTENT)
+# ---------------------------------
+def grade_attempt(attempt):
+    """
+    Scores an attempt against the cached answer key.
+    One read of the attempt's selections (none for a compacted attempt, whose
+    rows were packed); the rest is in-memory arithmetic.
+    Returns (total_questions, correct_answers, score).
+    """
+    key = get_answer_key(attempt.exam_id)
+    if key is None:
+        raise SubmissionError('This exam is not open for submissions.', status=409)
+    if attempt.packed_answers is not None:
+        selections = [
+            (question_id, answer_id)
+            for question_id, answer_id, _ in unpack_answers(attempt.packed_answers)
+            if answer_id is not None
+        ]
+    else:
+        selections = UserAnswer.objects.filter(
+            attempt=attempt, selected_answer__isnull=False
+        ).values_list('question_id', 'selected_answer_id')
+    correct_answers, score = key.score(selections)
+    return len(key), correct_answers, score
+
+
+def _take_write_lock(exam, session_id):
+    """
+    SQLite has no row locks: a transaction that reads and then writes fails
+    with "database is locked" when another one wrote in between. Writing
+    first takes the database write lock up front, so parallel submissions
+    wait their turn instead. Other databases lock rows (select_for_update).
+    """
+    if connection.vendor == 'sqlite':
+        ExamAttempt.objects.filter(exam=exam, session_id=session_id).update(state=F('state'))
+
+
+def submit_attempt(exam, session_id, user=None, guest_name=None, guest_email=None, idempotency_key=None):
+    """
+    Grades a session and stores its UserExamResult in a single transaction.
+
+    Registered users keep one result per exam, guests one per (session, exam);
+    both are enforced by unique constraints, so concurrent submissions
+    serialize on the row lock and can never create duplicates. A repeated
+    idempotency key returns the stored result without grading again; keys
+    are scoped to the exam, and one already used by another submitter is
+    rejected with SubmissionError.
+
+    Returns (result, replayed).
+    """
+    with transaction.atomic():
+        _take_write_lock(exam, session_id)
+        if idempotency_key:
+            replay = UserExamResult.objects.filter(idempotency_key=idempotency_key, exam=exam).first()
+            if replay:
+                same_submitter = (
+                    replay.user_id == user.id if user
+                    else replay.user_id is None and replay.session_id == session_id
+                )
+                if not same_submitter:
+                    raise SubmissionError('Idempotency key already used by another submission.')
+                return replay, True
+
+        attempt = attempt_to_submit(exam, session_id, user)
+        first_submission = attempt.state == 'in_progress'
+        total_questions, correct_answers, score = grade_attempt(attempt)
+
+        attempt.state = 'submitted'
+        attempt.finished_at = timezone.now()
+        attempt.user = user or attempt.user
+        attempt.save(update_fields=['state', 'finished_at', 'user'])
+
+        fields = {
+            'score': score,
+            'total_questions': total_questions,
+            'correct_answers': correct_answers,
+            'percentage': round((correct_answers / total_questions * 100) if total_questions > 0 else 0, 2),
+            'session_id': session_id,
+            'attempt': attempt,
+            'completed_at': attempt.finished_at,
+            'guest_name': guest_name if not user else None,
+            'guest_email': guest_email if not user else None,
+            'idempotency_key': idempotency_key or None,
+        }
+
+        if user:
+            lookup = {'user': user, 'exam': exam}
+        else:
+            # For guests, we rely on session_id + exam to identify the attempt
+            lookup = {'user': None, 'session_id': session_id, 'exam': exam}
+
+        # A shared browser can move an attempt from a guest result to a user
+        # result; the newest submission owns it.
+        UserExamResult.objects.filter(attempt=attempt).exclude(**lookup).update(attempt=None)
+
+        result = UserExamResult.objects.select_for_update().filter(**lookup).first()
+        created = False
+        previous = None
+        if result is None:
+            try:
+                with transaction.atomic():
+                    result = UserExamResult.objects.create(**{**lookup, **fields})
+                    created = True
+            except IntegrityError:
+                # Lost the race against a parallel submission: update its row.
+                result = UserExamResult.objects.select_for_update().filter(**lookup).first()
+                if result is None:
+                    # The conflict was on the idempotency key, not on the result
+                    raise SubmissionError('Idempotency key already used by another submission.')
+
+        if not created:
+            previous = copy.copy(result)
+            for name, value in fields.items():
+                setattr(result, name, value)
+            result.save()
+
+        # Derived read models, updated in the same transaction
+        leaderboard.record_result(result)
+        rankings.record_result(result, previous)
+        user_stats.record_result(result, previous)
+        histograms.record_result(result, previous)
+        if first_submission:
+            mastery.record_attempt(attempt)
+        return result, False
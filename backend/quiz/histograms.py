@@ -0,0 +1,112 @@
+"""
+Per-exam score histograms (ScoreBucket rows) for percentile feedback.
+
+Results are counted in BUCKETS fixed-width buckets over `percentage`
+(bucket 19 also holds 100%). submit_attempt moves a result between buckets
+with F() increments, so percentile and rank estimates are a cumulative sum
+over BUCKETS counts instead of a count over the exam's results. Within a
+bucket, scores are assumed to be spread evenly.
+
+Increments can drift from the results table when results are deleted or
+edited outside submit_attempt; `python manage.py recompute_score_histograms`
+rewrites the buckets exactly and is meant to run periodically.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, Value
+from django.db.models.functions import Cast, Floor, Least
+
+from .models import ScoreBucket, UserExamResult
+
+BUCKETS = 20
+BUCKET_WIDTH = 100 / BUCKETS
+
+
+def bucket_of(percentage):
+    return min(max(int(percentage // BUCKET_WIDTH), 0), BUCKETS - 1)
+
+
+# ---------------------------------
+# INCREMENTAL UPDATES
+# ---------------------------------
+def _add(exam_id, bucket, delta):
+    rows = ScoreBucket.objects.filter(exam_id=exam_id, bucket=bucket)
+    if rows.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            ScoreBucket.objects.create(exam_id=exam_id, bucket=bucket, count=delta)
+    except IntegrityError:
+        rows.update(count=F('count') + delta)
+
+
+def record_result(result, previous=None):
+    """Counts a saved result; `previous` is the result before this submission, or None."""
+    new_bucket = bucket_of(result.percentage)
+    if previous is not None:
+        old_bucket = bucket_of(previous.percentage)
+        if old_bucket == new_bucket:
+            return
+        _add(result.exam_id, old_bucket, -1)
+    _add(result.exam_id, new_bucket, 1)
+
+
+def apply_bucket_deltas(exam_id, deltas):
+    """Applies {bucket: count delta} at once, e.g. for results rescored by a regrade."""
+    for bucket, delta in deltas.items():
+        if delta:
+            _add(exam_id, bucket, delta)
+
+
+def recompute_exam_histogram(exam_id):
+    """Rewrites an exam's buckets from its results. Returns the number of buckets corrected."""
+    exact = [0] * BUCKETS
+    grouped = UserExamResult.objects.filter(exam_id=exam_id).annotate(
+        bucket=Least(Cast(Floor(F('percentage') / BUCKET_WIDTH), IntegerField()), Value(BUCKETS - 1))
+    ).values('bucket').annotate(n=Count('id')).order_by()
+    for row in grouped:
+        exact[max(row['bucket'], 0)] += row['n']
+
+    stored = exam_histogram(exam_id)
+    corrected = [bucket for bucket in range(BUCKETS) if stored[bucket] != exact[bucket]]
+    with transaction.atomic():
+        ScoreBucket.objects.filter(exam_id=exam_id).delete()
+        ScoreBucket.objects.bulk_create(
+            ScoreBucket(exam_id=exam_id, bucket=bucket, count=count)
+            for bucket, count in enumerate(exact) if count
+        )
+    return len(corrected)
+
+
+# ---------------------------------
+# READS
+# ---------------------------------
+def exam_histogram(exam_id):
+    """Counts per bucket, lowest scores first."""
+    counts = [0] * BUCKETS
+    for bucket, count in ScoreBucket.objects.filter(exam_id=exam_id).values_list('bucket', 'count'):
+        counts[bucket] = count
+    return counts
+
+
+def score_distribution(exam_id, percentage):
+    """
+    Histogram plus where `percentage` sits in it. The result being placed is
+    assumed to be counted already, so it is left out of the comparison.
+    """
+    counts = exam_histogram(exam_id)
+    candidates = sum(counts)
+    bucket = bucket_of(percentage)
+    fraction = min(max((percentage - bucket * BUCKET_WIDTH) / BUCKET_WIDTH, 0), 1)
+    others_in_bucket = max(counts[bucket] - 1, 0)
+
+    below = sum(counts[:bucket]) + fraction * others_in_bucket
+    above = sum(counts[bucket + 1:]) + (1 - fraction) * others_in_bucket
+    others = max(candidates - 1, 0)
+
+    return {
+        'bucket_width': BUCKET_WIDTH,
+        'counts': counts,
+        'candidates': candidates,
+        'percentile': round(below / others * 100, 1) if others else 100.0,
+        'rank_estimate': int(round(above)) + 1,
+    }
@@ -0,0 +1,292 @@
+"""
+Item response theory calibration (1PL / 2PL) over all submitted answers.
+
+The response matrix is kept sparse as three COO arrays (person index,
+question index, 0/1 outcome), one entry per answered question; unanswered
+questions are missing data, not wrong answers. Persons are registered users,
+and each guest attempt counts as its own person, so guests still inform item
+parameters.
+
+    P(correct) = sigmoid(a_j * (theta_i - b_j))      (a_j = 1 for 1PL)
+
+The fit is a penalised joint maximum likelihood: alternating diagonal Newton
+steps on abilities, difficulties and log-discriminations, with gradients and
+Fisher information summed per person / per question by np.bincount. The
+priors (theta ~ N(0, 1), b ~ N(0, 2^2), log a ~ N(0, 0.5^2)) fix the scale
+and keep items that everyone got right (or wrong) finite. Each iteration is
+a few passes over the observation arrays, so time and memory are linear in
+the number of answers, not users x questions.
+
+Warm start: abilities and item parameters from the previous run are the
+starting point, so a nightly run over mostly unchanged data converges in a
+few iterations.
+"""
+import resource
+import sys
+from array import array
+
+import numpy as np
+from django.db import transaction
+
+from . import cache as quiz_cache
+from . import search
+from .models import ExamAttempt, Question, QuestionStats, UserAbility, UserAnswer
+from .packing import iter_packed_answers
+
+THETA_PRIOR_VAR = 1.0
+DIFFICULTY_PRIOR_VAR = 4.0
+LOG_DISCRIMINATION_PRIOR_VAR = 0.25
+MAX_STEP = 1.0
+
+# Difficulty labels written to Question.difficulty, by IRT difficulty b
+EASY_BELOW = -0.5
+HARD_ABOVE = 0.5
+
+
+def _sigmoid(z):
+    return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def difficulty_label(b):
+    if b < EASY_BELOW:
+        return 'Easy'
+    if b > HARD_ABOVE:
+        return 'Hard'
+    return 'Medium'
+
+
+# ---------------------------------
+# RESPONSE MATRIX
+# ---------------------------------
+class ResponseMatrix:
+    """
+    Sparse persons x questions outcomes in COO form.
+    person_keys: user id for registered users, -attempt id for guest attempts.
+    """
+
+    def __init__(self, person_keys, question_ids, outcomes):
+        self.person_keys, self.persons = np.unique(np.asarray(person_keys, dtype=np.int64), return_inverse=True)
+        self.question_ids, self.items = np.unique(np.asarray(question_ids, dtype=np.int64), return_inverse=True)
+        self.persons = self.persons.astype(np.int32)
+        self.items = self.items.astype(np.int32)
+        self.outcomes = np.asarray(outcomes, dtype=np.int8)
+
+    @property
+    def shape(self):
+        return len(self.person_keys), len(self.question_ids)
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def responses_per_item(self):
+        return np.bincount(self.items, minlength=self.shape[1])
+
+    def responses_per_person(self):
+        return np.bincount(self.persons, minlength=self.shape[0])
+
+
+def load_responses():
+    """Builds the ResponseMatrix from UserAnswer rows and packed attempts of submitted attempts."""
+    person_keys, question_ids, outcomes = array('q'), array('q'), array('b')
+
+    def add(user_id, attempt_id, question_id, is_correct):
+        person_keys.append(user_id if user_id else -attempt_id)
+        question_ids.append(question_id)
+        outcomes.append(1 if is_correct else 0)
+
+    attempts = ExamAttempt.objects.filter(state='submitted')
+    rows = UserAnswer.objects.filter(attempt__in=attempts).values_list(
+        'attempt__user_id', 'attempt_id', 'question_id', 'is_correct'
+    )
+    for user_id, attempt_id, question_id, is_correct in rows.iterator(chunk_size=5000):
+        add(user_id, attempt_id, question_id, is_correct)
+
+    packed = attempts.filter(packed_answers__isnull=False)
+    owners = dict(packed.values_list('id', 'user_id').iterator())
+    for attempt_id, question_id, _, is_correct in iter_packed_answers(packed):
+        add(owners.get(attempt_id), attempt_id, question_id, is_correct)
+
+    return ResponseMatrix(person_keys, question_ids, outcomes)
+
+
+# ---------------------------------
+# FIT
+# ---------------------------------
+def fit(matrix, model='2pl', theta=None, difficulty=None, discrimination=None, max_iter=100, tol=1e-3):
+    """
+    Fits the model to a ResponseMatrix, starting from the given parameters
+    (zeros / ones when omitted). Returns a dict with theta, theta_se,
+    difficulty, discrimination, iterations and converged.
+    """
+    n_persons, n_items = matrix.shape
+    persons, items = matrix.persons, matrix.items
+    y = matrix.outcomes.astype(np.float64)
+
+    theta = np.zeros(n_persons) if theta is None else np.array(theta, dtype=np.float64)
+    b = np.zeros(n_items) if difficulty is None else np.array(difficulty, dtype=np.float64)
+    log_a = np.zeros(n_items) if discrimination is None or model == '1pl' else np.log(discrimination)
+
+    def residuals():
+        a = np.exp(log_a)[items]
+        z = theta[persons] - b[items]
+        p = _sigmoid(a * z)
+        return a, z, y - p, p * (1 - p)
+
+    converged = False
+    iteration = 0
+    theta_info = np.ones(n_persons)
+    for iteration in range(1, max_iter + 1):
+        a, z, r, w = residuals()
+        gradient = np.bincount(persons, a * r, n_persons) - theta / THETA_PRIOR_VAR
+        theta_info = np.bincount(persons, a * a * w, n_persons) + 1 / THETA_PRIOR_VAR
+        theta_step = np.clip(gradient / theta_info, -MAX_STEP, MAX_STEP)
+        theta += theta_step
+
+        a, z, r, w = residuals()
+        gradient = -np.bincount(items, a * r, n_items) - b / DIFFICULTY_PRIOR_VAR
+        info = np.bincount(items, a * a * w, n_items) + 1 / DIFFICULTY_PRIOR_VAR
+        b_step = np.clip(gradient / info, -MAX_STEP, MAX_STEP)
+        b += b_step
+
+        change = max(np.abs(theta_step).max(initial=0), np.abs(b_step).max(initial=0))
+        if model == '2pl':
+            a, z, r, w = residuals()
+            az = a * z
+            gradient = np.bincount(items, r * az, n_items) - log_a / LOG_DISCRIMINATION_PRIOR_VAR
+            info = np.bincount(items, w * az * az, n_items) + 1 / LOG_DISCRIMINATION_PRIOR_VAR
+            a_step = np.clip(gradient / info, -MAX_STEP, MAX_STEP)
+            log_a += a_step
+            change = max(change, np.abs(a_step).max(initial=0))
+
+        if change < tol:
+            converged = True
+            break
+
+    return {
+        'theta': theta,
+        'theta_se': 1 / np.sqrt(theta_info),
+        'difficulty': b,
+        'discrimination': np.exp(log_a),
+        'iterations': iteration,
+        'converged': converged,
+    }
+
+
+# ---------------------------------
+# WARM START / SAVE
+# ---------------------------------
+def previous_parameters(matrix):
+    """Starting values from the last run; new questions start from their p-value."""
+    n_persons, n_items = matrix.shape
+    theta = np.zeros(n_persons)
+    user_positions = {key: i for i, key in enumerate(matrix.person_keys.tolist()) if key > 0}
+    for user_id, value in UserAbility.objects.filter(user_id__in=user_positions).values_list('user_id', 'theta'):
+        theta[user_positions[user_id]] = value
+
+    # Observed p-values give new questions a sensible starting difficulty
+    correct = np.bincount(matrix.items, matrix.outcomes, n_items)
+    p = (correct + 0.5) / (matrix.responses_per_item() + 1)
+    difficulty = -np.log(p / (1 - p))
+    discrimination = np.ones(n_items)
+    item_positions = {qid: j for j, qid in enumerate(matrix.question_ids.tolist())}
+    stored = QuestionStats.objects.filter(
+        question_id__in=item_positions, irt_difficulty__isnull=False
+    ).values_list('question_id', 'irt_difficulty', 'irt_discrimination')
+    for question_id, b, a in stored:
+        difficulty[item_positions[question_id]] = b
+        discrimination[item_positions[question_id]] = a or 1.0
+    return theta, difficulty, discrimination
+
+
+def save_fit(matrix, result, update_labels=True, min_responses=30):
+    """Stores abilities and item parameters; optionally relabels Question.difficulty."""
+    item_responses = matrix.responses_per_item()
+    person_responses = matrix.responses_per_person()
+    exams = dict(Question.objects.filter(id__in=matrix.question_ids.tolist()).values_list('id', 'exam_id'))
+
+    QuestionStats.objects.bulk_create(
+        [
+            QuestionStats(
+                question_id=question_id,
+                exam_id=exams[question_id],
+                irt_difficulty=round(float(result['difficulty'][j]), 4),
+                irt_discrimination=round(float(result['discrimination'][j]), 4),
+                irt_responses=int(item_responses[j]),
+            )
+            for j, question_id in enumerate(matrix.question_ids.tolist())
+            if question_id in exams
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['question'],
+        update_fields=['irt_difficulty', 'irt_discrimination', 'irt_responses'],
+    )
+
+    UserAbility.objects.bulk_create(
+        [
+            UserAbility(
+                user_id=user_id,
+                theta=round(float(result['theta'][i]), 4),
+                standard_error=round(float(result['theta_se'][i]), 4),
+                responses=int(person_responses[i]),
+            )
+            for i, user_id in enumerate(matrix.person_keys.tolist())
+            if user_id > 0
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['theta', 'standard_error', 'responses', 'fitted_at'],
+    )
+
+    relabelled = 0
+    if update_labels:
+        questions = Question.objects.filter(id__in=[
+            question_id for j, question_id in enumerate(matrix.question_ids.tolist())
+            if item_responses[j] >= min_responses
+        ]).only('id', 'difficulty')
+        positions = {qid: j for j, qid in enumerate(matrix.question_ids.tolist())}
+        changed = []
+        for question in questions:
+            label = difficulty_label(result['difficulty'][positions[question.id]])
+            if question.difficulty != label:
+                question.difficulty = label
+                changed.append(question)
+        Question.objects.bulk_update(changed, ['difficulty'], batch_size=1000)
+        relabelled = len(changed)
+        if changed:
+            _relabelled(changed, exams)
+    return relabelled
+
+
+def _relabelled(questions, exams):
+    """
+    Does what post_save would have done for the relabelled questions:
+    bulk_update sends no signals, so refresh their search documents and
+    invalidate the practice buckets and the cached exam payloads.
+    """
+    search.index_questions([question.id for question in questions])
+    exam_ids = {exams[question.id] for question in questions}
+    transaction.on_commit(lambda: quiz_cache.invalidate(
+        quiz_cache.PRACTICE, *(quiz_cache.tag('exam', exam_id) for exam_id in exam_ids)
+    ))
+
+
+def synthetic_matrix(users, questions, per_user, model='2pl', seed=0):
+    """Simulated responses for benchmarking; returns (matrix, true difficulty)."""
+    rng = np.random.default_rng(seed)
+    theta = rng.normal(0, 1, users)
+    b = rng.normal(0, 1, questions)
+    a = rng.lognormal(0, 0.3, questions) if model == '2pl' else np.ones(questions)
+    persons = np.repeat(np.arange(1, users + 1, dtype=np.int64), per_user)
+    items = rng.integers(1, questions + 1, users * per_user)
+    p = _sigmoid(a[items - 1] * (theta[persons - 1] - b[items - 1]))
+    outcomes = (rng.random(len(p)) < p).astype(np.int8)
+    matrix = ResponseMatrix(persons, items, outcomes)
+    return matrix, b[matrix.question_ids - 1]
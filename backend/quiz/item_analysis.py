@@ -0,0 +1,191 @@
+"""
+Batch item analysis (QuestionStats) with NumPy.
+
+For each exam, the answers of every submitted attempt are streamed from
+UserAnswer, then from packed attempts, grouped by attempt and CHUNK_ROWS at
+a time. Each chunk becomes a few integer arrays, and np.bincount folds them
+into per-question running sums:
+
+    correct    sum of x            (x = 1 if the answer is correct)
+    cross      sum of x * T        (T = the attempt's number correct)
+    responses  answered count
+    options    times each option was selected
+
+plus exam-wide sum T and sum T^2. The point-biserial correlation between x
+and the rest score R = T - x follows from these sums alone, so memory is one
+chunk plus O(questions + options) however many rows an exam has. An
+attempt's rows are never split across chunks, so T is complete when they are
+folded in. Unanswered questions count as incorrect.
+"""
+import math
+import time
+from itertools import chain, islice
+
+import numpy as np
+
+from .models import ExamAttempt, QuestionStats, UserAnswer
+from .packing import answer_key_for, iter_packed_answers
+
+CHUNK_ROWS = 200_000
+
+
+class ExamAccumulator:
+    """Running per-question sums for one exam's answer key."""
+
+    def __init__(self, key):
+        self.question_ids = np.array(sorted(key.entries), dtype=np.int64)
+        option_ids = [
+            answer_id
+            for question_id in self.question_ids.tolist()
+            for answer_id in key.entries[question_id][2]
+        ]
+        self.option_ids = np.array(option_ids, dtype=np.int64)
+        self._option_order = np.argsort(self.option_ids, kind='stable')
+        self._sorted_option_ids = self.option_ids[self._option_order]
+
+        n = len(self.question_ids)
+        self.correct = np.zeros(n, dtype=np.int64)
+        self.cross = np.zeros(n, dtype=np.float64)
+        self.responses = np.zeros(n, dtype=np.int64)
+        self.options = np.zeros(len(option_ids), dtype=np.int64)
+        self.sum_t = 0.0
+        self.sum_t2 = 0.0
+        self.rows = 0
+
+    @staticmethod
+    def _lookup(sorted_ids, values):
+        """Positions of `values` in `sorted_ids` and a mask of the ones found."""
+        if not len(sorted_ids):
+            return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+        pos = np.searchsorted(sorted_ids, values)
+        pos = np.minimum(pos, len(sorted_ids) - 1)
+        return pos, sorted_ids[pos] == values
+
+    def add(self, attempt_ids, question_ids, answer_ids, is_correct):
+        """Folds in the rows of complete attempts (answer id -1 = no option selected)."""
+        self.rows += len(attempt_ids)
+        q, known = self._lookup(self.question_ids, question_ids)
+        attempt_ids, q, answer_ids = attempt_ids[known], q[known], answer_ids[known]
+        x = is_correct[known].astype(np.int64)
+
+        _, attempt = np.unique(attempt_ids, return_inverse=True)
+        totals = np.bincount(attempt, weights=x)
+        self.sum_t += totals.sum()
+        self.sum_t2 += np.square(totals).sum()
+
+        n = len(self.question_ids)
+        self.correct += np.bincount(q, weights=x, minlength=n).astype(np.int64)
+        self.cross += np.bincount(q, weights=x * totals[attempt], minlength=n)
+        self.responses += np.bincount(q, minlength=n)
+
+        selected = answer_ids[answer_ids >= 0]
+        pos, found = self._lookup(self._sorted_option_ids, selected)
+        self.options += np.bincount(self._option_order[pos[found]], minlength=len(self.options))
+
+    def statistics(self, attempts):
+        """Per-question (p_value, point_biserial) arrays over `attempts` submitted attempts."""
+        if not attempts:
+            nan = np.full(len(self.question_ids), np.nan)
+            return nan, nan
+        n = float(attempts)
+        x_sum = self.correct.astype(np.float64)
+        p = x_sum / n
+
+        r_sum = self.sum_t - x_sum
+        r_sq_sum = self.sum_t2 - 2 * self.cross + x_sum
+        xr_sum = self.cross - x_sum
+
+        cov = xr_sum / n - p * (r_sum / n)
+        var_r = r_sq_sum / n - np.square(r_sum / n)
+        denom = np.sqrt(np.clip(p * (1 - p), 0, None) * np.clip(var_r, 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            point_biserial = np.where(denom > 1e-12, cov / denom, np.nan)
+        return p, point_biserial
+
+
+# ---------------------------------
+# STREAMING
+# ---------------------------------
+def _answer_rows(exam_id):
+    """(attempt_id, question_id, answer_id, is_correct) for submitted attempts, grouped by attempt."""
+    attempts = ExamAttempt.objects.filter(exam_id=exam_id, state='submitted')
+    rows = UserAnswer.objects.filter(attempt__in=attempts).order_by('attempt_id').values_list(
+        'attempt_id', 'question_id', 'selected_answer_id', 'is_correct'
+    )
+    return chain(rows.iterator(chunk_size=5000), iter_packed_answers(attempts.order_by('id')))
+
+
+def _to_arrays(batch):
+    count = len(batch)
+    attempt_ids, question_ids, answer_ids, is_correct = zip(*batch)
+    return (
+        np.fromiter(attempt_ids, dtype=np.int64, count=count),
+        np.fromiter(question_ids, dtype=np.int64, count=count),
+        np.fromiter((-1 if a is None else a for a in answer_ids), dtype=np.int64, count=count),
+        np.fromiter((bool(c) for c in is_correct), dtype=bool, count=count),
+    )
+
+
+def iter_attempt_chunks(rows, chunk_rows=CHUNK_ROWS):
+    """Yields column arrays of about `chunk_rows` rows, never splitting an attempt."""
+    carry = []
+    while True:
+        batch = carry + list(islice(rows, chunk_rows))
+        exhausted = len(batch) - len(carry) < chunk_rows
+        if not batch:
+            return
+        arrays = _to_arrays(batch)
+        if exhausted:
+            yield arrays
+            return
+
+        # Hold back the last attempt: its remaining rows are in the next chunk
+        attempt_ids = arrays[0]
+        boundary = np.flatnonzero(attempt_ids != attempt_ids[-1])
+        cut = int(boundary[-1]) + 1 if len(boundary) else 0
+        carry = batch[cut:]
+        if cut:
+            yield tuple(column[:cut] for column in arrays)
+
+
+def _clean(value):
+    return None if math.isnan(value) else round(float(value), 4)
+
+
+def analyze_exam(exam_id, chunk_rows=CHUNK_ROWS):
+    """Recomputes QuestionStats for an exam. Returns (rows read, seconds)."""
+    started = time.monotonic()
+    key = answer_key_for(exam_id)
+    if key is None or not len(key):
+        return 0, time.monotonic() - started
+
+    accumulator = ExamAccumulator(key)
+    for arrays in iter_attempt_chunks(_answer_rows(exam_id), chunk_rows):
+        accumulator.add(*arrays)
+
+    attempts = ExamAttempt.objects.filter(exam_id=exam_id, state='submitted').count()
+    p_values, point_biserials = accumulator.statistics(attempts)
+
+    option_counts = dict(zip(accumulator.option_ids.tolist(), accumulator.options.tolist()))
+    stats = [
+        QuestionStats(
+            question_id=question_id,
+            exam_id=exam_id,
+            attempts=attempts,
+            responses=int(accumulator.responses[i]),
+            correct=int(accumulator.correct[i]),
+            p_value=_clean(p_values[i]),
+            point_biserial=_clean(point_biserials[i]),
+            option_counts={str(a): option_counts[a] for a in key.entries[question_id][2]},
+        )
+        for i, question_id in enumerate(accumulator.question_ids.tolist())
+    ]
+    QuestionStats.objects.filter(exam_id=exam_id).exclude(question_id__in=key.entries).delete()
+    QuestionStats.objects.bulk_create(
+        stats,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['question'],
+        update_fields=['exam', 'attempts', 'responses', 'correct', 'p_value', 'point_biserial', 'option_counts', 'computed_at'],
+    )
+    return accumulator.rows, time.monotonic() - started
@@ -0,0 +1,236 @@
+"""
+Redis connection used by the quiz app, plus a small in-process stand-in.
+
+Set QUIZ_REDIS_URL to a redis:// URL for production (docker-compose already
+runs Redis), or to 'local://' to use LocalRedis, which keeps everything in
+the current process. LocalRedis only implements the commands the quiz app
+uses and is meant for tests, benchmarks and single-process local runs.
+"""
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+RedisError = redis.exceptions.RedisError
+ResponseError = redis.exceptions.ResponseError
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                url = getattr(settings, 'QUIZ_REDIS_URL', settings.REDIS_URL)
+                if url.startswith('local://'):
+                    _client = LocalRedis()
+                else:
+                    _client = redis.Redis.from_url(url, decode_responses=True)
+    return _client
+
+
+class LocalRedis:
+    """
+    Thread-safe, in-memory subset of the redis-py client API.
+    Values are returned as str, like a client with decode_responses=True.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    # --- internals ---
+    def _alive(self, name):
+        deadline = self._expires.get(name)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+        return name in self._data
+
+    def _get(self, name, factory):
+        if not self._alive(name):
+            self._data[name] = factory()
+        return self._data[name]
+
+    # --- keys ---
+    def exists(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._alive(name))
+
+    def delete(self, *names):
+        with self._lock:
+            removed = 0
+            for name in names:
+                if self._alive(name):
+                    del self._data[name]
+                    removed += 1
+                self._expires.pop(name, None)
+            return removed
+
+    def expire(self, name, seconds):
+        with self._lock:
+            if not self._alive(name):
+                return False
+            self._expires[name] = time.monotonic() + seconds
+            return True
+
+    def rename(self, src, dst):
+        with self._lock:
+            if not self._alive(src):
+                raise ResponseError('no such key')
+            self._data[dst] = self._data.pop(src)
+            self._expires.pop(dst, None)
+            if src in self._expires:
+                self._expires[dst] = self._expires.pop(src)
+            return True
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            return True
+
+    # --- hashes ---
+    def hset(self, name, key=None, value=None, mapping=None):
+        with self._lock:
+            h = self._get(name, dict)
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            added = sum(1 for k in items if str(k) not in h)
+            h.update({str(k): str(v) for k, v in items.items()})
+            return added
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._data[name]) if self._alive(name) else {}
+
+    def hlen(self, name):
+        with self._lock:
+            return len(self._data[name]) if self._alive(name) else 0
+
+    def hincrby(self, name, key, amount=1):
+        with self._lock:
+            h = self._get(name, dict)
+            value = int(h.get(str(key), 0)) + amount
+            h[str(key)] = str(value)
+            return value
+
+    def hmget(self, name, keys):
+        with self._lock:
+            h = self._data[name] if self._alive(name) else {}
+            return [h.get(str(k)) for k in keys]
+
+    # --- sets ---
+    def sadd(self, name, *values):
+        with self._lock:
+            s = self._get(name, set)
+            before = len(s)
+            s.update(str(v) for v in values)
+            return len(s) - before
+
+    def srem(self, name, *values):
+        with self._lock:
+            if not self._alive(name):
+                return 0
+            s = self._data[name]
+            before = len(s)
+            s.difference_update(str(v) for v in values)
+            return before - len(s)
+
+    def smembers(self, name):
+        with self._lock:
+            return set(self._data[name]) if self._alive(name) else set()
+
+    # --- sorted sets ---
+    # Ranges sort on demand, which is fine for the sizes LocalRedis is used with.
+    def _ordered(self, name):
+        z = self._data[name] if self._alive(name) else {}
+        return sorted(z.items(), key=lambda item: (item[1], item[0]), reverse=True)
+
+    def zadd(self, name, mapping):
+        with self._lock:
+            z = self._get(name, dict)
+            added = sum(1 for member in mapping if str(member) not in z)
+            z.update({str(member): float(score) for member, score in mapping.items()})
+            return added
+
+    def zincrby(self, name, amount, value):
+        with self._lock:
+            z = self._get(name, dict)
+            z[str(value)] = z.get(str(value), 0.0) + amount
+            return z[str(value)]
+
+    def zrem(self, name, *values):
+        with self._lock:
+            if not self._alive(name):
+                return 0
+            z = self._data[name]
+            return sum(1 for v in values if z.pop(str(v), None) is not None)
+
+    def zscore(self, name, value):
+        with self._lock:
+            return self._data[name].get(str(value)) if self._alive(name) else None
+
+    def zcard(self, name):
+        with self._lock:
+            return len(self._data[name]) if self._alive(name) else 0
+
+    def zcount(self, name, min, max):
+        def bound(value):
+            value = str(value)
+            if value.startswith('('):
+                return float(value[1:]), True
+            return float(value), False
+
+        (low, low_open), (high, high_open) = bound(min), bound(max)
+        with self._lock:
+            z = self._data[name] if self._alive(name) else {}
+            return sum(
+                1 for score in z.values()
+                if (score > low if low_open else score >= low) and (score < high if high_open else score <= high)
+            )
+
+    def zrevrank(self, name, value):
+        with self._lock:
+            for i, (member, _) in enumerate(self._ordered(name)):
+                if member == str(value):
+                    return i
+            return None
+
+    def zrevrange(self, name, start, end, withscores=False):
+        with self._lock:
+            items = self._ordered(name)
+            end = len(items) + end if end < 0 else end
+            items = items[start:end + 1]
+            return items if withscores else [member for member, _ in items]
+
+    # --- pipelines ---
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    """Queues LocalRedis commands and runs them at once on execute(), like redis-py's Pipeline."""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._client._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
@@ -0,0 +1,187 @@
+"""
+Per-exam leaderboard backed by LeaderboardEntry (one best result per user).
+
+Entries are updated incrementally from grading.submit_attempt. Pages are
+read with keyset pagination over the (exam, -score, achieved_at, id) index.
+Ranks follow RANK() OVER (ORDER BY score DESC) but are computed from the
+page itself plus one count of the entries before the cursor: a window over
+the exam would rank every entry before LIMIT applies, and a deep page never
+scans the rows above it more than once.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Count, Q, Sum
+
+from .models import ExamAttempt, LeaderboardEntry, UserAnswer, UserExamResult
+from .packing import answer_key_for, iter_packed_answers
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+REBUILD_BATCH = 5000
+
+
+# ---------------------------------
+# INCREMENTAL UPDATES
+# ---------------------------------
+def record_result(result):
+    """Keeps the user's best result for the exam. Guests are not ranked."""
+    if not result.user_id:
+        return
+    entry = LeaderboardEntry.objects.filter(exam_id=result.exam_id, user_id=result.user_id).first()
+    if entry is None:
+        LeaderboardEntry.objects.create(
+            exam_id=result.exam_id,
+            user_id=result.user_id,
+            score=result.score,
+            total_questions=result.total_questions,
+            percentage=result.percentage,
+            achieved_at=result.completed_at,
+        )
+    elif result.score > entry.score:
+        entry.score = result.score
+        entry.total_questions = result.total_questions
+        entry.percentage = result.percentage
+        entry.achieved_at = result.completed_at
+        entry.save(update_fields=['score', 'total_questions', 'percentage', 'achieved_at'])
+
+
+def _best_attempts(exam_id, user_ids=None):
+    """
+    {user_id: (score, correct_answers, total_questions, achieved_at)} from
+    each registered user's best submitted attempt, the earlier one on ties,
+    like record_result. Attempts are scored from their stored correctness
+    (kept current by regrade), in batches of REBUILD_BATCH attempts.
+    """
+    key = answer_key_for(exam_id)
+    if key is None:
+        return {}
+    best = {}
+
+    def offer(user_id, score, correct, total, achieved_at):
+        current = best.get(user_id)
+        if current is None or score > current[0] or (score == current[0] and achieved_at < current[3]):
+            best[user_id] = (score, correct, total, achieved_at)
+
+    attempts = ExamAttempt.objects.filter(exam_id=exam_id, state='submitted', user__isnull=False)
+    results = UserExamResult.objects.filter(exam_id=exam_id, user__isnull=False, attempt__isnull=True)
+    if user_ids is not None:
+        attempts = attempts.filter(user_id__in=user_ids)
+        results = results.filter(user_id__in=user_ids)
+
+    last_id = 0
+    while True:
+        batch = list(
+            attempts.filter(id__gt=last_id).order_by('id').values_list('id', 'user_id', 'finished_at')[:REBUILD_BATCH]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        ids = [attempt_id for attempt_id, _, _ in batch]
+        scores = dict.fromkeys(ids, (0, 0))
+        rows = UserAnswer.objects.filter(attempt_id__in=ids, is_correct=True).values_list('attempt_id').annotate(
+            score=Sum('question__points'), correct=Count('id')
+        )
+        for attempt_id, score, correct in rows:
+            scores[attempt_id] = (score or 0, correct)
+        for attempt_id, question_id, _, is_correct in iter_packed_answers(ExamAttempt.objects.filter(id__in=ids)):
+            if is_correct and question_id in key:
+                score, correct = scores[attempt_id]
+                scores[attempt_id] = (score + key.entries[question_id][1], correct + 1)
+        for attempt_id, user_id, finished_at in batch:
+            offer(user_id, *scores[attempt_id], len(key), finished_at)
+
+    # Results detached from their attempt (a shared browser moved it) still count
+    for row in results.values_list('user_id', 'score', 'correct_answers', 'total_questions', 'completed_at'):
+        offer(*row)
+    return best
+
+
+def rebuild_exam_leaderboard(exam_id, user_ids=None):
+    """
+    Recomputes an exam's entries, or only those of `user_ids`, from each
+    user's best submitted attempt. Returns the number of entries written.
+    """
+    best = _best_attempts(exam_id, user_ids)
+    entries = [
+        LeaderboardEntry(
+            exam_id=exam_id,
+            user_id=user_id,
+            score=score,
+            total_questions=total,
+            percentage=round(correct / total * 100, 2) if total else 0,
+            achieved_at=achieved_at,
+        )
+        for user_id, (score, correct, total, achieved_at) in best.items()
+    ]
+    stale = LeaderboardEntry.objects.filter(exam_id=exam_id)
+    if user_ids is not None:
+        stale = stale.filter(user_id__in=user_ids)
+    stale.delete()
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+# ---------------------------------
+# READS
+# ---------------------------------
+def _encode_cursor(entry):
+    raw = f"{entry.score}|{entry.achieved_at.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        score, achieved_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return int(score), datetime.fromisoformat(achieved_at), int(entry_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def exam_leaderboard_page(exam_id, cursor=None, limit=PAGE_SIZE):
+    """
+    Returns (entries, next_cursor). Each entry has a `rank` attribute;
+    tied scores share a rank, as with SQL RANK().
+    """
+    entries = LeaderboardEntry.objects.filter(exam_id=exam_id)
+    offset_tied = offset_below = 0
+
+    if cursor:
+        score, achieved_at, entry_id = _decode_cursor(cursor)
+        at_or_before = Q(score=score) & (
+            Q(achieved_at__lt=achieved_at) | Q(achieved_at=achieved_at, id__lte=entry_id)
+        )
+        counts = entries.aggregate(
+            above=Count('id', filter=Q(score__gt=score)),
+            tied=Count('id', filter=at_or_before),
+        )
+        # Rows still tied with the cursor rank right after everything above it;
+        # lower scores rank after everything up to and including the cursor.
+        offset_tied = counts['above']
+        offset_below = counts['above'] + counts['tied']
+        entries = entries.filter(
+            Q(score__lt=score) | (Q(score=score) & ~at_or_before)
+        )
+
+    page = list(entries.select_related('user').order_by('-score', 'achieved_at', 'id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    # Rows tied with the cursor keep its rank; each new score ranks at its position
+    previous_score, rank = (score, offset_tied + 1) if cursor else (None, None)
+    for position, entry in enumerate(page, start=offset_below + 1):
+        if entry.score != previous_score:
+            previous_score, rank = entry.score, position
+        entry.rank = rank
+
+    next_cursor = _encode_cursor(page[-1]) if has_more else None
+    return page, next_cursor
+
+
+def exam_rank_of(exam_id, user):
+    """The user's entry for the exam with its rank, or None. One indexed count."""
+    entry = LeaderboardEntry.objects.filter(exam_id=exam_id, user=user).first()
+    if entry is None:
+        return None
+    entry.rank = LeaderboardEntry.objects.filter(exam_id=exam_id, score__gt=entry.score).count() + 1
+    return entry
@@ -0,0 +1,42 @@
+"""
+Computes item statistics (p-value, point-biserial, option counts) for every
+question into QuestionStats, streaming answers in bounded memory
+(see quiz/item_analysis.py). Reports throughput in rows/sec.
+
+Usage:
+    python manage.py analyze_items
+    python manage.py analyze_items --exam 12 --chunk-rows 500000
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz.item_analysis import CHUNK_ROWS, analyze_exam
+from quiz.models import ExamAttempt
+
+
+class Command(BaseCommand):
+    help = 'Recomputes per-question item analysis statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', type=int, help='Limit to one exam id')
+        parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Answer rows per NumPy chunk')
+
+    def handle(self, *args, **options):
+        if options['exam']:
+            exam_ids = [options['exam']]
+        else:
+            exam_ids = ExamAttempt.objects.filter(state='submitted').values_list(
+                'exam_id', flat=True
+            ).distinct().order_by('exam_id')
+
+        total_rows = total_seconds = 0
+        for exam_id in exam_ids:
+            rows, seconds = analyze_exam(exam_id, options['chunk_rows'])
+            total_rows += rows
+            total_seconds += seconds
+            self.stdout.write(f'Exam {exam_id}: {rows} rows in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/sec)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Analyzed {total_rows} answer rows in {total_seconds:.2f}s '
+            f'({total_rows / max(total_seconds, 1e-9):,.0f} rows/sec).'
+        ))
@@ -0,0 +1,120 @@
+"""
+Load benchmark for write-behind answer buffering (quiz/answer_buffer.py).
+Simulates an exam start: every session clicks an answer for every
+question, once through the direct path submit_answer uses without
+buffering (open_attempt + update_or_create per click) and once into the
+Redis buffer, which is then flushed to UserAnswer in bulk. Reports clicks
+per second and database statements per click for both. Uses the in-process
+LocalRedis unless --redis-url points at a real server. The exam and
+answers are inserted inside a transaction that is rolled back at the end.
+
+Usage:
+    python manage.py benchmark_answer_buffer
+    python manage.py benchmark_answer_buffer --sessions 2000 --redis-url redis://localhost:6379/15
+"""
+
+import time
+import uuid
+
+import redis
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from quiz import answer_buffer, kv
+from quiz.grading import open_attempt
+from quiz.models import Answer, Exam, Question, UserAnswer
+
+OPTIONS = 4
+
+
+class _StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Compares direct answer writes with Redis write-behind buffering under exam-start load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=500)
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--redis-url', default='local://', help="A redis:// URL, or 'local://' for LocalRedis")
+
+    def _report(self, label, clicks, seconds, statements):
+        self.stdout.write(
+            f'  {label:<26} {clicks / seconds:9.0f} clicks/s   {statements / clicks:6.2f} DB statements/click'
+        )
+
+    def handle(self, *args, **options):
+        url = options['redis_url']
+        # The buffer reads the shared client; point it at the benchmark's Redis
+        kv._client = kv.LocalRedis() if url.startswith('local://') else redis.Redis.from_url(url, decode_responses=True)
+        sessions = [uuid.uuid4().hex for _ in range(options['sessions'])]
+        with transaction.atomic():
+            exam = Exam.objects.create(title='Answer buffer benchmark', status='published')
+            questions = Question.objects.bulk_create(
+                Question(exam=exam, question_text=f'Benchmark question {i}', order=i)
+                for i in range(options['questions'])
+            )
+            answers = Answer.objects.bulk_create(
+                Answer(question=question, answer_text=f'Option {j}', is_correct=j == 0, order=j)
+                for question in questions
+                for j in range(OPTIONS)
+            )
+            # One paper per chosen option, so sessions differ in what they pick
+            papers = [
+                [(question.id, answers[i * OPTIONS + choice].id, choice == 0) for i, question in enumerate(questions)]
+                for choice in range(OPTIONS)
+            ]
+            total = len(sessions) * len(questions)
+            self.stdout.write(f'{len(sessions)} sessions x {len(questions)} questions = {total} clicks:')
+
+            counter = _StatementCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                for s, session_id in enumerate(sessions):
+                    for question_id, answer_id, is_correct in papers[s % OPTIONS]:
+                        attempt = open_attempt(exam.id, session_id)
+                        UserAnswer.objects.update_or_create(
+                            attempt=attempt,
+                            question_id=question_id,
+                            defaults={
+                                'exam_id': exam.id,
+                                'session_id': session_id,
+                                'selected_answer_id': answer_id,
+                                'text_answer': '',
+                                'is_correct': is_correct,
+                            },
+                        )
+            self._report('direct update_or_create', total, time.perf_counter() - started, counter.count)
+            direct_rows = UserAnswer.objects.filter(exam=exam).count()
+
+            # Same load again on fresh sessions, into the buffer
+            sessions = [uuid.uuid4().hex for _ in sessions]
+            counter = _StatementCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                for s, session_id in enumerate(sessions):
+                    for question_id, answer_id, is_correct in papers[s % OPTIONS]:
+                        answer_buffer.buffer_answer(exam.id, session_id, question_id, answer_id, '', is_correct)
+            buffered_seconds = time.perf_counter() - started
+            self._report('buffered in Redis', total, buffered_seconds, counter.count)
+
+            counter = _StatementCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                flushed_sessions, flushed = answer_buffer.flush_all()
+            flush_seconds = time.perf_counter() - started
+            self.stdout.write(
+                f'  flush_all                  {flushed} answers from {flushed_sessions} sessions in '
+                f'{flush_seconds:.2f}s ({flushed / flush_seconds:.0f} rows/s, {counter.count} statements)'
+            )
+            self._report('buffered, including flush', total, buffered_seconds + flush_seconds, counter.count)
+            buffered_rows = UserAnswer.objects.filter(exam=exam).count() - direct_rows
+            assert buffered_rows == direct_rows == total, (direct_rows, buffered_rows, total)
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic exam.'))
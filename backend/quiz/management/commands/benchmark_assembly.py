@@ -0,0 +1,111 @@
+"""
+Measures mock paper assembly (quiz/assembly.py) on a synthetic question
+bank: picking questions for a blueprint from the cached buckets, with and
+without a long list of questions the user has already seen, and writing
+the exam with its question and option copies. One ORDER BY RANDOM() query
+per (section, difficulty) is timed alongside for comparison. The rows are
+inserted inside a transaction that is rolled back at the end, so the
+database is unchanged.
+
+Usage:
+    python manage.py benchmark_assembly
+    python manage.py benchmark_assembly --questions 500000 --seen 5000
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quiz import cache as quiz_cache
+from quiz.assembly import apportion, create_exam, parse_blueprint, pick_questions
+from quiz.models import Answer, Exam, Question
+
+BATCH_SIZE = 5000
+OPTIONS = 4
+REPEAT = 20
+SUBJECTS = ('Reasoning', 'Quantitative Aptitude', 'English', 'General Awareness')
+TOPICS_PER_SUBJECT = 10
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+
+BLUEPRINT = {
+    'title': 'Benchmark mock paper',
+    'sections': [{'subject': subject, 'count': 25} for subject in SUBJECTS],
+    'difficulty_mix': {'Easy': 30, 'Medium': 50, 'Hard': 20},
+}
+
+
+def _timings_ms(fn, repeat=REPEAT):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks blueprint mock paper assembly on a synthetic question bank'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=500_000)
+        parser.add_argument('--seen', type=int, default=5000, help='Size of the already-seen list')
+
+    def _report(self, label, timings):
+        self.stdout.write(f'  {label:<28} p50 {np.percentile(timings, 50):8.2f} ms   max {max(timings):8.2f} ms')
+
+    def handle(self, *args, **options):
+        total = options['questions']
+        blueprint = parse_blueprint(BLUEPRINT)
+        rng = np.random.default_rng(0)
+        with transaction.atomic():
+            started = time.monotonic()
+            exams = Exam.objects.bulk_create(
+                Exam(title=f'Assembly benchmark {i}', status='published') for i in range(100)
+            )
+            for start in range(0, total, BATCH_SIZE):
+                questions = Question.objects.bulk_create(
+                    Question(
+                        exam=exams[i % len(exams)],
+                        question_text=f'Bank question {i}',
+                        subject=SUBJECTS[i % len(SUBJECTS)],
+                        topic=f'Topic {i // len(SUBJECTS) % TOPICS_PER_SUBJECT}',
+                        difficulty=DIFFICULTIES[i // 7 % len(DIFFICULTIES)],
+                    )
+                    for i in range(start, min(start + BATCH_SIZE, total))
+                )
+                Answer.objects.bulk_create(
+                    Answer(question=question, answer_text=f'Option {j}', is_correct=j == 0, order=j)
+                    for question in questions
+                    for j in range(OPTIONS)
+                )
+            # bulk_create sends no signals
+            quiz_cache.invalidate(quiz_cache.CATALOG, quiz_cache.PRACTICE)
+            self.stdout.write(f'Inserted {total} questions in {time.monotonic() - started:.1f}s; 4 x 25 question blueprint:')
+
+            def order_by_random():
+                for section in blueprint['sections']:
+                    for difficulty, share in apportion(section['count'], section['difficulty_mix']).items():
+                        list(Question.objects.filter(subject=section['subject'], difficulty=difficulty)
+                             .order_by('?').values_list('id', flat=True)[:share])
+
+            self._report('ORDER BY RANDOM() per cell', _timings_ms(order_by_random, repeat=3))
+            self._report('pick, bucket rebuild', _timings_ms(lambda: pick_questions(blueprint, rng=rng), repeat=1))
+            self._report('pick, warm', _timings_ms(lambda: pick_questions(blueprint, rng=rng)))
+
+            ids = Question.objects.values_list('id', flat=True)[:options['seen'] * 4]
+            seen = set(rng.choice(list(ids), size=min(options['seen'], len(ids)), replace=False).tolist())
+            self._report(f'pick, {len(seen)} seen', _timings_ms(lambda: pick_questions(blueprint, seen, rng=rng)))
+
+            picks = [pick_questions(blueprint, rng=rng) for _ in range(REPEAT)]
+            self._report('create exam and copies', _timings_ms(lambda: create_exam(blueprint, picks.pop())))
+
+            def assemble():
+                create_exam(blueprint, pick_questions(blueprint, seen, rng=rng))
+
+            self._report('pick + create', _timings_ms(assemble))
+            transaction.set_rollback(True)
+        # The cached buckets describe the rolled-back rows
+        quiz_cache.invalidate(quiz_cache.CATALOG, quiz_cache.PRACTICE)
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic questions.'))
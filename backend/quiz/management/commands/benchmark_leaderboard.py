@@ -0,0 +1,124 @@
+"""
+Measures the per-exam leaderboard (quiz/leaderboard.py) on one exam with
+--results registered users, each with one submitted, packed attempt and
+its result: the old read (every result loaded into Python, deduplicated
+and sorted), a full rebuild from attempts, the first page, a page from a
+cursor half way down, the "my rank" lookup and the incremental update on
+submit. The rows are inserted inside a transaction that is rolled back at
+the end, so the database is unchanged.
+
+Usage:
+    python manage.py benchmark_leaderboard
+    python manage.py benchmark_leaderboard --results 100000
+"""
+
+import time
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from quiz import leaderboard
+from quiz.models import Answer, Exam, ExamAttempt, LeaderboardEntry, Question, UserExamResult
+from quiz.packing import pack_arrays
+
+BATCH_SIZE = 5000
+QUESTIONS = 20
+REPEAT = 50
+
+
+def _timings_ms(fn, repeat=REPEAT):
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks per-exam leaderboard reads, rank lookups and rebuilds at 1M results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--results', type=int, default=1_000_000)
+
+    def _report(self, label, timings):
+        self.stdout.write(f'  {label:<34} p50 {np.percentile(timings, 50):9.2f} ms   max {max(timings):9.2f} ms')
+
+    def _insert(self, exam, total, rng):
+        questions = Question.objects.bulk_create(
+            Question(exam=exam, question_text=f'Leaderboard question {i}', order=i) for i in range(QUESTIONS)
+        )
+        answers = Answer.objects.bulk_create(
+            Answer(question=question, answer_text=f'Option {j}', is_correct=j == 0, order=j)
+            for question in questions
+            for j in range(2)
+        )
+        question_ids = np.array([q.id for q in questions])
+        right, wrong = np.array([a.id for a in answers[0::2]]), np.array([a.id for a in answers[1::2]])
+        now = timezone.now()
+        for start in range(0, total, BATCH_SIZE):
+            count = min(BATCH_SIZE, total - start)
+            users = User.objects.bulk_create(
+                User(username=f'leaderboard-benchmark-{start + i}', password='!') for i in range(count)
+            )
+            correct = rng.random((count, QUESTIONS)) < rng.random((count, 1))
+            finished = [now - timezone.timedelta(seconds=int(s)) for s in rng.integers(0, 10 ** 7, count)]
+            attempts = ExamAttempt.objects.bulk_create(
+                ExamAttempt(
+                    exam=exam, user=user, session_id=f'leaderboard-benchmark-{user.id}', state='submitted',
+                    finished_at=finished[i], compacted_at=now,
+                    packed_answers=pack_arrays(question_ids, np.where(correct[i], right, wrong), correct[i]),
+                )
+                for i, user in enumerate(users)
+            )
+            UserExamResult.objects.bulk_create(
+                UserExamResult(
+                    attempt=attempt, user=attempt.user, exam=exam, session_id=attempt.session_id,
+                    score=int(correct[i].sum()), correct_answers=int(correct[i].sum()), total_questions=QUESTIONS,
+                    percentage=round(correct[i].sum() / QUESTIONS * 100, 2), completed_at=finished[i],
+                )
+                for i, attempt in enumerate(attempts)
+            )
+        return UserExamResult.objects.filter(exam=exam).values_list('user_id', flat=True)
+
+    def handle(self, *args, **options):
+        total = options['results']
+        rng = np.random.default_rng(0)
+        with transaction.atomic():
+            started = time.monotonic()
+            exam = Exam.objects.create(title='Leaderboard benchmark', status='published')
+            user_ids = list(self._insert(exam, total, rng))
+            self.stdout.write(f'Inserted {total} users, attempts and results in {time.monotonic() - started:.1f}s:')
+
+            def old_read(_):
+                best = {}
+                results = UserExamResult.objects.filter(exam=exam).select_related('user', 'exam').order_by('user', '-score')
+                for result in results.iterator(chunk_size=BATCH_SIZE):
+                    best.setdefault(result.user_id, result)
+                sorted(best.values(), key=lambda result: result.score, reverse=True)
+
+            self._report('old: load, dedupe and sort all', _timings_ms(old_read, repeat=1))
+            self._report('rebuild_exam_leaderboard', _timings_ms(lambda _: leaderboard.rebuild_exam_leaderboard(exam.id), repeat=1))
+
+            self._report('first page (50)', _timings_ms(lambda _: leaderboard.exam_leaderboard_page(exam.id)))
+            middle = LeaderboardEntry.objects.filter(exam=exam).order_by('-score', 'achieved_at', 'id')[total // 2]
+            cursor = leaderboard._encode_cursor(middle)
+            self._report('page from a cursor half way down', _timings_ms(
+                lambda _: leaderboard.exam_leaderboard_page(exam.id, cursor)
+            ))
+            users = User.objects.in_bulk(rng.choice(user_ids, REPEAT, replace=False).tolist())
+            sample = list(users.values())
+            self._report('my rank', _timings_ms(lambda i: leaderboard.exam_rank_of(exam.id, sample[i])))
+
+            results = list(UserExamResult.objects.filter(user__in=sample))
+            for result in results:
+                result.score += 1
+            self._report('record_result (improved score)', _timings_ms(lambda i: leaderboard.record_result(results[i])))
+            self._report('rebuild for one user', _timings_ms(
+                lambda i: leaderboard.rebuild_exam_leaderboard(exam.id, [sample[i].id]), repeat=10
+            ))
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic results.'))
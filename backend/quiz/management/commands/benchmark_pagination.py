@@ -0,0 +1,77 @@
+"""
+Compares OFFSET and keyset (cursor) pagination latency at a shallow and a
+deep page on synthetic contact messages. The rows are inserted inside a
+transaction that is rolled back at the end, so the database is unchanged.
+
+Usage:
+    python manage.py benchmark_pagination
+    python manage.py benchmark_pagination --rows 500000 --page-size 20 --pages 1 5000 20000
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quiz.models import ContactMessage
+from quiz.pagination import keyset_before
+
+REPEAT = 5
+
+
+def _best_ms(fn):
+    best = float('inf')
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks OFFSET vs keyset pagination at shallow and deep pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 5000])
+
+    def handle(self, *args, **options):
+        rows, size = options['rows'], options['page_size']
+        with transaction.atomic():
+            started = time.monotonic()
+            ContactMessage.objects.bulk_create(
+                (
+                    ContactMessage(name=f'User {i}', email=f'user{i}@example.com', message='Benchmark message')
+                    for i in range(rows)
+                ),
+                batch_size=5000,
+            )
+            self.stdout.write(f'Inserted {rows} rows in {time.monotonic() - started:.1f}s')
+
+            ordered = ContactMessage.objects.order_by('-created_at', '-id')
+            for page in options['pages']:
+                offset = (page - 1) * size
+                if offset >= rows:
+                    self.stdout.write(self.style.WARNING(f'Page {page} is past the end; skipped'))
+                    continue
+
+                def offset_page():
+                    ContactMessage.objects.count()
+                    list(ordered[offset:offset + size])
+
+                # The cursor a client would hold after reading the previous page
+                anchor = ordered.values_list('created_at', 'id')[offset - 1] if offset else None
+
+                def keyset_page():
+                    queryset = ordered
+                    if anchor:
+                        created_at, pk = anchor
+                        queryset = queryset.filter(keyset_before('created_at', created_at, pk))
+                    list(queryset[:size + 1])
+
+                self.stdout.write(
+                    f'Page {page:>6}: OFFSET + COUNT {_best_ms(offset_page):8.2f} ms   '
+                    f'keyset {_best_ms(keyset_page):8.2f} ms'
+                )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic rows.'))
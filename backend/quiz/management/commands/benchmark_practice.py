@@ -0,0 +1,99 @@
+"""
+Compares drawing a random practice set with ORDER BY RANDOM() against the
+bucket sampler (quiz/practice.py), at growing question bank sizes. Reports
+the first draw after a change (which rebuilds the buckets) separately from
+warm draws, with and without a long "already seen" list. The rows are
+inserted inside a transaction that is rolled back at the end, so the
+database is unchanged.
+
+Usage:
+    python manage.py benchmark_practice
+    python manage.py benchmark_practice --sizes 100000 1000000 --count 20
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quiz import cache as quiz_cache
+from quiz.models import Exam, Question
+from quiz.practice import sample_questions
+
+BATCH_SIZE = 5000
+REPEAT = 20
+SUBJECTS = ('Reasoning', 'Quantitative Aptitude', 'English', 'General Awareness')
+TOPICS_PER_SUBJECT = 10
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+
+
+def _timings_ms(fn, repeat=REPEAT):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _summary(timings):
+    return f'p50 {np.percentile(timings, 50):8.2f} ms   max {max(timings):8.2f} ms'
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks ORDER BY RANDOM() against the bucket sampler for practice sets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+        parser.add_argument('--count', type=int, default=20)
+        parser.add_argument('--seen', type=int, default=5000, help='Size of the already-seen list')
+
+    def handle(self, *args, **options):
+        k = options['count']
+        rng = np.random.default_rng(0)
+        with transaction.atomic():
+            exams = Exam.objects.bulk_create(
+                Exam(title=f'Practice benchmark {i}', status='published') for i in range(100)
+            )
+            inserted = 0
+            for size in sorted(options['sizes']):
+                started = time.monotonic()
+                while inserted < size:
+                    batch = range(inserted, min(inserted + BATCH_SIZE, size))
+                    Question.objects.bulk_create(
+                        Question(
+                            exam=exams[i % len(exams)],
+                            question_text=f'Practice question {i}',
+                            subject=SUBJECTS[i % len(SUBJECTS)],
+                            topic=f'Topic {i // len(SUBJECTS) % TOPICS_PER_SUBJECT}',
+                            difficulty=DIFFICULTIES[i % len(DIFFICULTIES)],
+                        )
+                        for i in batch
+                    )
+                    inserted += len(batch)
+                # bulk_create sends no signals
+                quiz_cache.invalidate(quiz_cache.CATALOG, quiz_cache.PRACTICE)
+                self.stdout.write(f'{size} questions (inserted in {time.monotonic() - started:.1f}s), {k} Reasoning questions:')
+
+                def order_by_random():
+                    list(Question.objects.filter(subject='Reasoning').prefetch_related('answers').order_by('?')[:k])
+
+                self.stdout.write(f'  ORDER BY RANDOM()         {_summary(_timings_ms(order_by_random, repeat=5))}')
+
+                cold = _timings_ms(lambda: sample_questions(k, subject='Reasoning'), repeat=1)
+                self.stdout.write(f'  sampler, bucket rebuild   {_summary(cold)}')
+                self.stdout.write(
+                    f'  sampler, warm            {_summary(_timings_ms(lambda: sample_questions(k, subject="Reasoning")))}'
+                )
+
+                reasoning = Question.objects.filter(subject='Reasoning').values_list('id', flat=True)[:options['seen'] * 4]
+                seen = set(rng.choice(list(reasoning), size=min(options['seen'], len(reasoning)), replace=False).tolist())
+                self.stdout.write(
+                    f'  sampler, {len(seen)} seen      '
+                    f'{_summary(_timings_ms(lambda: sample_questions(k, subject="Reasoning", exclude=seen)))}'
+                )
+            transaction.set_rollback(True)
+        # The cached buckets describe the rolled-back rows
+        quiz_cache.invalidate(quiz_cache.CATALOG, quiz_cache.PRACTICE)
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic questions.'))
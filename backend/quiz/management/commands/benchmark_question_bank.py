@@ -0,0 +1,127 @@
+"""
+Measures question bank page latency (GET /api/questions/) at a shallow and
+a deep page for several filter combinations, on synthetic questions spread
+over many exams. Also prints the index the database picks for each query.
+The rows are inserted inside a transaction that is rolled back at the end,
+so the database is unchanged.
+
+Usage:
+    python manage.py benchmark_question_bank
+    python manage.py benchmark_question_bank --questions 1000000 --pages 1 1000 --plans
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from quiz.api import question_bank_queryset
+from quiz.models import Exam, Question
+from quiz.pagination import keyset_before
+
+BATCH_SIZE = 5000
+REPEAT = 5
+SUBJECTS = 8
+TOPICS_PER_SUBJECT = 5
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+
+FILTERS = (
+    ('no filter', {}),
+    ('subject', {'subject': 'Subject 3'}),
+    ('subject + topic', {'subject': 'Subject 3', 'topic': 'Topic 3.1'}),
+    ('topic', {'topic': 'Topic 3.1'}),
+    ('difficulty', {'difficulty': 'Hard'}),
+    ('year + subject', {'year': '2021', 'subject': 'Subject 3'}),
+    ('exam', {'exam': None}),  # filled in with a published exam
+)
+
+
+def _best_ms(fn):
+    best = float('inf')
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def _plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '; '.join(row[-1] for row in cursor.fetchall())
+        cursor.execute(f'EXPLAIN {sql}', params)
+        return '; '.join(row[0].strip() for row in cursor.fetchall() if 'Scan' in row[0])
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks question bank keyset pages across filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=200_000)
+        parser.add_argument('--exams', type=int, default=500)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 1000])
+        parser.add_argument('--plans', action='store_true', help='Print the query plan of each filter')
+
+    def handle(self, *args, **options):
+        total, size = options['questions'], options['page_size']
+        with transaction.atomic():
+            started = time.monotonic()
+            exams = Exam.objects.bulk_create(
+                Exam(
+                    title=f'Benchmark exam {i}',
+                    year=2015 + i % 10,
+                    # One exam in ten is unpublished
+                    status='draft' if i % 10 == 9 else 'published',
+                )
+                for i in range(options['exams'])
+            )
+            base = timezone.now() - timedelta(seconds=total)
+            for start in range(0, total, BATCH_SIZE):
+                batch = []
+                for i in range(start, min(start + BATCH_SIZE, total)):
+                    subject = i % SUBJECTS
+                    batch.append(Question(
+                        exam=exams[i // 7 % len(exams)],
+                        question_text=f'Benchmark question {i}',
+                        subject=f'Subject {subject}',
+                        topic=f'Topic {subject}.{i // SUBJECTS % TOPICS_PER_SUBJECT}',
+                        difficulty=DIFFICULTIES[i % len(DIFFICULTIES)],
+                    ))
+                created = Question.objects.bulk_create(batch)
+                # auto_now_add stamps the whole batch alike; spread them out
+                for offset, question in enumerate(created):
+                    question.created_at = base + timedelta(seconds=start + offset)
+                Question.objects.bulk_update(created, ['created_at'], batch_size=1000)
+            self.stdout.write(f'Inserted {total} questions in {time.monotonic() - started:.1f}s')
+
+            for label, params in FILTERS:
+                if 'exam' in params:
+                    params = {'exam': str(exams[0].pk)}
+                ordered = question_bank_queryset(params).order_by('-created_at', '-id').only('id', 'exam_id', 'created_at')
+                if options['plans']:
+                    self.stdout.write(f'  {label}: {_plan(ordered[:size + 1])}')
+                timings = []
+                for page in options['pages']:
+                    offset = (page - 1) * size
+                    # The cursor a client would hold after reading the previous page
+                    anchor = list(ordered.values_list('created_at', 'id')[offset - 1:offset]) if offset else None
+                    if anchor == []:
+                        timings.append(f'page {page}: past the end')
+                        continue
+
+                    def keyset_page():
+                        queryset = ordered
+                        if anchor:
+                            created_at, pk = anchor[0]
+                            queryset = queryset.filter(keyset_before('created_at', created_at, pk))
+                        list(queryset[:size + 1])
+
+                    timings.append(f'page {page}: {_best_ms(keyset_page):6.2f} ms')
+                self.stdout.write(f'{label:>16}   ' + '   '.join(timings))
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic rows.'))
@@ -0,0 +1,193 @@
+"""
+Measures quiz/regrade.py when an answer key correction flips --answers past
+answers: one question answered by that many registered users, each with one
+submitted, row-stored attempt, its result and the derived rows (leaderboard
+entry, global ranking, stats, topic mastery, histogram). Times the dry run,
+the real regrade and, within it, the incremental refresh of the derived
+rows; then a correction to a second question that only the first
+SMALL_CORRECTION users answered; then checks the derived rows against full
+rebuilds and times those rebuilds (the refresh regrade used to run on
+every correction). The rows are inserted inside a transaction
+that is rolled back at the end, so the database is unchanged.
+
+Usage:
+    python manage.py benchmark_regrade
+    python manage.py benchmark_regrade --answers 100000
+"""
+
+import time
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from quiz import histograms, leaderboard, rankings, regrade, user_stats
+from quiz.models import (
+    Answer, Exam, ExamAttempt, LeaderboardEntry, Question, TopicMastery, UserAnswer, UserExamResult,
+    UserRanking, UserStats,
+)
+
+BATCH_SIZE = 5000
+QUESTIONS = 10
+STATS_SAMPLE = 1000
+SMALL_CORRECTION = 1000
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks regrading one question answered by 1M users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--answers', type=int, default=1_000_000)
+
+    def _insert(self, exam, total, rng):
+        questions = Question.objects.bulk_create(
+            Question(exam=exam, question_text=f'Regrade question {i}', order=i) for i in range(QUESTIONS)
+        )
+        question, second = questions[:2]
+        right, wrong, _, second_wrong = Answer.objects.bulk_create(
+            Answer(question=q, answer_text=f'Option {j}', is_correct=j == 0, order=j) for q in (question, second) for j in range(2)
+        )
+        now = timezone.now()
+        for start in range(0, total, BATCH_SIZE):
+            count = min(BATCH_SIZE, total - start)
+            picked_right = rng.random(count) < 0.5
+            users = User.objects.bulk_create(
+                User(username=f'regrade-benchmark-{start + i}', password='!') for i in range(count)
+            )
+            attempts = ExamAttempt.objects.bulk_create(
+                ExamAttempt(
+                    exam=exam, user=user, session_id=f'regrade-benchmark-{user.id}', state='submitted', finished_at=now,
+                )
+                for user in users
+            )
+            UserAnswer.objects.bulk_create(
+                UserAnswer(
+                    attempt=attempt, exam=exam, question=question, session_id=attempt.session_id,
+                    selected_answer=right if picked_right[i] else wrong, is_correct=bool(picked_right[i]),
+                )
+                for i, attempt in enumerate(attempts)
+            )
+            # The first few users also got the second question wrong
+            UserAnswer.objects.bulk_create(
+                UserAnswer(
+                    attempt=attempt, exam=exam, question=second, session_id=attempt.session_id,
+                    selected_answer=second_wrong, is_correct=False,
+                )
+                for attempt in attempts[:max(0, SMALL_CORRECTION - start)]
+            )
+            results = UserExamResult.objects.bulk_create(
+                UserExamResult(
+                    attempt=attempt, user=attempt.user, exam=exam, session_id=attempt.session_id,
+                    score=int(picked_right[i]), correct_answers=int(picked_right[i]), total_questions=QUESTIONS,
+                    percentage=round(int(picked_right[i]) / QUESTIONS * 100, 2), completed_at=now,
+                )
+                for i, attempt in enumerate(attempts)
+            )
+            LeaderboardEntry.objects.bulk_create(
+                LeaderboardEntry(
+                    exam=exam, user_id=result.user_id, score=result.score, total_questions=QUESTIONS,
+                    percentage=result.percentage, achieved_at=now,
+                )
+                for result in results
+            )
+            UserRanking.objects.bulk_create(
+                UserRanking(user_id=result.user_id, total_score=result.score, exams_taken=1) for result in results
+            )
+            UserStats.objects.bulk_create(
+                UserStats(
+                    user_id=result.user_id, total_tests=1, percentage_sum=result.percentage,
+                    tests_passed=user_stats._passed(result.percentage),
+                    recent=[user_stats._recent_entry(result.id, exam.title, None, result.percentage, now)],
+                )
+                for result in results
+            )
+            TopicMastery.objects.bulk_create(
+                TopicMastery(user_id=result.user_id, attempts=1, correct=result.score, last_seen=now)
+                for result in results
+            )
+        histograms.recompute_exam_histogram(exam.id)
+        return question, second
+
+    def _check(self, exam, users):
+        scores = UserExamResult.objects.filter(exam=exam).aggregate(total=Sum('score'))['total']
+        checks = {
+            'leaderboard': LeaderboardEntry.objects.filter(exam=exam).aggregate(total=Sum('score'))['total'],
+            'global ranking': UserRanking.objects.filter(user__in=users).aggregate(total=Sum('total_score'))['total'],
+            'topic mastery': TopicMastery.objects.filter(user__in=users).aggregate(total=Sum('correct'))['total'],
+        }
+        for name, total in checks.items():
+            if total != scores:
+                raise CommandError(f'{name} total {total} != result total {scores}')
+        sample = UserStats.objects.filter(user__in=users).order_by('?')[:STATS_SAMPLE]
+        drifted = [stats.user_id for stats in sample if user_stats.stats_differ(stats, user_stats.compute_user_stats(stats.user_id))]
+        if drifted:
+            raise CommandError(f'user stats drifted for users {drifted[:10]}')
+        corrected = histograms.recompute_exam_histogram(exam.id)
+        if corrected:
+            raise CommandError(f'{corrected} histogram buckets drifted')
+
+    def _regrade(self, label, question_id, dry_run=False):
+        refresh = []
+        refresh_derived = regrade._refresh_derived
+
+        def timed_refresh(*args):
+            refresh.append(_timed(lambda: refresh_derived(*args))[1])
+
+        regrade._refresh_derived = timed_refresh
+        try:
+            diff, elapsed = _timed(lambda: regrade.regrade_question(question_id, dry_run=dry_run))
+        finally:
+            regrade._refresh_derived = refresh_derived
+        self.stdout.write(
+            f'  {label:<32} {elapsed:8.2f} s   ({diff["to_correct"] + diff["to_incorrect"]} answers, '
+            f'{diff["results_changed"]} results)'
+        )
+        if refresh:
+            self.stdout.write(f'    of which incremental refresh   {sum(refresh):8.2f} s')
+
+    def handle(self, *args, **options):
+        total = options['answers']
+        rng = np.random.default_rng(0)
+        with transaction.atomic():
+            started = time.monotonic()
+            exam = Exam.objects.create(title='Regrade benchmark', status='published')
+            question, second = self._insert(exam, total, rng)
+            users = User.objects.filter(exam_results__exam=exam)
+            self.stdout.write(f'Inserted {total} users, attempts, answers, results and derived rows in {time.monotonic() - started:.1f}s:')
+
+            # The key correction: option 1 was the right answer, not option 0
+            question.answers.filter(order=0).update(is_correct=False)
+            question.answers.filter(order=1).update(is_correct=True)
+
+            self._regrade('dry run', question.id, dry_run=True)
+            self._regrade('regrade', question.id)
+
+            second.answers.filter(order=0).update(is_correct=False)
+            second.answers.filter(order=1).update(is_correct=True)
+            self._regrade(f'regrade ({SMALL_CORRECTION} users)', second.id)
+
+            _, elapsed = _timed(lambda: self._check(exam, users))
+            self.stdout.write(f'  derived rows match rebuilds      {elapsed:8.2f} s to check')
+
+            _, lb = _timed(lambda: leaderboard.rebuild_exam_leaderboard(exam.id))
+            _, hist = _timed(lambda: histograms.recompute_exam_histogram(exam.id))
+            _, ranking = _timed(rankings.rebuild_global_ranking)
+            sample = list(users.values_list('id', flat=True)[:STATS_SAMPLE])
+            _, stats = _timed(lambda: [user_stats.compute_user_stats(user_id) for user_id in sample])
+            stats *= total / max(len(sample), 1)
+            self.stdout.write('  old refresh, on every correction (full rebuilds):')
+            self.stdout.write(f'    exam leaderboard               {lb:8.2f} s')
+            self.stdout.write(f'    exam histogram                 {hist:8.2f} s')
+            self.stdout.write(f'    global ranking                 {ranking:8.2f} s')
+            self.stdout.write(f'    user stats (scaled to {total})   {stats:8.2f} s')
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic rows.'))
@@ -0,0 +1,140 @@
+"""
+Measures question search latency on a synthetic bank. Questions mix English
+and Hindi words drawn from Zipf-distributed vocabularies, so a few terms are
+very common and most are rare, as in real papers. Queries are one to three
+words (the last one a prefix), sampled the same way. Everything is inserted
+inside a transaction that is rolled back at the end, so the database is
+unchanged.
+
+--check also compares every query's matches with a scan of the documents in
+Python, on whichever backend the database is; run it against PostgreSQL to
+check the tsvector / GIN path.
+
+Usage:
+    python manage.py benchmark_search
+    python manage.py benchmark_search --questions 1000000 --queries 300
+    python manage.py benchmark_search --questions 20000 --check
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from quiz.models import Exam, Question, QuestionSearchDocument
+from quiz.search import RANKED_WINDOW, STOPWORDS, document_fields, search_questions, tokenize
+
+BATCH_SIZE = 5000
+ENGLISH_SYLLABLES = ['ka', 'ro', 'mi', 'ten', 'sul', 'ver', 'an', 'tio', 'gra', 'pho', 'lin', 'ex', 'qua', 'dis', 'mo', 'ter']
+HINDI_SYLLABLES = ['क', 'रा', 'मि', 'ती', 'सु', 'वे', 'न', 'प्र', 'श्न', 'गु', 'ल', 'दे', 'हि', 'भा', 'र', 'त्य']
+
+
+def _vocabulary(syllables, size, rng):
+    words = set()
+    while len(words) < size:
+        word = ''.join(rng.choice(syllables, size=rng.integers(2, 5)))
+        if word not in STOPWORDS:
+            words.add(word)
+    return list(rng.permutation(sorted(words)))
+
+
+class _Zipf:
+    """Zipf-Mandelbrot word sampler: the commonest word is about 1.3% of all words."""
+
+    def __init__(self, words, rng):
+        weights = 1 / (np.arange(len(words)) + 10.0)
+        self.cdf = np.cumsum(weights / weights.sum())
+        self.words = words
+        self.rng = rng
+
+    def sample(self, count):
+        indexes = np.minimum(np.searchsorted(self.cdf, self.rng.random(count)), len(self.words) - 1)
+        return [self.words[i] for i in indexes]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks full-text question search on a synthetic question bank'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=200_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--check', action='store_true', help='Compare results with a scan of the documents')
+
+    def _check(self, exam, queries, filters):
+        """Every query's matches must be exactly those of a scan (up to RANKED_WINDOW of them)."""
+        documents = [
+            (question_id, set(f'{question} {options} {labels}'.split()), subject, topic)
+            for question_id, question, options, labels, subject, topic in QuestionSearchDocument.objects.filter(
+                exam=exam
+            ).values_list('question_id', 'question_terms', 'option_terms', 'label_terms', 'subject', 'topic')
+        ]
+        checked = 0
+        for label, kwargs in filters:
+            for query in queries:
+                tokens = tokenize(query)
+                if not tokens:
+                    continue
+                *words, prefix = tokens
+                expected = {
+                    question_id for question_id, terms, subject, topic in documents
+                    if all(word in terms for word in words) and any(term.startswith(prefix) for term in terms)
+                    and kwargs.get('subject', subject) == subject and kwargs.get('topic', topic) == topic
+                }
+                if len(expected) > RANKED_WINDOW:
+                    continue
+                found = {question_id for question_id, _ in search_questions(query, limit=RANKED_WINDOW, **kwargs)}
+                if found != expected:
+                    raise CommandError(
+                        f'{label} "{query}": {len(found - expected)} unexpected, {len(expected - found)} missing matches'
+                    )
+                checked += 1
+        self.stdout.write(f'Checked {checked} queries against a scan of the documents ({len(documents)} documents)')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        english = _Zipf(_vocabulary(ENGLISH_SYLLABLES, 20_000, rng), rng)
+        hindi = _Zipf(_vocabulary(HINDI_SYLLABLES, 10_000, rng), rng)
+
+        def sentence(n):
+            # About a third of the bank is Hindi
+            return ' '.join((hindi if rng.random() < 0.3 else english).sample(n))
+
+        with transaction.atomic():
+            started = time.monotonic()
+            exam = Exam.objects.create(title='Search benchmark', status='published')
+            total = options['questions']
+            for start in range(0, total, BATCH_SIZE):
+                size = min(BATCH_SIZE, total - start)
+                questions = Question.objects.bulk_create(
+                    Question(exam=exam, question_text=sentence(12), subject=f'Subject {i % 8}', topic=f'Topic {i % 40}')
+                    for i in range(start, start + size)
+                )
+                QuestionSearchDocument.objects.bulk_create(
+                    QuestionSearchDocument(question=q, **document_fields(q, [sentence(2) for _ in range(4)]))
+                    for q in questions
+                )
+            self.stdout.write(f'Indexed {total} questions in {time.monotonic() - started:.1f}s')
+
+            queries = []
+            for _ in range(options['queries']):
+                words = (hindi if rng.random() < 0.3 else english).sample(rng.integers(1, 4))
+                words[-1] = words[-1][:max(2, len(words[-1]) - 1)]
+                queries.append(' '.join(words))
+
+            filters = (('no filter', {}), ('topic filter', {'subject': 'Subject 7', 'topic': 'Topic 7'}))
+            for label, kwargs in filters:
+                timings = []
+                for query in queries:
+                    began = time.perf_counter()
+                    search_questions(query, **kwargs)
+                    timings.append((time.perf_counter() - began) * 1000)
+                p50, p95 = np.percentile(timings, [50, 95])
+                self.stdout.write(
+                    f'{label:>12}: p50 {p50:7.2f} ms   p95 {p95:7.2f} ms   max {max(timings):7.2f} ms'
+                )
+            if options['check']:
+                self._check(exam, queries, filters)
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic questions.'))
@@ -0,0 +1,96 @@
+"""
+Measures the cost of per-session question and option shuffling
+(quiz/shuffling.py) on the cached exam questions endpoint: the same warm
+request with and without ?session_id=, plus the shuffle on its own, and
+the queries and writes each request makes. The exam is inserted inside a
+transaction that is rolled back at the end, so the database is unchanged.
+
+Usage:
+    python manage.py benchmark_shuffle
+    python manage.py benchmark_shuffle --questions 200 --requests 500
+"""
+
+import time
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+
+from quiz import cache as quiz_cache
+from quiz import shuffling
+from quiz.models import Answer, Exam, Question
+
+OPTIONS = 4
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the overhead of per-session shuffling on the cached questions endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=300)
+
+    def _timed(self, client, path, session_ids):
+        timings, queries, writes = [], 0, 0
+
+        def record(execute, sql, params, many, context):
+            nonlocal queries, writes
+            queries += 1
+            writes += not sql.lstrip().upper().startswith('SELECT')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            for session_id in session_ids:
+                url = f'{path}?session_id={session_id}' if session_id else path
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.status_code
+        return timings, queries / len(session_ids), writes
+
+    def handle(self, *args, **options):
+        count, requests = options['questions'], options['requests']
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        with transaction.atomic():
+            exam = Exam.objects.create(title='Shuffle benchmark', status='published')
+            questions = Question.objects.bulk_create(
+                Question(exam=exam, question_text=f'Benchmark question {i} ' * 8, order=i, explanation='Because. ' * 20)
+                for i in range(count)
+            )
+            Answer.objects.bulk_create(
+                Answer(question=question, answer_text=f'Option {j} of question {question.order}', is_correct=j == 0, order=j)
+                for question in questions
+                for j in range(OPTIONS)
+            )
+            path = f'/api/exams/{exam.id}/questions/'
+            data = client.get(path).json()  # also fills the response cache
+            pinned = shuffling.pinned_questions(data)
+
+            plain, plain_queries, _ = self._timed(client, path, [None] * requests)
+            sessions = [uuid.uuid4().hex for _ in range(requests)]
+            shuffled, shuffled_queries, writes = self._timed(client, path, sessions)
+
+            alone = []
+            for session_id in sessions:
+                started = time.perf_counter()
+                shuffling.shuffle_questions(data, shuffling.seed_for(session_id, exam.id), pinned)
+                alone.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+        quiz_cache.invalidate(quiz_cache.tag('exam', exam.id))
+
+        plain_p50, shuffled_p50 = np.percentile(plain, 50), np.percentile(shuffled, 50)
+        self.stdout.write(f'{count} questions x {OPTIONS} options, cached payload, {requests} requests each:')
+        self.stdout.write(f'  GET questions/               p50 {plain_p50:6.2f} ms   queries/request {plain_queries:.0f}')
+        self.stdout.write(
+            f'  GET questions/?session_id=   p50 {shuffled_p50:6.2f} ms   queries/request {shuffled_queries:.0f}   '
+            f'rows written {writes}'
+        )
+        self.stdout.write(
+            f'  shuffle alone                p50 {np.percentile(alone, 50):6.3f} ms   '
+            f'(+{shuffled_p50 - plain_p50:.2f} ms, {100 * (shuffled_p50 - plain_p50) / plain_p50:+.1f}% per request)'
+        )
+        self.stdout.write(self.style.SUCCESS('Rolled back the synthetic exam.'))
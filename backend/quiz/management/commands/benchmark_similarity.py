@@ -0,0 +1,129 @@
+"""
+Measures the similar-question index (quiz/similarity.py) on synthetic
+questions: build time, size on disk and peak memory of a full build,
+"similar to question X" latency, an incremental add, and the resident
+memory of a reader process, split into private (anonymous) pages and
+file pages shared with other workers through the page cache. Texts mix
+English and Hindi words drawn from Zipf-distributed vocabularies, as in
+benchmark_search. The database is not used; the index is written to a
+temporary directory that is removed at the end.
+
+Usage:
+    python manage.py benchmark_similarity
+    python manage.py benchmark_similarity --questions 1000000 --queries 500
+"""
+
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from quiz.management.commands.benchmark_search import ENGLISH_SYLLABLES, HINDI_SYLLABLES, _vocabulary, _Zipf
+from quiz.similarity import SimilarityIndex, add_to_index, write_index
+
+
+def _memory_mb():
+    """(private, shared file-backed) resident memory of this process in MB."""
+    values = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('RssAnon:', 'RssFile:')):
+                name, kilobytes = line.split()[:2]
+                values[name] = int(kilobytes) / 1024
+    return values.get('RssAnon:', 0), values.get('RssFile:', 0)
+
+
+def _rows(vocabularies, start, count, seed):
+    rng = np.random.default_rng(seed)
+    english, hindi = (_Zipf(words, rng) for words in vocabularies)
+    for question_id in range(start, start + count):
+        words = hindi if rng.random() < 0.3 else english
+        yield question_id, question_id % 1000, ' '.join(words.sample(12)), [' '.join(words.sample(2)) for _ in range(4)]
+
+
+def _exhaustive(index, question_id, k):
+    """Top k ids scored over every posting of the query, for recall."""
+    segment = index.segments[0]
+    rows, scores = segment.scores(*index.vector_of(question_id))
+    best = segment.question_ids[rows[np.argsort(-scores)[:k + 1]]].tolist()
+    return [other for other in best if other != question_id][:k]
+
+
+def _build(directory, vocabularies, questions, results):
+    started = time.monotonic()
+    write_index(_rows(vocabularies, 1, questions, seed=2), directory)
+    results.put(time.monotonic() - started)
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks build time, query latency and memory of the similar-question index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=200_000)
+        parser.add_argument('--queries', type=int, default=300)
+        parser.add_argument('--added', type=int, default=5000, help='Questions in the incremental segment')
+
+    def handle(self, *args, **options):
+        total = options['questions']
+        vocabularies = (
+            _vocabulary(ENGLISH_SYLLABLES, 20_000, np.random.default_rng(0)),
+            _vocabulary(HINDI_SYLLABLES, 10_000, np.random.default_rng(1)),
+        )
+        directory = tempfile.mkdtemp(prefix='similarity-benchmark-')
+        try:
+            # Build in a child process so its peak memory is measured on its own
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            child = context.Process(target=_build, args=(directory, vocabularies, total, results))
+            child.start()
+            seconds = results.get()
+            child.join()
+            peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            size = sum(
+                os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+            )
+            self.stdout.write(
+                f'Build of {total} questions: {seconds:.1f}s, {size / 2 ** 20:.0f} MB on disk, peak RSS {peak:.0f} MB'
+            )
+
+            private, shared = _memory_mb()
+            index = SimilarityIndex.open(directory)
+            opened_private, opened_shared = _memory_mb()
+            rng = np.random.default_rng(3)
+            timings, recall = [], []
+            for question_id in rng.integers(1, total + 1, size=options['queries']).tolist():
+                began = time.perf_counter()
+                hits = index.search(index.vector_of(question_id), 10, exclude={question_id})
+                timings.append((time.perf_counter() - began) * 1000)
+                expected = _exhaustive(index, question_id, 10)
+                recall.append(len({hit[0] for hit in hits} & set(expected)) / max(len(expected), 1))
+            p50, p95 = np.percentile(timings, [50, 95])
+            self.stdout.write(
+                f'Similar to a question, top 10: p50 {p50:.2f} ms   p95 {p95:.2f} ms   max {max(timings):.2f} ms   '
+                f'recall@10 vs scoring every posting {np.mean(recall):.3f}'
+            )
+            queried_private, queried_shared = _memory_mb()
+            self.stdout.write(
+                f'Reader RSS: private {opened_private - private:+.0f} MB on open, '
+                f'{queried_private - private:+.0f} MB after queries; '
+                f'shared file pages {queried_shared - shared:+.0f} MB (one copy per host)'
+            )
+
+            started = time.monotonic()
+            add_to_index(_rows(vocabularies, total + 1, options['added'], seed=4), directory)
+            self.stdout.write(f'Incremental add of {options["added"]} questions: {time.monotonic() - started:.2f}s')
+            index = SimilarityIndex.open(directory)
+            timings = []
+            for question_id in rng.integers(1, total + options['added'] + 1, size=options['queries']).tolist():
+                began = time.perf_counter()
+                index.search(index.vector_of(question_id), 10, exclude={question_id})
+                timings.append((time.perf_counter() - began) * 1000)
+            p50, p95 = np.percentile(timings, [50, 95])
+            self.stdout.write(f'Same, over two segments: p50 {p50:.2f} ms   p95 {p95:.2f} ms')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,33 @@
+"""
+Builds the similar-question TF-IDF index (quiz/similarity.py) from the
+question bank into settings.QUIZ_SIMILARITY_DIR. Web workers pick up the
+new index on their next query.
+
+Usage:
+    python manage.py build_similarity_index
+    python manage.py build_similarity_index --incremental   # e.g. from cron, every few minutes
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.similarity import build_similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Builds the similar-question index, in full or for questions added or edited since'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only index questions added or edited since the last build',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count, manifest = build_similarity_index(incremental=options['incremental'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} questions in {time.monotonic() - started:.1f}s "
+            f"({manifest['documents']} in the last full build, {len(manifest['segments'])} segments)."
+        ))
@@ -0,0 +1,74 @@
+"""
+Moves the answers of finished attempts out of UserAnswer into the packed
+per-attempt format (see quiz/packing.py).
+
+Usage:
+    python manage.py compact_attempts
+    python manage.py compact_attempts --older-than-days 30 --exam 12 --batch-size 1000
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from quiz.models import ExamAttempt, UserAnswer
+from quiz.packing import pack_answers
+
+
+class Command(BaseCommand):
+    help = 'Packs the answers of submitted attempts into ExamAttempt.packed_answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=7, help='Only attempts finished before this many days ago')
+        parser.add_argument('--exam', type=int, help='Limit to one exam id')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        attempts = ExamAttempt.objects.filter(
+            state='submitted', finished_at__lt=cutoff, packed_answers__isnull=True
+        ).order_by('id')
+        if options['exam']:
+            attempts = attempts.filter(exam_id=options['exam'])
+
+        started = time.monotonic()
+        last_id = 0
+        packed = skipped = rows_removed = 0
+
+        while True:
+            batch = list(attempts.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1]
+
+            answers = {}
+            has_text = set()
+            rows = UserAnswer.objects.filter(attempt_id__in=batch).values_list(
+                'attempt_id', 'question_id', 'selected_answer_id', 'is_correct', 'text_answer'
+            )
+            for attempt_id, question_id, answer_id, is_correct, text_answer in rows:
+                answers.setdefault(attempt_id, []).append((question_id, answer_id, is_correct))
+                if text_answer:
+                    has_text.add(attempt_id)
+
+            updates = []
+            for attempt_id in batch:
+                # Free-text answers have no packed representation; keep them as rows.
+                if attempt_id not in answers or attempt_id in has_text:
+                    skipped += 1
+                    continue
+                blob = pack_answers(answers[attempt_id])
+                updates.append(ExamAttempt(id=attempt_id, packed_answers=blob, compacted_at=timezone.now()))
+
+            with transaction.atomic():
+                ExamAttempt.objects.bulk_update(updates, ['packed_answers', 'compacted_at'])
+                rows_removed += UserAnswer.objects.filter(attempt_id__in=[a.id for a in updates]).delete()[0]
+            packed += len(updates)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Packed {packed} attempts ({rows_removed} answer rows removed, {skipped} skipped) '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,40 @@
+"""
+Lists near-duplicate questions across exams using the similar-question
+index (build it first with build_similarity_index). Checks one exam against
+the whole bank, or every indexed question.
+
+Usage:
+    python manage.py find_duplicate_questions --exam 42
+    python manage.py find_duplicate_questions --threshold 0.85 > duplicates.tsv
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Question
+from quiz.similarity import find_duplicates, get_index
+
+
+class Command(BaseCommand):
+    help = 'Lists near-duplicate questions in other exams'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', type=int, help='Only check the questions of this exam')
+        parser.add_argument('--threshold', type=float, default=0.9, help='Minimum cosine similarity')
+        parser.add_argument('--per-question', type=int, default=5, help='Most similar questions checked per question')
+
+    def handle(self, *args, **options):
+        if get_index() is None:
+            raise CommandError('No similarity index; run build_similarity_index first.')
+        questions = Question.objects.order_by('id')
+        if options['exam']:
+            questions = questions.filter(exam_id=options['exam'])
+        pairs = 0
+        self.stdout.write('question_id\tduplicate_id\tsimilarity')
+        for question_id, other_id, score in find_duplicates(
+            questions.values_list('id', flat=True).iterator(),
+            threshold=options['threshold'],
+            k=options['per_question'],
+        ):
+            self.stdout.write(f'{question_id}\t{other_id}\t{score:.3f}')
+            pairs += 1
+        self.stderr.write(f'{pairs} pairs at similarity >= {options["threshold"]}')
@@ -0,0 +1,32 @@
+"""
+Flushes answers buffered in Redis (write-behind mode) into UserAnswer.
+
+Usage:
+    python manage.py flush_answer_buffer
+    python manage.py flush_answer_buffer --loop --interval 30
+"""
+
+import time
+from django.core.management.base import BaseCommand
+
+from quiz import answer_buffer
+
+
+class Command(BaseCommand):
+    help = 'Writes buffered in-progress answers from Redis to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep flushing on a timer')
+        parser.add_argument('--interval', type=int, default=30, help='Seconds between flushes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            sessions, answers = answer_buffer.flush_all()
+            self.stdout.write(
+                f'Flushed {answers} answers from {sessions} sessions '
+                f'in {time.monotonic() - started:.2f}s'
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
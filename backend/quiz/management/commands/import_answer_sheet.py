@@ -0,0 +1,62 @@
+"""
+Imports an offline answer sheet (CSV, one row per candidate) for an exam,
+grading every candidate at once (see quiz/offline_import.py for the format).
+Candidates already imported for the exam are skipped.
+
+Usage:
+    python manage.py import_answer_sheet --exam 12 sheet.csv
+    python manage.py import_answer_sheet --exam 12 sheet.csv --dry-run
+    python manage.py import_answer_sheet --exam 12 --synthetic 100000
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Exam
+from quiz.offline_import import BATCH_SIZE, SheetError, import_sheet, synthetic_sheet
+
+
+class Command(BaseCommand):
+    help = 'Imports and grades an offline answer sheet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sheet', nargs='?', help='CSV file to import')
+        parser.add_argument('--exam', type=int, required=True, help='Exam id the sheet belongs to')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Parse and grade without writing')
+        parser.add_argument(
+            '--synthetic', type=int, metavar='CANDIDATES',
+            help='Import a random sheet of this many candidates instead of a file (benchmark)',
+        )
+
+    def handle(self, *args, **options):
+        if not Exam.objects.filter(pk=options['exam']).exists():
+            raise CommandError(f"Exam {options['exam']} does not exist")
+        if bool(options['sheet']) == bool(options['synthetic']):
+            raise CommandError('Pass either a sheet file or --synthetic')
+
+        if options['synthetic']:
+            started = time.monotonic()
+            lines = synthetic_sheet(options['exam'], options['synthetic'])
+            self.stdout.write(f"Generated {options['synthetic']} candidates in {time.monotonic() - started:.1f}s")
+        else:
+            try:
+                lines = open(options['sheet'], newline='', encoding='utf-8-sig')
+            except OSError as e:
+                raise CommandError(str(e))
+
+        try:
+            summary = import_sheet(options['exam'], lines, options['batch_size'], options['dry_run'])
+        except SheetError as e:
+            raise CommandError(str(e))
+        finally:
+            lines.close()
+
+        seconds = summary['seconds']
+        verb = 'Graded' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {summary['candidates']} candidates ({summary['imported']} new, {summary['skipped']} skipped, "
+            f"mean {summary['mean_percentage']}%) in {seconds:.1f}s "
+            f"({summary['candidates'] / max(seconds, 1e-9) * 60:,.0f} candidates/min)"
+        ))
@@ -0,0 +1,84 @@
+"""
+Measures response size and database bytes read for the exam list and exam
+questions endpoints, with and without sparse fieldsets (?fields= / ?omit=).
+
+Each request goes through the full API stack with a cache-busting parameter,
+so the response cache never answers it. Every SELECT it ran is recorded and
+executed again to add up the bytes of the values it returned.
+
+Usage:
+    python manage.py measure_payloads
+    python manage.py measure_payloads --exam 12
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from quiz.models import Exam
+
+CASES = {
+    'exams': ['', 'omit=description', 'fields=id,title,year,shift,question_count'],
+    'questions': ['', 'omit=explanation', 'fields=id,question_text,image,answers'],
+}
+
+
+def _value_bytes(value):
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    return 8
+
+
+class Command(BaseCommand):
+    help = 'Reports payload size and DB bytes read for exam list / questions, full vs sparse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', type=int, help='Exam whose questions are measured (default: the largest)')
+
+    def _db_bytes(self, queries):
+        total = 0
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute(sql, params)
+                total += sum(_value_bytes(value) for row in cursor.fetchall() for value in row)
+        return total
+
+    def handle(self, *args, **options):
+        exam_id = options['exam']
+        if exam_id is None:
+            exam = Exam.objects.filter(is_active=True, status='published').order_by('-total_questions').first()
+            if exam is None:
+                raise CommandError('No published exam to measure')
+            exam_id = exam.id
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        paths = {'exams': '/api/exams/', 'questions': f'/api/exams/{exam_id}/questions/'}
+
+        for endpoint, variants in CASES.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{paths[endpoint]}'))
+            for query in variants:
+                params = '&'.join(filter(None, [query, f'_={uuid.uuid4().hex}']))
+                queries = []
+
+                def record(execute, sql, sql_params, many, context):
+                    queries.append((sql, sql_params))
+                    return execute(sql, sql_params, many, context)
+
+                with connection.execute_wrapper(record):
+                    response = client.get(f'{paths[endpoint]}?{params}')
+                if response.status_code != 200:
+                    raise CommandError(f'{paths[endpoint]}?{query} returned {response.status_code}')
+                self.stdout.write(
+                    f'  {query or "(all fields)":<45} payload {len(response.content):>9,} B   '
+                    f'DB read {self._db_bytes(queries):>9,} B   queries {len(queries)}'
+                )
@@ -0,0 +1,44 @@
+"""
+Rebuilds leaderboard read models. Per-exam entries come from each user's
+best submitted attempt, so a worse retake (which replaces the user's
+UserExamResult) never lowers them; the global ranking sums results.
+
+Usage:
+    python manage.py rebuild_leaderboards
+    python manage.py rebuild_leaderboards --exam 12
+    python manage.py rebuild_leaderboards --global
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quiz.leaderboard import rebuild_exam_leaderboard
+from quiz.rankings import rebuild_global_ranking
+from quiz.models import UserExamResult
+
+
+class Command(BaseCommand):
+    help = 'Recomputes per-exam leaderboard entries and the global ranking from exam results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', type=int, help='Limit to one exam id')
+        parser.add_argument('--global', action='store_true', dest='global_only', help='Only rebuild the global ranking')
+
+    def handle(self, *args, **options):
+        if options['global_only']:
+            count = rebuild_global_ranking()
+            self.stdout.write(self.style.SUCCESS(f'Global ranking rebuilt: {count} users.'))
+            return
+
+        if options['exam']:
+            exam_ids = [options['exam']]
+        else:
+            exam_ids = UserExamResult.objects.values_list('exam_id', flat=True).distinct().order_by('exam_id')
+
+        for exam_id in exam_ids:
+            with transaction.atomic():
+                count = rebuild_exam_leaderboard(exam_id)
+            self.stdout.write(f'Exam {exam_id}: {count} entries')
+        if not options['exam']:
+            self.stdout.write(f'Global ranking: {rebuild_global_ranking()} users')
+        self.stdout.write(self.style.SUCCESS('Leaderboards rebuilt.'))
@@ -0,0 +1,20 @@
+"""
+Rewrites every QuestionSearchDocument (and with it the full-text index) from
+the questions and their options. Needed after bulk loads that bypass the
+model signals.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the question full-text search index'
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} questions.'))
@@ -0,0 +1,19 @@
+"""
+Recomputes TopicMastery from every submitted attempt of registered users,
+including compacted attempts.
+
+Usage:
+    python manage.py rebuild_topic_mastery
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz.mastery import rebuild_topic_mastery
+
+
+class Command(BaseCommand):
+    help = 'Recomputes per-user topic mastery from submitted attempts'
+
+    def handle(self, *args, **options):
+        count = rebuild_topic_mastery()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} topic mastery rows.'))
@@ -0,0 +1,54 @@
+"""
+Backfills UserStats rows from UserExamResult, or checks them for drift.
+
+Usage:
+    python manage.py rebuild_user_stats
+    python manage.py rebuild_user_stats --user 42
+    python manage.py rebuild_user_stats --check
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from quiz.models import UserExamResult, UserStats
+from quiz.user_stats import compute_user_stats, stats_differ
+
+
+class Command(BaseCommand):
+    help = 'Recomputes per-user dashboard statistics from exam results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Limit to one user id')
+        parser.add_argument('--check', action='store_true', help='Report rows that differ from a recomputation without writing')
+
+    def handle(self, *args, **options):
+        user_ids = set(UserExamResult.objects.filter(user__isnull=False).values_list('user_id', flat=True).distinct())
+        user_ids |= set(UserStats.objects.values_list('user_id', flat=True))
+        if options['user']:
+            user_ids &= {options['user']}
+
+        stored = UserStats.objects.in_bulk(user_ids, field_name='user_id') if options['check'] else {}
+        written = drifted = 0
+        for user_id in sorted(user_ids):
+            expected = compute_user_stats(user_id)
+
+            if options['check']:
+                row = stored.get(user_id)
+                fields = ['missing row'] if row is None else stats_differ(row, expected)
+                if fields:
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(f'User {user_id}: {", ".join(fields)}'))
+                continue
+
+            with transaction.atomic():
+                UserStats.objects.filter(user_id=user_id).delete()
+                if expected.total_tests:
+                    expected.save()
+                    written += 1
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f'{drifted} of {len(user_ids)} users have stale stats.')
+            self.stdout.write(self.style.SUCCESS(f'All {len(user_ids)} users consistent.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {written} users.'))
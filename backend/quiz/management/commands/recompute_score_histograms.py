@@ -0,0 +1,38 @@
+"""
+Rewrites per-exam score histograms from UserExamResult, correcting any
+drift in the incrementally maintained ScoreBucket counts. Run periodically
+(e.g. nightly from cron).
+
+Usage:
+    python manage.py recompute_score_histograms
+    python manage.py recompute_score_histograms --exam 12
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz.histograms import recompute_exam_histogram
+from quiz.models import ScoreBucket, UserExamResult
+
+
+class Command(BaseCommand):
+    help = 'Recomputes exact per-exam score histograms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', type=int, help='Limit to one exam id')
+
+    def handle(self, *args, **options):
+        if options['exam']:
+            exam_ids = [options['exam']]
+        else:
+            exam_ids = sorted(
+                set(UserExamResult.objects.values_list('exam_id', flat=True).distinct())
+                | set(ScoreBucket.objects.values_list('exam_id', flat=True).distinct())
+            )
+
+        drifted = 0
+        for exam_id in exam_ids:
+            corrected = recompute_exam_histogram(exam_id)
+            if corrected:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f'Exam {exam_id}: corrected {corrected} buckets'))
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {len(exam_ids)} histograms ({drifted} had drifted).'))
@@ -0,0 +1,58 @@
+"""
+Regrades stored answers and results against the current answer key, e.g.
+after a correct option was fixed with auto-regrading turned off or while
+the web process was down.
+
+Usage:
+    python manage.py regrade --question 42
+    python manage.py regrade --exam 12 --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Question
+from quiz.regrade import regrade_question
+
+
+class Command(BaseCommand):
+    help = 'Regrades answers and results after an answer key correction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--question', type=int, help='Question id to regrade')
+        parser.add_argument('--exam', type=int, help='Regrade every question of an exam')
+        parser.add_argument('--dry-run', action='store_true', help='Report the diff without writing')
+
+    def handle(self, *args, **options):
+        if options['question']:
+            question_ids = [options['question']]
+            if not Question.objects.filter(pk=options['question']).exists():
+                raise CommandError(f"Question {options['question']} does not exist")
+        elif options['exam']:
+            question_ids = list(Question.objects.filter(exam_id=options['exam']).order_by('id').values_list('id', flat=True))
+        else:
+            raise CommandError('Pass --question or --exam')
+
+        dry_run = options['dry_run']
+        totals = {'to_correct': 0, 'to_incorrect': 0, 'results_changed': 0, 'packed_attempts_changed': 0}
+        for question_id in question_ids:
+            diff = regrade_question(question_id, dry_run=dry_run)
+            for name in totals:
+                totals[name] += diff[name]
+            if not (diff['to_correct'] or diff['to_incorrect'] or diff['results_changed'] or diff['packed_attempts_changed']):
+                continue
+            self.stdout.write(
+                f"Question {question_id}: {diff['to_correct']} answers -> correct, "
+                f"{diff['to_incorrect']} -> incorrect, {diff['results_changed']} results, "
+                f"{diff['packed_attempts_changed']} compacted attempts"
+            )
+            for change in diff['sample']:
+                self.stdout.write(
+                    f"  result {change['result_id']}: score {change['score_before']} -> {change['score_after']}"
+                )
+
+        verb = 'Would change' if dry_run else 'Changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['to_correct'] + totals['to_incorrect']} answers, "
+            f"{totals['results_changed'] + totals['packed_attempts_changed']} results "
+            f"across {len(question_ids)} questions."
+        ))
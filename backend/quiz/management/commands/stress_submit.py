@@ -0,0 +1,153 @@
+"""
+Fires parallel submit_exam requests for the same session and checks that
+they produce exactly one result and one submitted attempt, and that every
+successful response reports that same result. Each round answers a fresh
+guest session (and, with --users, a registered user) and then releases
+--workers threads at once, half of them sharing one Idempotency-Key and
+half sending none. Requests refused by the database (SQLite allows one
+writer at a time) are counted, not treated as duplicates. After each round
+the submitted attempt is compacted (see compact_attempts) and submitted
+once more without a key: the regraded result must keep its score.
+
+The exam, user and results are committed so the worker threads can see
+them, and deleted again at the end.
+
+Usage:
+    python manage.py stress_submit
+    python manage.py stress_submit --rounds 50 --workers 16
+"""
+
+import threading
+import uuid
+from collections import Counter
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from quiz import cache as quiz_cache
+from quiz.models import Answer, Exam, ExamAttempt, Question, UserExamResult
+
+QUESTIONS = 20
+OPTIONS = 4
+
+
+class Command(BaseCommand):
+    help = 'Submits the same exam session from parallel threads and checks that exactly one result is stored'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--users', action='store_true', help='Also submit as a registered user')
+
+    def _host(self):
+        return next((h for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost')
+
+    def _resubmit_compacted(self, exam, session_id, user=None):
+        """Packs the session's submitted attempt, submits again and returns the new status and result."""
+        call_command('compact_attempts', older_than_days=-1, exam=exam.id, stdout=StringIO())
+        client = Client(HTTP_HOST=self._host())
+        if user:
+            client.force_login(user)
+        response = client.post(
+            f'/api/exams/{exam.id}/submit_exam/', {'session_id': session_id}, content_type='application/json'
+        )
+        return response.status_code, response.json()
+
+    def _submit_in_parallel(self, exam, session_id, workers, user=None):
+        host = self._host()
+        idempotency_key = uuid.uuid4().hex
+        barrier = threading.Barrier(workers)
+        responses = []
+
+        def submit(index):
+            client = Client(HTTP_HOST=host)
+            if user:
+                client.force_login(user)
+            headers = {'HTTP_IDEMPOTENCY_KEY': idempotency_key} if index % 2 else {}
+            barrier.wait()
+            try:
+                response = client.post(
+                    f'/api/exams/{exam.id}/submit_exam/',
+                    {'session_id': session_id},
+                    content_type='application/json',
+                    **headers,
+                )
+                responses.append((response.status_code, response.json()))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def handle(self, *args, **options):
+        exam = Exam.objects.create(title='Submit stress test', status='published')
+        questions = Question.objects.bulk_create(
+            Question(exam=exam, question_text=f'Stress question {i}', order=i) for i in range(QUESTIONS)
+        )
+        answers = Answer.objects.bulk_create(
+            Answer(question=question, answer_text=f'Option {j}', is_correct=j == 0, order=j)
+            for question in questions
+            for j in range(OPTIONS)
+        )
+        user = User.objects.create_user(f'stress-{uuid.uuid4().hex[:12]}') if options['users'] else None
+        outcomes, violations = Counter(), []
+        try:
+            for round_number in range(options['rounds']):
+                for submitter in (None, user) if user else (None,):
+                    session_id = uuid.uuid4().hex
+                    attempt = ExamAttempt.objects.create(exam=exam, session_id=session_id)
+                    attempt.answers.bulk_create(
+                        attempt.answers.model(
+                            attempt=attempt, exam=exam, session_id=session_id,
+                            question=question, selected_answer=answers[i * OPTIONS + round_number % OPTIONS],
+                        )
+                        for i, question in enumerate(questions)
+                    )
+                    responses = self._submit_in_parallel(exam, session_id, options['workers'], submitter)
+
+                    lookup = {'user': submitter} if submitter else {'user': None, 'session_id': session_id}
+                    results = list(UserExamResult.objects.filter(exam=exam, **lookup).values_list('id', flat=True))
+                    submitted = ExamAttempt.objects.filter(exam=exam, session_id=session_id, state='submitted').count()
+                    reported = {body['result_id'] for status, body in responses if status == 200}
+                    outcomes.update(status for status, _ in responses)
+                    if len(results) != 1 or submitted != 1 or reported - set(results):
+                        violations.append(
+                            f'round {round_number}: {len(results)} results, {submitted} submitted attempts, '
+                            f'responses named {sorted(reported)}'
+                        )
+                        continue
+
+                    before = UserExamResult.objects.values_list('score', 'percentage').get(id=results[0])
+                    status, _ = self._resubmit_compacted(exam, session_id, submitter)
+                    after = UserExamResult.objects.values_list('score', 'percentage').get(id=results[0])
+                    if status != 200 or after != before:
+                        violations.append(
+                            f'round {round_number}: resubmitting the compacted attempt answered {status} '
+                            f'and changed the result from {before} to {after}'
+                        )
+        finally:
+            exam.delete()
+            if user:
+                user.delete()
+            quiz_cache.invalidate(quiz_cache.CATALOG)
+
+        total = sum(outcomes.values())
+        refused = total - outcomes[200]
+        self.stdout.write(
+            f'{total} submissions in {options["rounds"]} rounds of {options["workers"]} parallel requests: '
+            f'{outcomes[200]} succeeded, {refused} refused {dict(outcomes - Counter({200: outcomes[200]}))}'
+        )
+        if violations:
+            raise CommandError('Duplicate, missing or changed results:\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS(
+            'Every round stored exactly one result and one submitted attempt, and kept it after compaction.'
+        ))
@@ -0,0 +1,109 @@
+"""
+Per-user accuracy by (subject, topic), kept in TopicMastery.
+
+When a registered user's attempt is submitted, its answers are grouped by
+the questions' subject and topic and added to the user's rows with a single
+INSERT ... SELECT ... ON CONFLICT DO UPDATE statement (PostgreSQL and
+SQLite 3.24+). An attempt is counted once, on its transition to submitted;
+regrading a submitted attempt does not count it again. Questions without a
+subject or topic are grouped under ''.
+
+`python manage.py rebuild_topic_mastery` recomputes the table, including
+compacted (packed) attempts.
+"""
+from django.db import connection, transaction
+from django.db.models import ExpressionWrapper, F, FloatField
+
+from .models import ExamAttempt, Question, TopicMastery, UserAnswer
+from .packing import iter_packed_answers
+
+MIN_ATTEMPTS = 3
+LIST_SIZE = 5
+
+
+def record_attempt(attempt):
+    """Adds a just-submitted attempt's answers to its user's topic rows."""
+    if not attempt.user_id:
+        return
+    mastery = TopicMastery._meta.db_table
+    answers = UserAnswer._meta.db_table
+    questions = Question._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {mastery} (user_id, subject, topic, attempts, correct, last_seen)
+            SELECT %s, COALESCE(q.subject, ''), COALESCE(q.topic, ''), COUNT(*),
+                   SUM(CASE WHEN ua.is_correct THEN 1 ELSE 0 END), %s
+            FROM {answers} ua
+            JOIN {questions} q ON q.id = ua.question_id
+            WHERE ua.attempt_id = %s
+            GROUP BY COALESCE(q.subject, ''), COALESCE(q.topic, '')
+            ON CONFLICT (user_id, subject, topic) DO UPDATE SET
+                attempts = {mastery}.attempts + excluded.attempts,
+                correct = {mastery}.correct + excluded.correct,
+                last_seen = excluded.last_seen
+            """,
+            [attempt.user_id, attempt.finished_at, attempt.id],
+        )
+
+
+def rebuild_topic_mastery():
+    """Recomputes every row from submitted attempts. Returns the number of rows."""
+    totals = {}
+
+    def add(user_id, subject, topic, is_correct, seen):
+        key = (user_id, subject or '', topic or '')
+        entry = totals.setdefault(key, [0, 0, seen])
+        entry[0] += 1
+        entry[1] += 1 if is_correct else 0
+        entry[2] = max(entry[2], seen)
+
+    attempts = ExamAttempt.objects.filter(state='submitted', user__isnull=False)
+    rows = UserAnswer.objects.filter(attempt__in=attempts).values_list(
+        'attempt__user_id', 'question__subject', 'question__topic', 'is_correct', 'attempt__finished_at'
+    )
+    for user_id, subject, topic, is_correct, seen in rows.iterator(chunk_size=5000):
+        add(user_id, subject, topic, is_correct, seen)
+
+    packed = attempts.filter(packed_answers__isnull=False)
+    owners = {
+        attempt_id: (user_id, exam_id, seen)
+        for attempt_id, user_id, exam_id, seen in packed.values_list('id', 'user_id', 'exam_id', 'finished_at')
+    }
+    labels, loaded_exams = {}, set()
+    for attempt_id, question_id, _, is_correct in iter_packed_answers(packed):
+        user_id, exam_id, seen = owners[attempt_id]
+        if exam_id not in loaded_exams:
+            loaded_exams.add(exam_id)
+            labels.update(
+                (qid, (subject, topic)) for qid, subject, topic in
+                Question.objects.filter(exam_id=exam_id).values_list('id', 'subject', 'topic')
+            )
+        subject, topic = labels.get(question_id, ('', ''))
+        add(user_id, subject, topic, is_correct, seen)
+
+    with transaction.atomic():
+        TopicMastery.objects.all().delete()
+        TopicMastery.objects.bulk_create(
+            (
+                TopicMastery(user_id=user_id, subject=subject, topic=topic, attempts=n, correct=c, last_seen=seen)
+                for (user_id, subject, topic), (n, c, seen) in totals.items()
+            ),
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def strengths_and_weaknesses(user, min_attempts=MIN_ATTEMPTS, limit=LIST_SIZE):
+    """
+    The user's topics with at least `min_attempts` answers, best and worst
+    first; with few topics the better half are strengths and the rest
+    weaknesses. One query over the (user, subject, topic) unique index.
+    """
+    topics = list(
+        TopicMastery.objects.filter(user=user, attempts__gte=min_attempts)
+        .annotate(accuracy=ExpressionWrapper(F('correct') * 100.0 / F('attempts'), output_field=FloatField()))
+        .order_by('-accuracy', '-attempts')
+    )
+    split = min(limit, (len(topics) + 1) // 2)
+    return topics[:split], topics[split:][::-1][:limit]
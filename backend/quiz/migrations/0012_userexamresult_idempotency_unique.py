@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:18
+
+from django.db import migrations, models
+
+
+def remove_duplicate_results(apps, schema_editor):
+    """Keeps only the latest result per (user, exam) and per guest (session_id, exam)."""
+    UserExamResult = apps.get_model('quiz', 'UserExamResult')
+    seen = set()
+    stale = []
+    rows = UserExamResult.objects.order_by('-completed_at', '-id').values_list(
+        'id', 'user_id', 'session_id', 'exam_id'
+    )
+    for result_id, user_id, session_id, exam_id in rows.iterator():
+        key = ('user', user_id, exam_id) if user_id else ('guest', session_id, exam_id)
+        if key in seen:
+            stale.append(result_id)
+        else:
+            seen.add(key)
+    for start in range(0, len(stale), 1000):
+        UserExamResult.objects.filter(id__in=stale[start:start + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_userexamresult_guest_email_userexamresult_guest_name_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_results, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='userexamresult',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Client-supplied key of the submission that produced this result', max_length=100, null=True, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='userexamresult',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'exam'), name='unique_user_exam_result'),
+        ),
+        migrations.AddConstraint(
+            model_name='userexamresult',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('session_id', 'exam'), name='unique_guest_session_exam_result'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+from django.db.models import Min, OuterRef, Subquery
+
+
+def backfill_attempts(apps, schema_editor):
+    """Creates one ExamAttempt per existing (exam, session_id) and links answers/results to it."""
+    ExamAttempt = apps.get_model('quiz', 'ExamAttempt')
+    UserAnswer = apps.get_model('quiz', 'UserAnswer')
+    UserExamResult = apps.get_model('quiz', 'UserExamResult')
+
+    attempts = {}
+    started = UserAnswer.objects.values('exam_id', 'session_id').annotate(started_at=Min('answered_at'))
+    for row in started.iterator():
+        attempts[(row['exam_id'], row['session_id'])] = ExamAttempt(
+            exam_id=row['exam_id'],
+            session_id=row['session_id'],
+            started_at=row['started_at'],
+        )
+
+    # Results are newest first, so each attempt takes the user and
+    # finish time of the latest result submitted from that session.
+    results = UserExamResult.objects.order_by('-completed_at', '-id').values_list(
+        'exam_id', 'session_id', 'user_id', 'completed_at'
+    )
+    for exam_id, session_id, user_id, completed_at in results.iterator():
+        attempt = attempts.setdefault(
+            (exam_id, session_id),
+            ExamAttempt(exam_id=exam_id, session_id=session_id, started_at=completed_at),
+        )
+        if attempt.state != 'submitted':
+            attempt.state = 'submitted'
+            attempt.user_id = user_id
+            attempt.finished_at = completed_at
+
+    ExamAttempt.objects.bulk_create(attempts.values(), batch_size=1000)
+
+    session_attempts = ExamAttempt.objects.filter(exam_id=OuterRef('exam_id'), session_id=OuterRef('session_id'))
+    UserAnswer.objects.update(attempt_id=Subquery(session_attempts.values('id')[:1]))
+
+    # Only one result may point at an attempt: the latest one of each
+    # session, in one UPDATE. Older results from a shared browser session
+    # keep attempt=NULL.
+    latest_result = UserExamResult.objects.filter(
+        exam_id=OuterRef('exam_id'), session_id=OuterRef('session_id')
+    ).order_by('-completed_at', '-id').values('id')[:1]
+    UserExamResult.objects.filter(id=Subquery(latest_result)).update(
+        attempt_id=Subquery(session_attempts.filter(state='submitted').values('id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_examattempt'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_attempts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_backfill_exam_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examattempt',
+            name='compacted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='examattempt',
+            name='packed_answers',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_leaderboard(apps, schema_editor):
+    UserExamResult = apps.get_model('quiz', 'UserExamResult')
+    LeaderboardEntry = apps.get_model('quiz', 'LeaderboardEntry')
+    best = {}
+    results = UserExamResult.objects.filter(user__isnull=False).order_by('-score', 'completed_at').values_list(
+        'exam_id', 'user_id', 'score', 'total_questions', 'percentage', 'completed_at'
+    )
+    for exam_id, user_id, score, total_questions, percentage, completed_at in results.iterator():
+        best.setdefault((exam_id, user_id), LeaderboardEntry(
+            exam_id=exam_id,
+            user_id=user_id,
+            score=score,
+            total_questions=total_questions,
+            percentage=percentage,
+            achieved_at=completed_at,
+        ))
+    LeaderboardEntry.objects.bulk_create(best.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quiz', '0015_examattempt_packed_answers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField()),
+                ('total_questions', models.IntegerField()),
+                ('percentage', models.FloatField()),
+                ('achieved_at', models.DateTimeField(help_text='When this best score was first reached (earlier wins ties)')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='quiz.exam')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Leaderboard Entries',
+                'indexes': [models.Index(fields=['exam', '-score', 'achieved_at', 'id'], name='quiz_leaderboard_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('exam', 'user'), name='unique_exam_user_leaderboard_entry'),
+        ),
+        migrations.RunPython(backfill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def backfill_rankings(apps, schema_editor):
+    UserExamResult = apps.get_model('quiz', 'UserExamResult')
+    UserRanking = apps.get_model('quiz', 'UserRanking')
+    totals = UserExamResult.objects.filter(user__isnull=False).values('user_id').annotate(
+        total=Sum('score'), taken=Count('id')
+    ).order_by()
+    UserRanking.objects.bulk_create(
+        (UserRanking(user_id=row['user_id'], total_score=row['total'], exams_taken=row['taken']) for row in totals),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quiz', '0016_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_score', models.IntegerField(default=0)),
+                ('exams_taken', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ranking', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_score', 'user'], name='quiz_ranking_total_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rankings, migrations.RunPython.noop),
+    ]
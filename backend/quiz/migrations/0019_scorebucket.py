@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BUCKETS = 20
+
+
+def backfill_histograms(apps, schema_editor):
+    UserExamResult = apps.get_model('quiz', 'UserExamResult')
+    ScoreBucket = apps.get_model('quiz', 'ScoreBucket')
+    counts = {}
+    for exam_id, percentage in UserExamResult.objects.values_list('exam_id', 'percentage').iterator():
+        bucket = min(max(int(percentage // (100 / BUCKETS)), 0), BUCKETS - 1)
+        counts[exam_id, bucket] = counts.get((exam_id, bucket), 0) + 1
+    ScoreBucket.objects.bulk_create(
+        (ScoreBucket(exam_id=exam_id, bucket=bucket, count=count) for (exam_id, bucket), count in counts.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0018_userstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_buckets', to='quiz.exam')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='scorebucket',
+            constraint=models.UniqueConstraint(fields=('exam', 'bucket'), name='unique_exam_score_bucket'),
+        ),
+        migrations.RunPython(backfill_histograms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0022_topicmastery'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['-created_at', '-id'], name='quiz_contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['status', 'is_active', '-created_at', '-id'], name='quiz_exam_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['subcategory', '-created_at', '-id'], name='quiz_exam_subcat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userexamresult',
+            index=models.Index(fields=['user', '-completed_at', '-id'], name='quiz_result_user_history_idx'),
+        ),
+    ]
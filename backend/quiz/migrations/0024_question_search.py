@@ -0,0 +1,168 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:47
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'quiz_question_fts'
+DOCUMENTS = 'quiz_questionsearchdocument'
+
+SQLITE_CREATE = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        question_terms, option_terms, label_terms, facet_terms,
+        content='{DOCUMENTS}', content_rowid='id', tokenize='ascii', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENTS} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, question_terms, option_terms, label_terms, facet_terms)
+        VALUES (new.id, new.question_terms, new.option_terms, new.label_terms, new.facet_terms);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENTS} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question_terms, option_terms, label_terms, facet_terms)
+        VALUES ('delete', old.id, old.question_terms, old.option_terms, old.label_terms, old.facet_terms);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENTS} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question_terms, option_terms, label_terms, facet_terms)
+        VALUES ('delete', old.id, old.question_terms, old.option_terms, old.label_terms, old.facet_terms);
+        INSERT INTO {FTS_TABLE}(rowid, question_terms, option_terms, label_terms, facet_terms)
+        VALUES (new.id, new.question_terms, new.option_terms, new.label_terms, new.facet_terms);
+    END""",
+]
+SQLITE_DROP = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+# Frozen copy of quiz.search's tokenizing and document fields as of this
+# migration, so later changes there cannot alter what the backfill writes.
+# `rebuild_search_index` rewrites the documents with the current code.
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'which',
+    'with',
+    'का', 'के', 'की', 'को', 'में', 'से', 'है', 'हैं', 'था', 'थे', 'थी', 'और',
+    'पर', 'यह', 'वह', 'एक', 'भी', 'या', 'तो', 'ही', 'लिए', 'ने',
+))
+_TOKEN = re.compile('(?:[^\\W_]|[\u0900-\u0963\u0966-\u097f])+')
+_DEVANAGARI_DIGITS = str.maketrans('०१२३४५६७८९', '0123456789')
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = text.replace('\u093c', '').replace('\u0901', '\u0902')
+    return unicodedata.normalize('NFKC', text).casefold().translate(_DEVANAGARI_DIGITS)
+
+
+def _terms(*texts):
+    seen = {}
+    for text in texts:
+        for token in _TOKEN.findall(_normalize(text)):
+            if token not in STOPWORDS:
+                seen.setdefault(token)
+    return ' '.join(seen)
+
+
+def _facet(kind, value):
+    digest = hashlib.blake2b(_normalize(str(value)).encode(), digest_size=6).hexdigest()
+    return f'{kind}{digest}'
+
+
+def _document_fields(question, option_texts):
+    labels = {
+        'exam': question.exam_id,
+        'subject': question.subject or '',
+        'topic': question.topic or '',
+        'difficulty': question.difficulty or '',
+    }
+    return {
+        'exam_id': question.exam_id,
+        'subject': labels['subject'],
+        'topic': labels['topic'],
+        'difficulty': labels['difficulty'],
+        'question_terms': _terms(question.question_text),
+        'option_terms': _terms(*option_texts),
+        'label_terms': _terms(question.subject, question.topic),
+        'facet_terms': ' '.join(_facet(kind, value) for kind, value in labels.items() if value),
+    }
+
+
+def _weighted(column, weight):
+    # Terms are already tokenized (quiz/search.py), so skip the text parser
+    return f"setweight(array_to_tsvector(string_to_array(NULLIF({column}, ''), ' ')), '{weight}')"
+
+
+POSTGRES_CREATE = [
+    f"""ALTER TABLE {DOCUMENTS} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        COALESCE({_weighted('question_terms', 'A')}, ''::tsvector)
+        || COALESCE({_weighted('option_terms', 'B')}, ''::tsvector)
+        || COALESCE({_weighted('label_terms', 'C')}, ''::tsvector)
+        || COALESCE({_weighted('facet_terms', 'D')}, ''::tsvector)
+    ) STORED""",
+    f'CREATE INDEX quiz_qsearch_vector_gin ON {DOCUMENTS} USING GIN (search_vector)',
+]
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS quiz_qsearch_vector_gin',
+    f'ALTER TABLE {DOCUMENTS} DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP})
+
+
+def backfill_search_documents(apps, schema_editor):
+    Question = apps.get_model('quiz', 'Question')
+    Answer = apps.get_model('quiz', 'Answer')
+    QuestionSearchDocument = apps.get_model('quiz', 'QuestionSearchDocument')
+    options = {}
+    for question_id, text in Answer.objects.order_by('order', 'id').values_list('question_id', 'answer_text').iterator():
+        options.setdefault(question_id, []).append(text)
+    QuestionSearchDocument.objects.bulk_create(
+        (
+            QuestionSearchDocument(question_id=q.id, **_document_fields(q, options.get(q.id, ())))
+            for q in Question.objects.only('exam_id', 'question_text', 'subject', 'topic', 'difficulty').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0023_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(blank=True, default='', max_length=100)),
+                ('topic', models.CharField(blank=True, default='', max_length=100)),
+                ('difficulty', models.CharField(blank=True, default='', max_length=20)),
+                ('question_terms', models.TextField(blank=True, default='')),
+                ('option_terms', models.TextField(blank=True, default='')),
+                ('label_terms', models.TextField(blank=True, default='')),
+                ('facet_terms', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='quiz.exam')),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='quiz.question')),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0024_question_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-created_at', '-id', 'exam'], name='quiz_question_bank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['subject', '-created_at', '-id', 'exam'], name='quiz_question_subject_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['subject', 'topic', '-created_at', '-id', 'exam'], name='quiz_question_topic_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['topic', '-created_at', '-id', 'exam'], name='quiz_question_topic_only_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['difficulty', '-created_at', '-id', 'exam'], name='quiz_question_difficulty_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0025_question_bank_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='blueprint',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='source_question',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies', to='quiz.question'),
+        ),
+        migrations.AlterField(
+            model_name='exam',
+            name='pdf_file',
+            field=models.FileField(blank=True, upload_to='pdfs/'),
+        ),
+    ]
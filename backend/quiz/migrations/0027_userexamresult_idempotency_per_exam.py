@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0026_exam_assembly'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userexamresult',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Client-supplied key of the submission that produced this result', max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='userexamresult',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', False)), fields=('exam', 'idempotency_key'), name='unique_exam_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+"""
+Rewrites packed answers from format 1 (selected option position in the
+question's (order, id) option list) to format 2 (selected answer id).
+
+Positions are resolved against the options as they are now, the same way
+format 1 readers did, so nothing read back changes. The layouts are copied
+here rather than imported from quiz.packing so later changes there cannot
+alter this migration.
+"""
+import struct
+import sys
+from array import array
+
+from django.db import migrations
+
+HEADER = struct.Struct('<BBI')
+NO_OPTION = 255
+BATCH_SIZE = 500
+
+
+def _unpack_v1(blob):
+    _, width, count = HEADER.unpack_from(blob)
+    offset = HEADER.size
+    ids = array('Q' if width == 8 else 'I')
+    ids.frombytes(blob[offset:offset + width * count])
+    if sys.byteorder != 'little':
+        ids.byteswap()
+    offset += width * count
+    return ids, blob[offset:offset + count], blob[offset + count:]
+
+
+def _pack_v2(ids, answer_ids, correct):
+    width = 8 if max(list(ids) + answer_ids, default=0) >= 2 ** 32 else 4
+    typecode = 'Q' if width == 8 else 'I'
+    ids, answers = array(typecode, ids), array(typecode, answer_ids)
+    if sys.byteorder != 'little':
+        ids.byteswap()
+        answers.byteswap()
+    return HEADER.pack(2, width, len(ids)) + ids.tobytes() + answers.tobytes() + bytes(correct)
+
+
+def forwards(apps, schema_editor):
+    ExamAttempt = apps.get_model('quiz', 'ExamAttempt')
+    Answer = apps.get_model('quiz', 'Answer')
+    attempts = ExamAttempt.objects.filter(packed_answers__isnull=False).order_by('id')
+    options = {}
+    last_id = 0
+    while True:
+        batch = list(attempts.filter(id__gt=last_id).values_list('id', 'exam_id', 'packed_answers')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        updates = []
+        for attempt_id, exam_id, blob in batch:
+            blob = bytes(blob)
+            if blob[0] != 1:
+                continue
+            if exam_id not in options:
+                options[exam_id] = {}
+                rows = Answer.objects.filter(question__exam_id=exam_id).order_by('order', 'id')
+                for question_id, answer_id in rows.values_list('question_id', 'id'):
+                    options[exam_id].setdefault(question_id, []).append(answer_id)
+            ids, positions, correct = _unpack_v1(blob)
+            answer_ids = []
+            for question_id, position in zip(ids, positions):
+                option_ids = options[exam_id].get(question_id, [])
+                answer_ids.append(option_ids[position] if position != NO_OPTION and position < len(option_ids) else 0)
+            updates.append(ExamAttempt(id=attempt_id, packed_answers=_pack_v2(ids, answer_ids, correct)))
+        ExamAttempt.objects.bulk_update(updates, ['packed_answers'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0027_userexamresult_idempotency_per_exam'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
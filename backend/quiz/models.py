@@ -79,7 +79,7 @@ class Exam(models.Model):
         help_text="Draft exams are not visible to students"
     )
 
-    pdf_file = models.FileField(upload_to='pdfs/')
+    pdf_file = models.FileField(upload_to='pdfs/', blank=True)
     duration_minutes = models.IntegerField(default=60)
     total_questions = models.IntegerField(default=10)
     
@@ -100,6 +100,8 @@ class Exam(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True, help_text="Inactive exams are hidden from students")
+    # Set on mock papers assembled from the question bank (see quiz/assembly.py)
+    blueprint = models.JSONField(null=True, blank=True, editable=False)
 
     def __str__(self):
         year_str = f" ({self.year})" if self.year else ""
@@ -108,6 +110,11 @@ class Exam(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the published catalog (see quiz/pagination.py)
+            models.Index(fields=['status', 'is_active', '-created_at', '-id'], name='quiz_exam_published_idx'),
+            models.Index(fields=['subcategory', '-created_at', '-id'], name='quiz_exam_subcat_created_idx'),
+        ]
 
 
 
@@ -147,11 +154,26 @@ class Question(models.Model):
     topic = models.CharField(max_length=100, blank=True, null=True)   # e.g. "Blood Relations"
     difficulty = models.CharField(max_length=20, blank=True, null=True) # e.g. "Easy", "Medium", "Hard"
 
+    # Bank question this one was copied from into an assembled exam
+    source_question = models.ForeignKey(
+        'self', related_name='copies', on_delete=models.SET_NULL, null=True, blank=True, editable=False
+    )
+
     def __str__(self):
         return f"{self.exam.title} - Q{self.order + 1}"
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            # Question bank keyset pages, newest first (see api.question_bank).
+            # exam_id rides along so the published-exam check is read from
+            # the index instead of the row.
+            models.Index(fields=['-created_at', '-id', 'exam'], name='quiz_question_bank_idx'),
+            models.Index(fields=['subject', '-created_at', '-id', 'exam'], name='quiz_question_subject_idx'),
+            models.Index(fields=['subject', 'topic', '-created_at', '-id', 'exam'], name='quiz_question_topic_idx'),
+            models.Index(fields=['topic', '-created_at', '-id', 'exam'], name='quiz_question_topic_only_idx'),
+            models.Index(fields=['difficulty', '-created_at', '-id', 'exam'], name='quiz_question_difficulty_idx'),
+        ]
 
 
 class Answer(models.Model):
@@ -167,7 +189,47 @@ class Answer(models.Model):
         ordering = ['order']
 
 
+from django.contrib.auth.models import User
+
+class ExamAttempt(models.Model):
+    """One sitting of an exam by a browser session (guest or registered user)."""
+    STATE_CHOICES = [
+        ('in_progress', 'In Progress'),
+        ('submitted', 'Submitted'),
+    ]
+
+    exam = models.ForeignKey(Exam, related_name='attempts', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='exam_attempts', on_delete=models.SET_NULL, null=True, blank=True)
+    session_id = models.CharField(max_length=100)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='in_progress')
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Answers of compacted attempts (see quiz/packing.py); their UserAnswer rows are removed
+    packed_answers = models.BinaryField(null=True, blank=True, editable=False)
+    compacted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.session_id} - {self.exam.title} ({self.state})"
+
+    class Meta:
+        ordering = ['-started_at']
+        constraints = [
+            # A session has at most one open attempt per exam; retakes start a new one
+            models.UniqueConstraint(
+                fields=['session_id', 'exam'],
+                condition=models.Q(state='in_progress'),
+                name='unique_open_attempt_per_session',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'exam'], name='quiz_attempt_user_exam_idx'),
+            models.Index(fields=['session_id', 'exam', 'state'], name='quiz_attempt_session_idx'),
+        ]
+
+
 class UserAnswer(models.Model):
+    attempt = models.ForeignKey(ExamAttempt, related_name='answers', on_delete=models.CASCADE, null=True, blank=True)
     exam = models.ForeignKey(Exam, related_name='user_answers', on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     selected_answer = models.ForeignKey(Answer, null=True, blank=True, on_delete=models.SET_NULL)
@@ -180,13 +242,14 @@ class UserAnswer(models.Model):
         return f"{self.session_id} - {self.question}"
 
     class Meta:
-        unique_together = [('session_id', 'question')]
         ordering = ['answered_at']
+        constraints = [
+            models.UniqueConstraint(fields=['attempt', 'question'], name='unique_attempt_question_answer'),
+        ]
 
 
-from django.contrib.auth.models import User
-
 class UserExamResult(models.Model):
+    attempt = models.OneToOneField(ExamAttempt, related_name='result', on_delete=models.SET_NULL, null=True, blank=True)
     user = models.ForeignKey(User, related_name='exam_results', on_delete=models.SET_NULL, null=True, blank=True)
     guest_name = models.CharField(max_length=100, null=True, blank=True)
     guest_email = models.EmailField(null=True, blank=True)
@@ -196,6 +259,12 @@ class UserExamResult(models.Model):
     correct_answers = models.IntegerField()
     percentage = models.FloatField()
     session_id = models.CharField(max_length=100, db_index=True)
+    idempotency_key = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        help_text="Client-supplied key of the submission that produced this result"
+    )
     completed_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -203,6 +272,181 @@ class UserExamResult(models.Model):
 
     class Meta:
         ordering = ['-completed_at']
+        constraints = [
+            # One result per registered user per exam, one per guest session per exam
+            models.UniqueConstraint(
+                fields=['user', 'exam'],
+                condition=models.Q(user__isnull=False),
+                name='unique_user_exam_result',
+            ),
+            models.UniqueConstraint(
+                fields=['session_id', 'exam'],
+                condition=models.Q(user__isnull=True),
+                name='unique_guest_session_exam_result',
+            ),
+            # Idempotency keys are scoped to the exam they were sent for
+            models.UniqueConstraint(
+                fields=['exam', 'idempotency_key'],
+                condition=models.Q(idempotency_key__isnull=False),
+                name='unique_exam_idempotency_key',
+            ),
+        ]
+        indexes = [
+            # A user's result history, newest first, paginated by keyset
+            models.Index(fields=['user', '-completed_at', '-id'], name='quiz_result_user_history_idx'),
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """Best result of each registered user per exam, maintained on every submit."""
+    exam = models.ForeignKey(Exam, related_name='leaderboard_entries', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='leaderboard_entries', on_delete=models.CASCADE)
+    score = models.IntegerField()
+    total_questions = models.IntegerField()
+    percentage = models.FloatField()
+    achieved_at = models.DateTimeField(help_text="When this best score was first reached (earlier wins ties)")
+
+    def __str__(self):
+        return f"{self.user.username} - {self.exam.title} ({self.score})"
+
+    class Meta:
+        verbose_name_plural = "Leaderboard Entries"
+        constraints = [
+            models.UniqueConstraint(fields=['exam', 'user'], name='unique_exam_user_leaderboard_entry'),
+        ]
+        indexes = [
+            # Matches the leaderboard ordering, for keyset pages and rank counts
+            models.Index(fields=['exam', '-score', 'achieved_at', 'id'], name='quiz_leaderboard_rank_idx'),
+        ]
+
+
+class UserRanking(models.Model):
+    """Global leaderboard row: sum of a user's exam scores (database ranking backend)."""
+    user = models.OneToOneField(User, related_name='ranking', on_delete=models.CASCADE)
+    total_score = models.IntegerField(default=0)
+    exams_taken = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} ({self.total_score})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_score', 'user'], name='quiz_ranking_total_idx'),
+        ]
+
+
+class QuestionStats(models.Model):
+    """
+    Classical item analysis for a question, written by `analyze_items`
+    (see quiz/item_analysis.py). Unanswered questions count as incorrect.
+    """
+    question = models.OneToOneField(Question, related_name='stats', on_delete=models.CASCADE)
+    exam = models.ForeignKey(Exam, related_name='question_stats', on_delete=models.CASCADE)
+    attempts = models.IntegerField(default=0)  # submitted attempts of the exam
+    responses = models.IntegerField(default=0)  # attempts that answered this question
+    correct = models.IntegerField(default=0)
+    p_value = models.FloatField(null=True, blank=True)  # fraction correct
+    point_biserial = models.FloatField(null=True, blank=True)  # correlation with the rest score
+    option_counts = models.JSONField(default=dict)  # {answer id: times selected}
+    computed_at = models.DateTimeField(auto_now=True)
+
+    # Item response theory calibration, written by `calibrate_irt` (see quiz/irt.py)
+    irt_difficulty = models.FloatField(null=True, blank=True)
+    irt_discrimination = models.FloatField(null=True, blank=True)
+    irt_responses = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for {self.question}"
+
+
+class UserAbility(models.Model):
+    """A user's IRT ability estimate (theta) from the latest `calibrate_irt` run."""
+    user = models.OneToOneField(User, related_name='ability', on_delete=models.CASCADE)
+    theta = models.FloatField(default=0)
+    standard_error = models.FloatField(null=True, blank=True)
+    responses = models.IntegerField(default=0)
+    fitted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.theta:.2f}"
+
+
+class TopicMastery(models.Model):
+    """A user's answers per (subject, topic), added to each time they submit an attempt (see quiz/mastery.py)."""
+    user = models.ForeignKey(User, related_name='topic_mastery', on_delete=models.CASCADE)
+    subject = models.CharField(max_length=100, blank=True, default='')
+    topic = models.CharField(max_length=100, blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    last_seen = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username}: {self.subject} / {self.topic} ({self.correct}/{self.attempts})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'subject', 'topic'], name='unique_user_topic_mastery'),
+        ]
+
+
+class ScoreBucket(models.Model):
+    """Number of results for an exam whose percentage falls in one histogram bucket (see quiz/histograms.py)."""
+    exam = models.ForeignKey(Exam, related_name='score_buckets', on_delete=models.CASCADE)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.exam.title} bucket {self.bucket}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['exam', 'bucket'], name='unique_exam_score_bucket'),
+        ]
+
+
+class QuestionSearchDocument(models.Model):
+    """Pre-tokenized search text of one question; indexed by FTS5 or a tsvector (see quiz/search.py)."""
+    question = models.OneToOneField(Question, related_name='search_document', on_delete=models.CASCADE)
+    exam = models.ForeignKey(Exam, related_name='+', on_delete=models.CASCADE)
+    subject = models.CharField(max_length=100, blank=True, default='')
+    topic = models.CharField(max_length=100, blank=True, default='')
+    difficulty = models.CharField(max_length=20, blank=True, default='')
+    # Space-separated normalized tokens, weighted question > options > labels
+    question_terms = models.TextField(blank=True, default='')
+    option_terms = models.TextField(blank=True, default='')
+    label_terms = models.TextField(blank=True, default='')
+    # One token per exam / subject / topic / difficulty, for filtering
+    facet_terms = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for question {self.question_id}"
+
+
+class UserStats(models.Model):
+    """
+    Dashboard aggregates for one user, kept in step with UserExamResult
+    by quiz/user_stats.py.
+
+    categories: {category name: [percentage sum, result count]}
+    recent:     newest-first list of {result_id, exam_title, category,
+                percentage, date}, capped at user_stats.RECENT_SIZE
+    """
+    user = models.OneToOneField(User, related_name='stats', on_delete=models.CASCADE)
+    total_tests = models.IntegerField(default=0)
+    percentage_sum = models.FloatField(default=0)
+    tests_passed = models.IntegerField(default=0)
+    categories = models.JSONField(default=dict)
+    recent = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_score(self):
+        return self.percentage_sum / self.total_tests if self.total_tests else 0
+
+    def __str__(self):
+        return f"Stats for {self.user.username}"
 
 
 class ContactMessage(models.Model):
@@ -223,5 +467,8 @@ class ContactMessage(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='quiz_contact_created_idx'),
+        ]
         verbose_name = "Contact Message"
         verbose_name_plural = "Contact Messages"
\ No newline at end of file
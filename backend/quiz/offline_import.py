@@ -0,0 +1,259 @@
+"""
+Bulk import of offline answer sheets (OMR scans, printed mock tests).
+
+Sheet format: CSV, one row per candidate.
+
+    candidate,name,email,1,2,3,...
+    R1001,Asha,asha@example.com,A,C,,D,...
+
+`candidate` is the centre's roll number and must be unique within the exam;
+`name` and `email` are optional. Numbered columns are question positions in
+the exam's (order, id) ordering; a missing column means nobody answered that
+question. Cells hold the chosen option as a letter (A, B, ...) or a 1-based
+number; blank is unanswered.
+
+Grading is a matrix lookup: the sheet becomes an int8 candidates x questions
+array of option indexes (-1 = blank), the answer key a boolean questions x
+options table, and table[question, option] is the correctness matrix;
+scores are correct @ points. Each candidate becomes a submitted guest
+ExamAttempt with packed answers (see packing.py) plus its UserExamResult,
+written with bulk_create in one transaction. The session id is
+"offline:<exam id>:<roll number>", so importing the same sheet twice skips
+the candidates that are already in.
+"""
+import csv
+import io
+import time
+from array import array
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from . import histograms
+from .models import ExamAttempt, UserExamResult
+from .packing import answer_key_for, pack_arrays
+
+BATCH_SIZE = 2000
+BLANK = -1
+INVALID = -2
+
+# Cell value -> option index
+_CODES = {'': BLANK}
+for _i in range(26):
+    _CODES[chr(ord('A') + _i)] = _i
+    _CODES[chr(ord('a') + _i)] = _i
+    _CODES[str(_i + 1)] = _i
+
+
+class SheetError(ValueError):
+    """The uploaded sheet cannot be imported; the message says where."""
+
+
+def session_id_for(exam_id, candidate):
+    return f'offline:{exam_id}:{candidate}'
+
+
+# ---------------------------------
+# ANSWER KEY AS ARRAYS
+# ---------------------------------
+class KeyTable:
+    """An exam's answer key as arrays, questions in (order, id) order."""
+
+    def __init__(self, key):
+        self.question_ids = np.array(list(key.entries), dtype=np.int64)
+        entries = list(key.entries.values())
+        self.points = np.array([points for _, points, _ in entries], dtype=np.int64)
+        self.option_counts = np.array([len(option_ids) for _, _, option_ids in entries], dtype=np.int64)
+        width = max(1, int(self.option_counts.max(initial=0)))
+        self.correct = np.zeros((len(entries), width), dtype=bool)
+        self.option_ids = np.zeros((len(entries), width), dtype=np.int64)
+        for j, (correct_ids, _, option_ids) in enumerate(entries):
+            for option, answer_id in enumerate(option_ids):
+                self.correct[j, option] = answer_id in correct_ids
+                self.option_ids[j, option] = answer_id
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def grade(self, options):
+        """Returns (correct matrix, correct answers, score) for an option-index matrix."""
+        rows = np.arange(len(self))
+        answered = options >= 0
+        correct = answered & self.correct[rows, np.where(answered, options, 0)]
+        return correct, correct.sum(axis=1), correct @ self.points
+
+
+# ---------------------------------
+# PARSING
+# ---------------------------------
+class Sheet:
+    """Parsed sheet: candidate columns plus the options matrix (int8)."""
+
+    def __init__(self, candidates, names, emails, options):
+        self.candidates = candidates
+        self.names = names
+        self.emails = emails
+        self.options = options
+
+    def __len__(self):
+        return len(self.candidates)
+
+
+def read_sheet(lines, table):
+    """Parses CSV lines (str) against a KeyTable. Raises SheetError."""
+    reader = csv.reader(lines)
+    header = [cell.strip().lower() for cell in next(reader, [])]
+    if 'candidate' not in header:
+        raise SheetError("The header row needs a 'candidate' column")
+
+    n = len(table)
+    candidate_col = header.index('candidate')
+    name_col = header.index('name') if 'name' in header else None
+    email_col = header.index('email') if 'email' in header else None
+    question_cols = []  # (csv column, question position)
+    for col, cell in enumerate(header):
+        if cell.isdigit():
+            position = int(cell) - 1
+            if not 0 <= position < n:
+                raise SheetError(f"Column '{cell}': the exam has {n} questions")
+            question_cols.append((col, position))
+
+    candidates, names, emails, seen = [], [], [], set()
+    cells = array('b')
+    blank_row = [BLANK] * n
+    codes = _CODES
+    for line_no, row in enumerate(reader, start=2):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        candidate = row[candidate_col].strip() if candidate_col < len(row) else ''
+        if not candidate:
+            raise SheetError(f'Line {line_no}: missing candidate')
+        if candidate in seen:
+            raise SheetError(f"Line {line_no}: candidate '{candidate}' appears twice")
+        seen.add(candidate)
+        candidates.append(candidate)
+        names.append(row[name_col].strip() if name_col is not None and name_col < len(row) else '')
+        emails.append(row[email_col].strip() if email_col is not None and email_col < len(row) else '')
+
+        values = list(blank_row)
+        for col, position in question_cols:
+            if col < len(row):
+                cell = row[col]
+                code = codes.get(cell)
+                if code is None:
+                    code = codes.get(cell.strip().upper(), INVALID)
+                if code == INVALID:
+                    raise SheetError(f"Line {line_no}, question {position + 1}: unknown option '{cell}'")
+                values[position] = code
+        cells.extend(values)
+
+    options = np.frombuffer(cells, dtype=np.int8).reshape(len(candidates), n)
+    out_of_range = np.argwhere(options >= table.option_counts)
+    if len(out_of_range):
+        row, position = out_of_range[0]
+        raise SheetError(
+            f"Candidate '{candidates[row]}', question {position + 1}: "
+            f"option {options[row, position] + 1} does not exist"
+        )
+    return Sheet(candidates, names, emails, options)
+
+
+# ---------------------------------
+# IMPORT
+# ---------------------------------
+def import_sheet(exam_id, lines, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Grades a sheet and stores one attempt and result per new candidate.
+    Returns a summary dict: candidates, imported, skipped, mean_percentage,
+    seconds. Raises SheetError for a malformed sheet.
+    """
+    started = time.monotonic()
+    key = answer_key_for(exam_id)
+    if key is None or not len(key):
+        raise SheetError(f'Exam {exam_id} has no questions')
+    table = KeyTable(key)
+    sheet = read_sheet(lines, table)
+
+    correct, correct_counts, scores = table.grade(sheet.options)
+    total = len(table)
+    percentages = [round(c / total * 100, 2) for c in correct_counts.tolist()]
+
+    prefix = session_id_for(exam_id, '')
+    existing = set(
+        ExamAttempt.objects.filter(exam_id=exam_id, session_id__startswith=prefix).values_list('session_id', flat=True)
+    )
+    new_rows = [i for i, candidate in enumerate(sheet.candidates) if session_id_for(exam_id, candidate) not in existing]
+
+    summary = {
+        'candidates': len(sheet),
+        'imported': 0 if dry_run else len(new_rows),
+        'skipped': len(sheet) - len(new_rows),
+        'mean_percentage': round(float(np.mean(percentages)), 2) if percentages else 0.0,
+    }
+    if dry_run:
+        summary['seconds'] = time.monotonic() - started
+        return summary
+
+    # Packed answers list questions by ascending id and store the chosen answer ids
+    by_id = np.argsort(table.question_ids, kind='stable')
+    sorted_ids = table.question_ids[by_id]
+    options_by_id = sheet.options[:, by_id]
+    correct_by_id = correct[:, by_id]
+    answer_ids_by_id = table.option_ids[by_id][np.arange(len(by_id)), np.maximum(options_by_id, 0)]
+
+    now = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(new_rows), batch_size):
+            batch = new_rows[start:start + batch_size]
+            attempts = []
+            for i in batch:
+                answered = options_by_id[i] >= 0
+                attempts.append(ExamAttempt(
+                    exam_id=exam_id,
+                    session_id=session_id_for(exam_id, sheet.candidates[i]),
+                    state='submitted',
+                    started_at=now,
+                    finished_at=now,
+                    packed_answers=pack_arrays(
+                        sorted_ids[answered], answer_ids_by_id[i][answered], correct_by_id[i][answered]
+                    ),
+                    compacted_at=now,
+                ))
+            ExamAttempt.objects.bulk_create(attempts)
+            UserExamResult.objects.bulk_create([
+                UserExamResult(
+                    attempt=attempt,
+                    exam_id=exam_id,
+                    guest_name=sheet.names[i] or sheet.candidates[i],
+                    guest_email=sheet.emails[i] or None,
+                    score=int(scores[i]),
+                    total_questions=total,
+                    correct_answers=int(correct_counts[i]),
+                    percentage=percentages[i],
+                    session_id=attempt.session_id,
+                )
+                for i, attempt in zip(batch, attempts)
+            ])
+        if new_rows:
+            histograms.recompute_exam_histogram(exam_id)
+
+    summary['seconds'] = time.monotonic() - started
+    return summary
+
+
+def synthetic_sheet(exam_id, candidates, seed=0):
+    """A random CSV sheet for the exam, as a text buffer (benchmarking)."""
+    table = KeyTable(answer_key_for(exam_id))
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, np.maximum(table.option_counts, 1), size=(candidates, len(table)))
+    picks[rng.random(picks.shape) < 0.05] = BLANK
+    letters = np.array([''] + [chr(ord('A') + i) for i in range(26)])
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['candidate', 'name', 'email'] + [str(j + 1) for j in range(len(table))])
+    for i, row in enumerate(letters[picks + 1].tolist()):
+        writer.writerow([f'S{i:07d}', '', ''] + row)
+    buffer.seek(0)
+    return buffer
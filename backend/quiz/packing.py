@@ -0,0 +1,153 @@
+"""
+Packed storage for the answers of submitted attempts.
+
+`compact_attempts` replaces the one-row-per-question UserAnswer rows of old,
+submitted attempts with a single binary value on ExamAttempt.packed_answers:
+
+    version   uint8    PACK_FORMAT
+    width     uint8    bytes per id (4 or 8)
+    count     uint32   number of answered questions (n)
+    ids       n x uint32/uint64   question ids, ascending
+    answers   n x uint32/uint64   selected answer ids, 0 = none
+    correct   ceil(n / 8) bytes   correctness bitmap, LSB first
+
+About nine bytes per answer instead of a full UserAnswer row plus its
+indexes. Selections are stored by answer id, so reordering or deleting an
+exam's options later never changes what a past attempt chose. Readers go
+through attempt_answers() / iter_packed_answers(), which return the same
+shape whichever storage an attempt uses.
+"""
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+from .answer_key import get_answer_key, build_answer_key
+from .models import Question, UserAnswer
+
+# Format 1 stored option positions; migration 0028 rewrote those blobs
+PACK_FORMAT = 2
+NO_ANSWER = 0
+
+_HEADER = struct.Struct('<BBI')
+
+
+def answer_key_for(exam_id):
+    """Answer key of an exam, even an unpublished one (archival and analytics jobs)."""
+    return get_answer_key(exam_id) or build_answer_key(exam_id, published_only=False)
+
+
+def _to_little_endian(ids):
+    if sys.byteorder != 'little':
+        ids.byteswap()
+    return ids
+
+
+def pack_answers(rows):
+    """Packs (question_id, selected_answer_id or None, is_correct) rows."""
+    rows = sorted(rows)
+    largest = max((max(question_id, answer_id or 0) for question_id, answer_id, _ in rows), default=0)
+    width = 8 if largest >= 2 ** 32 else 4
+    typecode = 'Q' if width == 8 else 'I'
+    ids = array(typecode, (row[0] for row in rows))
+    answers = array(typecode, (row[1] or NO_ANSWER for row in rows))
+    correct = bytearray((len(rows) + 7) // 8)
+    for i, (_, _, is_correct) in enumerate(rows):
+        if is_correct:
+            correct[i // 8] |= 1 << (i % 8)
+
+    header = _HEADER.pack(PACK_FORMAT, width, len(rows))
+    return header + _to_little_endian(ids).tobytes() + _to_little_endian(answers).tobytes() + bytes(correct)
+
+
+def pack_arrays(question_ids, answer_ids, correct):
+    """
+    Packs one attempt given as parallel NumPy arrays: ascending question
+    ids, selected answer ids (0 = none) and a boolean correctness vector.
+    Same layout as pack_answers(), without the per-row Python work.
+    """
+    largest = max(int(np.max(question_ids, initial=0)), int(np.max(answer_ids, initial=0)))
+    width = 8 if largest >= 2 ** 32 else 4
+    dtype = '<u8' if width == 8 else '<u4'
+    header = _HEADER.pack(PACK_FORMAT, width, len(question_ids))
+    bits = np.packbits(np.asarray(correct, dtype=bool), bitorder='little')
+    return (
+        header + np.asarray(question_ids, dtype=dtype).tobytes()
+        + np.asarray(answer_ids, dtype=dtype).tobytes() + bits.tobytes()
+    )
+
+
+def unpack_answers(blob):
+    """Returns a list of (question_id, selected_answer_id or None, is_correct)."""
+    blob = bytes(blob)
+    version, width, count = _HEADER.unpack_from(blob)
+    if version != PACK_FORMAT:
+        raise ValueError(f"Unsupported packed answer format {version}")
+
+    offset = _HEADER.size
+    typecode = 'Q' if width == 8 else 'I'
+    ids = array(typecode)
+    ids.frombytes(blob[offset:offset + width * count])
+    offset += width * count
+    answers = array(typecode)
+    answers.frombytes(blob[offset:offset + width * count])
+    offset += width * count
+    _to_little_endian(ids)
+    _to_little_endian(answers)
+    correct = blob[offset:]
+
+    return [
+        (
+            ids[i],
+            answers[i] or None,
+            bool(correct[i // 8] >> (i % 8) & 1),
+        )
+        for i in range(count)
+    ]
+
+
+# ---------------------------------
+# TRANSPARENT READERS
+# ---------------------------------
+def attempt_answers(attempt):
+    """
+    The attempt's answers as UserAnswer instances, with question and
+    selected_answer loaded, whether they are stored as rows or packed.
+    Packed answers are unsaved instances (id is None).
+    """
+    if not attempt.packed_answers:
+        return list(
+            UserAnswer.objects.filter(attempt=attempt)
+            .select_related('question', 'selected_answer')
+            .prefetch_related('question__answers')
+        )
+
+    questions = Question.objects.filter(exam_id=attempt.exam_id).prefetch_related('answers').in_bulk()
+    answers = []
+    for question_id, answer_id, is_correct in unpack_answers(attempt.packed_answers):
+        question = questions.get(question_id)
+        if question is None:
+            continue
+        selected = next((a for a in question.answers.all() if a.id == answer_id), None)
+        answers.append(UserAnswer(
+            attempt=attempt,
+            exam_id=attempt.exam_id,
+            session_id=attempt.session_id,
+            question=question,
+            selected_answer=selected,
+            is_correct=is_correct,
+            answered_at=attempt.finished_at,
+        ))
+    return answers
+
+
+def iter_packed_answers(attempts):
+    """
+    Yields (attempt_id, question_id, selected_answer_id, is_correct) for
+    every compacted attempt in the given ExamAttempt queryset.
+    """
+    rows = attempts.filter(packed_answers__isnull=False).values_list('id', 'packed_answers')
+    for attempt_id, blob in rows.iterator(chunk_size=500):
+        for question_id, answer_id, is_correct in unpack_answers(blob):
+            yield attempt_id, question_id, answer_id, is_correct
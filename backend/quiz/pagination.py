@@ -0,0 +1,125 @@
+"""
+Keyset (cursor) pagination on (created_at, id), newest first.
+
+A page is `WHERE (created_at, id) < (cursor) ORDER BY created_at DESC, id
+DESC LIMIT n + 1` over a ('-created_at', '-id') index, so page 5000 costs
+the same as page 1: no OFFSET and no COUNT(*). The cursor is the last row's
+(created_at, id), base64-encoded like the leaderboard cursors.
+
+Totals are opt-in with ?count=approx (see approximate_count): on PostgreSQL
+the planner's row estimate, elsewhere an exact COUNT(*) cached for
+COUNT_CACHE_TIMEOUT seconds.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+COUNT_CACHE_TIMEOUT = 60
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_before(date_field, created_at, pk):
+    """
+    Rows after the cursor in (date_field DESC, id DESC) order. The leading
+    `date_field <= cursor` gives the planner an index range to start from;
+    a bare OR of the two cases would not.
+    """
+    return Q(**{f'{date_field}__lte': created_at}) & (
+        Q(**{f'{date_field}__lt': created_at}) | Q(id__lt=pk)
+    )
+
+
+def approximate_count(queryset):
+    """
+    Row count of a queryset, cheaply: the PostgreSQL planner's estimate for
+    the query (EXPLAIN, no scan), or an exact COUNT(*) cached per query for
+    COUNT_CACHE_TIMEOUT seconds on other databases.
+    """
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    key = 'quiz:count:' + hashlib.blake2b(f'{sql}|{params}'.encode(), digest_size=16).hexdigest()
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        count = int(plan[0]['Plan']['Plan Rows'])
+    else:
+        count = queryset.count()
+    cache.set(key, count, timeout=COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only cursor pages for querysets with created_at and an integer id."""
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    date_field = 'created_at'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = approximate_count(queryset) if request.query_params.get('count') == 'approx' else None
+
+        queryset = queryset.order_by(f'-{self.date_field}', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                created_at, pk = decode_cursor(cursor)
+            except ValueError as e:
+                raise ValidationError({'cursor': str(e)})
+            queryset = queryset.filter(keyset_before(self.date_field, created_at, pk))
+
+        page = list(queryset[:self.limit + 1])
+        self.next_cursor = None
+        if len(page) > self.limit:
+            page = page[:self.limit]
+            last = page[-1]
+            self.next_cursor = encode_cursor(getattr(last, self.date_field), last.pk)
+        return page
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            limit = self.page_size
+        return max(1, min(limit, self.max_page_size))
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            body['count'] = self.count
+        return Response(body)
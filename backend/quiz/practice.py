@@ -0,0 +1,194 @@
+"""
+Random practice sets drawn from the question bank.
+
+Published questions are grouped into buckets by (subject, topic,
+difficulty); each bucket's question ids are an int32 / int64 array kept in
+the shared cache, plus a small directory {bucket: size}. Both are versioned
+with the practice tag (see cache.py), which signals.py only moves when a
+question is added, removed or relabelled, or an exam is published,
+unpublished or deleted; the next request then rebuilds them with one scan
+of the bank. Edits to texts, options or exam details leave them alone.
+
+A draw picks the buckets that match the filters (a missing filter matches
+every value), treats them as one concatenated array and samples positions
+without replacement by rejection: each accepted id costs O(1) expected, so
+k questions cost O(k) whatever the bank size, versus the full sort of
+ORDER BY RANDOM(). Questions the student has already answered are skipped;
+when most of a bucket has been seen, rejection would spin, so the draw
+falls back to sampling from the set difference.
+"""
+from array import array
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q, prefetch_related_objects
+
+from . import cache as quiz_cache
+from .models import Exam, ExamAttempt, Question, UserAnswer
+from .packing import unpack_answers
+
+DIRECTORY = 'practice:directory'
+BUCKET = 'practice:bucket'
+MAX_COUNT = 100
+# Rejection draws per requested question before falling back to a set difference
+MAX_TRIES_PER_PICK = 4
+
+
+def _bucket_params(bucket):
+    subject, topic, difficulty = bucket
+    return {'subject': subject, 'topic': topic, 'difficulty': difficulty}
+
+
+def _published_questions():
+    # Assembled mock papers hold copies of bank questions; leave them out
+    published = Exam.objects.filter(pk=OuterRef('exam_id'), is_active=True, status='published', blueprint__isnull=True)
+    return Question.objects.filter(Exists(published))
+
+
+def _to_array(ids):
+    dtype = np.int32 if not ids or max(ids) < 2 ** 31 else np.int64
+    return np.array(ids, dtype=dtype)
+
+
+# ---------------------------------
+# BUCKETS
+# ---------------------------------
+def _build_buckets():
+    """Scans the bank once, caches every bucket array and returns the directory."""
+    buckets = {}
+    rows = _published_questions().order_by().values_list('subject', 'topic', 'difficulty', 'id')
+    for subject, topic, difficulty, question_id in rows.iterator(chunk_size=10000):
+        buckets.setdefault((subject or '', topic or '', difficulty or ''), array('q')).append(question_id)
+
+    names = list(buckets)
+    keys = quiz_cache.cache_keys(BUCKET, [quiz_cache.PRACTICE], [_bucket_params(b) for b in names])
+    cache.set_many(
+        {key: _to_array(buckets[b]) for key, b in zip(keys, names)},
+        timeout=quiz_cache.TIMEOUT,
+    )
+    return {b: len(buckets[b]) for b in names}
+
+
+def bucket_directory():
+    """{(subject, topic, difficulty): question count} for published questions."""
+    return quiz_cache.cached(DIRECTORY, [quiz_cache.PRACTICE], None, _build_buckets)
+
+
+def load_buckets(buckets):
+    """Id arrays of the buckets, in order; an evicted bucket is re-read from the database."""
+    keys = quiz_cache.cache_keys(BUCKET, [quiz_cache.PRACTICE], [_bucket_params(b) for b in buckets])
+    found = cache.get_many(keys)
+    arrays = []
+    for key, bucket in zip(keys, buckets):
+        ids = found.get(key)
+        if ids is None:
+            rows = _published_questions()
+            for name, label in _bucket_params(bucket).items():
+                matches = Q(**{name: label})
+                if label == '':
+                    # '' stands for both blank and NULL labels
+                    matches |= Q(**{f'{name}__isnull': True})
+                rows = rows.filter(matches)
+            ids = _to_array(list(rows.order_by().values_list('id', flat=True)))
+            cache.set(key, ids, timeout=quiz_cache.TIMEOUT)
+        arrays.append(ids)
+    return arrays
+
+
+def matching_buckets(subject=None, topic=None, difficulty=None):
+    """Buckets (and their sizes) that match the filters; None matches anything."""
+    wanted = (subject, topic, difficulty)
+    return {
+        bucket: size for bucket, size in bucket_directory().items()
+        if all(value is None or value == label for value, label in zip(wanted, bucket))
+    }
+
+
+# ---------------------------------
+# HISTORY
+# ---------------------------------
+def seen_question_ids(user_id=None, session_id=None, last_attempts=None):
+    """
+    Ids of questions answered in a user's (or a guest session's) attempts,
+    optionally only the `last_attempts` most recent, packed attempts included.
+    Every question of an attempted assembled exam marks its bank original as seen.
+    """
+    if user_id:
+        attempts = ExamAttempt.objects.filter(user_id=user_id)
+    elif session_id:
+        attempts = ExamAttempt.objects.filter(session_id=session_id)
+    else:
+        return set()
+    attempt_ids = attempts.order_by('-started_at', '-id').values_list('id', flat=True)
+    if last_attempts:
+        attempt_ids = attempt_ids[:last_attempts]
+    attempt_ids = list(attempt_ids)
+
+    seen = set(UserAnswer.objects.filter(attempt_id__in=attempt_ids).values_list('question_id', flat=True))
+    packed = ExamAttempt.objects.filter(id__in=attempt_ids, packed_answers__isnull=False)
+    for blob in packed.values_list('packed_answers', flat=True):
+        seen.update(question_id for question_id, _, _ in unpack_answers(blob))
+    copies = Question.objects.filter(exam__attempts__id__in=attempt_ids, source_question__isnull=False)
+    seen.update(copies.values_list('source_question_id', flat=True).distinct())
+    return seen
+
+
+# ---------------------------------
+# SAMPLING
+# ---------------------------------
+def draw(arrays, k, exclude=frozenset(), rng=None):
+    """
+    Up to k distinct ids from the concatenation of `arrays`, none of them in
+    `exclude`, in random order.
+    """
+    rng = rng or np.random.default_rng()
+    sizes = np.array([len(a) for a in arrays], dtype=np.int64)
+    ends = np.cumsum(sizes)
+    total = int(ends[-1]) if len(ends) else 0
+    if not total or k <= 0:
+        return []
+
+    picked, tried = [], set()
+    budget = MAX_TRIES_PER_PICK * k
+    while len(picked) < k and budget > 0 and len(tried) < total:
+        positions = rng.integers(total, size=min(budget, 2 * (k - len(picked))))
+        budget -= len(positions)
+        which = np.searchsorted(ends, positions, side='right')
+        for position, b in zip(positions.tolist(), which.tolist()):
+            if position in tried:
+                continue
+            tried.add(position)
+            question_id = int(arrays[b][position - (ends[b] - sizes[b])])
+            if question_id not in exclude:
+                picked.append(question_id)
+                if len(picked) == k:
+                    break
+
+    if len(picked) < k:
+        # Mostly seen: sample what is left directly
+        pool = np.concatenate(arrays).astype(np.int64)
+        taken = np.fromiter(set(exclude) | set(picked), dtype=np.int64)
+        rest = np.setdiff1d(pool, taken, assume_unique=False)
+        more = min(k - len(picked), len(rest))
+        picked += rng.choice(rest, size=more, replace=False).tolist()
+    return picked
+
+
+def sample_questions(k, subject=None, topic=None, difficulty=None, exclude=frozenset(), rng=None):
+    """
+    k random published questions matching the filters, preferring ids not
+    in `exclude`, with their answers prefetched: two queries (in_bulk and
+    the answers) whatever the bank size.
+    """
+    buckets = list(matching_buckets(subject, topic, difficulty))
+    if not buckets:
+        return []
+    arrays = load_buckets(buckets)
+    ids = draw(arrays, k, exclude, rng)
+    if len(ids) < k and exclude:
+        # Everything unseen is taken; top up with questions seen before
+        ids += draw(arrays, k - len(ids), set(ids), rng)
+    found = Question.objects.select_related('exam').in_bulk(ids)
+    questions = [found[question_id] for question_id in ids if question_id in found]
+    prefetch_related_objects(questions, 'answers')
+    return questions
@@ -0,0 +1,260 @@
+"""
+Global leaderboard: each registered user's total score over all exams.
+
+Two interchangeable stores, picked with QUIZ_GLOBAL_RANKING_BACKEND:
+
+    'database' (default)  UserRanking rows; ranks are counts over the
+                          (-total_score, user) index.
+    'redis'               a sorted set (member = user id, score = total score)
+                          plus a hash of exams taken per user. ZINCRBY,
+                          ZREVRANK and ZCOUNT are O(log n); ZREVRANGE adds the
+                          page size.
+
+Both are updated incrementally from grading.submit_attempt with the change in
+the user's result. Redis is written after the transaction commits, so a crash
+in between (or an admin deleting results) leaves it behind until
+`python manage.py rebuild_leaderboards --global` recomputes the store from
+UserExamResult.
+
+Ranks are competition ranks: tied totals share a rank, as on the per-exam
+leaderboard.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .kv import RedisError, get_redis
+from .models import UserExamResult, UserRanking
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+Ranking = namedtuple('Ranking', 'user_id total_score exams_taken rank')
+
+
+def _with_ranks(rows, offset, count_above):
+    """Adds competition ranks to (user_id, total, exams) rows starting at `offset`."""
+    ranked = []
+    for i, (user_id, total, exams) in enumerate(rows):
+        if i == 0:
+            # The first row may tie with rows on the previous page
+            rank = count_above(total) + 1
+        elif total != rows[i - 1][1]:
+            rank = offset + i + 1
+        ranked.append(Ranking(user_id, total, exams, rank))
+    return ranked
+
+
+# ---------------------------------
+# DATABASE STORE
+# ---------------------------------
+class DatabaseRankingStore:
+    CHUNK = 5000
+
+    def add(self, user_id, score_delta, exams_delta):
+        rows = UserRanking.objects.filter(user_id=user_id)
+        changes = {
+            'total_score': F('total_score') + score_delta,
+            'exams_taken': F('exams_taken') + exams_delta,
+            'updated_at': timezone.now(),
+        }
+        if rows.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                UserRanking.objects.create(user_id=user_id, total_score=score_delta, exams_taken=exams_delta)
+        except IntegrityError:
+            rows.update(**changes)
+
+    def add_scores(self, deltas):
+        # One UPDATE per distinct delta and chunk; regrades produce few distinct deltas
+        by_delta = {}
+        for user_id, delta in deltas.items():
+            by_delta.setdefault(delta, []).append(user_id)
+        for delta, user_ids in by_delta.items():
+            for start in range(0, len(user_ids), self.CHUNK):
+                UserRanking.objects.filter(user_id__in=user_ids[start:start + self.CHUNK]).update(
+                    total_score=F('total_score') + delta, updated_at=timezone.now()
+                )
+
+    def count_above(self, total):
+        return UserRanking.objects.filter(total_score__gt=total).count()
+
+    def page(self, offset, limit):
+        rows = list(
+            UserRanking.objects.order_by('-total_score', 'user_id')
+            .values_list('user_id', 'total_score', 'exams_taken')[offset:offset + limit]
+        )
+        return _with_ranks(rows, offset, self.count_above)
+
+    def position(self, user_id):
+        row = UserRanking.objects.filter(user_id=user_id).values_list('total_score', flat=True).first()
+        if row is None:
+            return None
+        return UserRanking.objects.filter(
+            Q(total_score__gt=row) | Q(total_score=row, user_id__lt=user_id)
+        ).count()
+
+    def rank_of(self, user_id):
+        row = UserRanking.objects.filter(user_id=user_id).values_list('total_score', 'exams_taken').first()
+        if row is None:
+            return None
+        return Ranking(user_id, row[0], row[1], self.count_above(row[0]) + 1)
+
+    def replace(self, rows):
+        with transaction.atomic():
+            UserRanking.objects.all().delete()
+            UserRanking.objects.bulk_create(
+                (UserRanking(user_id=user_id, total_score=total, exams_taken=exams) for user_id, total, exams in rows),
+                batch_size=1000,
+            )
+
+
+# ---------------------------------
+# REDIS STORE
+# ---------------------------------
+class RedisRankingStore:
+    KEY = 'quiz:ranking:global'
+    EXAMS_KEY = 'quiz:ranking:exams'
+    CHUNK = 1000
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+
+    def add(self, user_id, score_delta, exams_delta):
+        self.client.zincrby(self.KEY, score_delta, user_id)
+        if exams_delta:
+            self.client.hincrby(self.EXAMS_KEY, user_id, exams_delta)
+
+    def add_scores(self, deltas):
+        for user_id, delta in deltas.items():
+            self.client.zincrby(self.KEY, delta, user_id)
+
+    def count_above(self, total):
+        return self.client.zcount(self.KEY, f'({total}', '+inf')
+
+    def page(self, offset, limit):
+        items = self.client.zrevrange(self.KEY, offset, offset + limit - 1, withscores=True)
+        exams = self.client.hmget(self.EXAMS_KEY, [member for member, _ in items]) if items else []
+        rows = [
+            (int(member), int(score), int(taken or 0))
+            for (member, score), taken in zip(items, exams)
+        ]
+        return _with_ranks(rows, offset, self.count_above)
+
+    def position(self, user_id):
+        return self.client.zrevrank(self.KEY, user_id)
+
+    def rank_of(self, user_id):
+        score = self.client.zscore(self.KEY, user_id)
+        if score is None:
+            return None
+        taken = self.client.hmget(self.EXAMS_KEY, [user_id])[0]
+        return Ranking(user_id, int(score), int(taken or 0), self.count_above(int(score)) + 1)
+
+    def replace(self, rows):
+        # Build under temporary keys and swap them in, so readers never see a partial set
+        tmp_key, tmp_exams = f'{self.KEY}:rebuild', f'{self.EXAMS_KEY}:rebuild'
+        self.client.delete(tmp_key, tmp_exams)
+        rows = list(rows)
+        for start in range(0, len(rows), self.CHUNK):
+            chunk = rows[start:start + self.CHUNK]
+            self.client.zadd(tmp_key, {user_id: total for user_id, total, _ in chunk})
+            self.client.hset(tmp_exams, mapping={user_id: exams for user_id, _, exams in chunk})
+        if rows:
+            self.client.rename(tmp_key, self.KEY)
+            self.client.rename(tmp_exams, self.EXAMS_KEY)
+        else:
+            self.client.delete(self.KEY, self.EXAMS_KEY)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        backend = getattr(settings, 'QUIZ_GLOBAL_RANKING_BACKEND', 'database')
+        _store = RedisRankingStore() if backend == 'redis' else DatabaseRankingStore()
+    return _store
+
+
+# ---------------------------------
+# UPDATES
+# ---------------------------------
+def record_result(result, previous=None):
+    """
+    Applies a saved result to the user's total. `previous` is the result as
+    it was before this submission, None for a new result.
+    """
+    if not result.user_id:
+        return
+    score_delta = result.score - (previous.score if previous else 0)
+    exams_delta = 1 if previous is None else 0
+    if not score_delta and not exams_delta:
+        return
+
+    store = get_store()
+    if isinstance(store, RedisRankingStore):
+        def apply():
+            try:
+                store.add(result.user_id, score_delta, exams_delta)
+            except RedisError as e:
+                print(f"Global ranking update failed for user {result.user_id}: {e}")
+        transaction.on_commit(apply)
+    else:
+        store.add(result.user_id, score_delta, exams_delta)
+
+
+def apply_score_deltas(deltas):
+    """
+    Adds {user_id: score delta} to the users' totals without counting new
+    exams, e.g. for results rescored by a regrade.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    store = get_store()
+    if isinstance(store, RedisRankingStore):
+        def apply():
+            try:
+                store.add_scores(deltas)
+            except RedisError as e:
+                print(f"Global ranking update failed for {len(deltas)} users: {e}")
+        transaction.on_commit(apply)
+    else:
+        store.add_scores(deltas)
+
+
+def rebuild_global_ranking():
+    """Recomputes every user's total from UserExamResult. Returns the number of users."""
+    totals = UserExamResult.objects.filter(user__isnull=False).values('user_id').annotate(
+        total=Sum('score'), taken=Count('id')
+    ).order_by()
+    rows = [(row['user_id'], row['total'], row['taken']) for row in totals.iterator()]
+    get_store().replace(rows)
+    return len(rows)
+
+
+# ---------------------------------
+# READS
+# ---------------------------------
+def global_page(offset=0, limit=PAGE_SIZE):
+    return get_store().page(offset, limit)
+
+
+def global_around(user_id, radius=5):
+    """The user's row with up to `radius` neighbours on each side."""
+    store = get_store()
+    position = store.position(user_id)
+    if position is None:
+        return []
+    offset = max(position - radius, 0)
+    return store.page(offset, position - offset + radius + 1)
+
+
+def global_rank_of(user_id):
+    return get_store().rank_of(user_id)
@@ -0,0 +1,260 @@
+"""
+Set-based regrading after an answer key correction.
+
+UserAnswer.is_correct is fixed when the answer is clicked, so correcting an
+Answer.is_correct in the admin leaves past answers and results wrong.
+regrade_question() repairs them:
+
+1. One UPDATE over the question's answers flips is_correct on the rows
+   whose selection disagrees with the current key (only those rows are
+   written).
+2. Results of affected row-stored attempts are recomputed with correlated
+   COUNT / SUM(points) aggregates, RESULT_BATCH results per UPDATE, limited
+   to results whose numbers actually change.
+3. Compacted attempts get their correctness bit and result fixed in Python,
+   in batches.
+4. Derived read models are updated from the changes collected on the way:
+   leaderboard entries of the affected users only, histogram bucket moves,
+   global ranking score deltas, the affected users' stats and topic
+   mastery, with grouped statements rather than rebuilds.
+
+Regrades of one question are serialized on a lock of its row (on SQLite,
+which has no row locks, on the database write lock), so concurrent runs
+never apply the same deltas twice. Signals run it in a background thread,
+once per question and transaction, when an answer's is_correct changes
+(services.regrade_questions_async). `python manage.py regrade --dry-run`
+runs the same statements in a transaction that is rolled back and reports
+the diff.
+"""
+from collections import Counter, defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, NullIf, Round
+
+from . import histograms, leaderboard, rankings, user_stats
+from .answer_key import build_answer_key
+from .models import Answer, ExamAttempt, Question, TopicMastery, UserAnswer, UserExamResult
+from .packing import pack_answers, unpack_answers
+
+PACKED_BATCH = 500
+RESULT_BATCH = 5000
+SAMPLE_SIZE = 20
+
+
+def _batches(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _attempt_aggregate(aggregate):
+    """Correlated per-attempt aggregate over the attempt's correct answers."""
+    return Coalesce(
+        Subquery(
+            UserAnswer.objects.filter(attempt_id=OuterRef('attempt_id'), is_correct=True)
+            .values('attempt_id').annotate(value=aggregate).values('value')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+class _ResultChanges:
+    """Results rescored by one regrade, folded into the derived read models at the end."""
+
+    def __init__(self):
+        self.count = 0
+        self.sample = []
+        self.buckets = Counter()
+        self.scores = Counter()
+        self.percentages = defaultdict(list)
+
+    def add(self, result_id, user_id, old_score, new_score, old_percentage, new_percentage):
+        self.count += 1
+        if len(self.sample) < SAMPLE_SIZE:
+            self.sample.append({'result_id': result_id, 'score_before': old_score, 'score_after': new_score})
+        self.buckets[histograms.bucket_of(old_percentage)] -= 1
+        self.buckets[histograms.bucket_of(new_percentage)] += 1
+        if user_id:
+            self.scores[user_id] += new_score - old_score
+            self.percentages[user_id].append((result_id, old_percentage, new_percentage))
+
+
+def _lock_question(question_id):
+    questions = Question.objects.filter(pk=question_id)
+    if connection.vendor == 'sqlite':
+        # No row locks: take the database write lock before reading anything
+        questions.update(exam_id=F('exam_id'))
+    return questions.select_for_update().only('id', 'exam_id', 'subject', 'topic').get()
+
+
+def regrade_question(question_id, dry_run=False):
+    """
+    Regrades every answer to a question against its current correct options.
+    Returns a diff: answer flips, result changes (with a sample) and the
+    number of compacted attempts fixed.
+    """
+    with transaction.atomic():
+        question = _lock_question(question_id)
+        correct_ids = list(Answer.objects.filter(question_id=question_id, is_correct=True).values_list('id', flat=True))
+
+        answers = UserAnswer.objects.filter(question_id=question_id)
+        if correct_ids:
+            should_be_correct = Q(selected_answer_id__in=correct_ids)
+            to_correct = answers.filter(should_be_correct, is_correct=False)
+            to_incorrect = answers.filter(is_correct=True).exclude(should_be_correct)
+        else:
+            to_correct = answers.none()
+            to_incorrect = answers.filter(is_correct=True)
+        changed = to_correct | to_incorrect
+
+        diff = {
+            'question_id': question_id,
+            'to_correct': to_correct.count(),
+            'to_incorrect': to_incorrect.count(),
+            'results_changed': 0,
+            'packed_attempts_changed': 0,
+            'sample': [],
+        }
+
+        # Topic mastery deltas per user, taken before the flip
+        mastery_deltas = dict(
+            changed.filter(attempt__state='submitted', attempt__user__isnull=False)
+            .values('attempt__user_id')
+            .annotate(delta=Sum(Case(When(is_correct=False, then=Value(1)), default=Value(-1))))
+            .values_list('attempt__user_id', 'delta')
+        )
+
+        if diff['to_correct'] or diff['to_incorrect']:
+            if correct_ids:
+                changed.update(is_correct=Case(When(should_be_correct, then=Value(True)), default=Value(False)))
+            else:
+                to_incorrect.update(is_correct=False)
+
+        changes = _ResultChanges()
+        _regrade_results(question_id, changes)
+        diff['results_changed'] = changes.count
+
+        packed_changed, packed_users, packed_mastery = _regrade_packed(question, changes)
+        diff['packed_attempts_changed'] = packed_changed
+        diff['sample'] = changes.sample
+        for user_id, delta in packed_mastery.items():
+            mastery_deltas[user_id] = mastery_deltas.get(user_id, 0) + delta
+
+        if dry_run:
+            # Same statements as a real run, rolled back: the diff is exact
+            transaction.set_rollback(True)
+        elif changes.count or mastery_deltas:
+            user_ids = set(mastery_deltas) | packed_users | set(changes.percentages)
+            _refresh_derived(question, changes, user_ids, mastery_deltas)
+
+    return diff
+
+
+def _regrade_results(question_id, changes):
+    """Rescores results of row-stored attempts that answered the question, RESULT_BATCH at a time."""
+    new_correct = _attempt_aggregate(Count('id'))
+    new_score = _attempt_aggregate(Sum('question__points'))
+    # Read once: a subquery would be evaluated again for every batch
+    attempt_ids = sorted(UserAnswer.objects.filter(question_id=question_id, attempt__isnull=False).values_list('attempt_id', flat=True))
+    for start in range(0, len(attempt_ids), RESULT_BATCH):
+        batch = list(
+            UserExamResult.objects.filter(attempt_id__in=attempt_ids[start:start + RESULT_BATCH])
+            .annotate(new_correct=new_correct, new_score=new_score)
+            .exclude(correct_answers=F('new_correct'), score=F('new_score'))
+            .values_list('id', 'user_id', 'score', 'percentage')
+        )
+        if not batch:
+            continue
+        rows = UserExamResult.objects.filter(id__in=[row[0] for row in batch])
+        rows.update(correct_answers=new_correct, score=new_score)
+        rows.update(
+            percentage=Coalesce(
+                Round(F('correct_answers') * 100.0 / NullIf(F('total_questions'), 0), 2),
+                Value(0.0),
+                output_field=FloatField(),
+            ),
+        )
+        rescored = {result_id: (score, percentage) for result_id, score, percentage in rows.values_list('id', 'score', 'percentage')}
+        for result_id, user_id, score, percentage in batch:
+            changes.add(result_id, user_id, score, rescored[result_id][0], percentage, rescored[result_id][1])
+
+
+def _regrade_packed(question, changes):
+    """
+    Fixes the correctness bit and result of compacted attempts, recording
+    result changes in `changes`. Returns (changed, users, mastery deltas).
+    """
+    key = build_answer_key(question.exam_id, published_only=False)
+    if key is None or question.id not in key:
+        return 0, set(), {}
+    correct_ids = key.entries[question.id][0]
+
+    changed = 0
+    users, mastery_deltas = set(), {}
+    attempts = ExamAttempt.objects.filter(exam_id=question.exam_id, packed_answers__isnull=False).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(attempts.filter(id__gt=last_id).only('id', 'user_id', 'state', 'packed_answers')[:PACKED_BATCH])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        fixed = []
+        for attempt in batch:
+            rows = unpack_answers(attempt.packed_answers)
+            flipped = 0
+            for i, (question_id, answer_id, is_correct) in enumerate(rows):
+                now_correct = answer_id in correct_ids
+                if question_id == question.id and now_correct != is_correct:
+                    rows[i] = (question_id, answer_id, now_correct)
+                    flipped = 1 if now_correct else -1
+            if not flipped:
+                continue
+            changed += 1
+            if attempt.user_id and attempt.state == 'submitted':
+                users.add(attempt.user_id)
+                mastery_deltas[attempt.user_id] = mastery_deltas.get(attempt.user_id, 0) + flipped
+            attempt.packed_answers = pack_answers(rows)
+            attempt.regraded = key.score((qid, aid) for qid, aid, _ in rows if aid is not None)
+            fixed.append(attempt)
+
+        if not fixed:
+            continue
+        ExamAttempt.objects.bulk_update(fixed, ['packed_answers'])
+        results = UserExamResult.objects.in_bulk([a.id for a in fixed], field_name='attempt_id')
+        updated = []
+        for attempt in fixed:
+            result = results.get(attempt.id)
+            if result is None:
+                continue
+            old_score, old_percentage = result.score, result.percentage
+            result.correct_answers, result.score = attempt.regraded
+            total = result.total_questions
+            result.percentage = round((result.correct_answers / total * 100) if total > 0 else 0, 2)
+            changes.add(result.id, result.user_id, old_score, result.score, old_percentage, result.percentage)
+            updated.append(result)
+        UserExamResult.objects.bulk_update(updated, ['correct_answers', 'score', 'percentage'])
+
+    return changed, users, mastery_deltas
+
+
+def _refresh_derived(question, changes, user_ids, mastery_deltas):
+    """Applies a regrade to the read models, touching only the affected users."""
+    for chunk in _batches(sorted(user_ids), leaderboard.REBUILD_BATCH):
+        leaderboard.rebuild_exam_leaderboard(question.exam_id, chunk)
+    histograms.apply_bucket_deltas(question.exam_id, changes.buckets)
+    rankings.apply_score_deltas(changes.scores)
+    user_stats.apply_regrades(question.exam_id, changes.percentages)
+
+    subject, topic = question.subject or '', question.topic or ''
+    by_delta = defaultdict(list)
+    for user_id, delta in mastery_deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, users in by_delta.items():
+        for chunk in _batches(users, RESULT_BATCH):
+            TopicMastery.objects.filter(user_id__in=chunk, subject=subject, topic=topic).update(
+                correct=F('correct') + delta
+            )
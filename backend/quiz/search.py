@@ -0,0 +1,302 @@
+"""
+Full-text search over the question bank.
+
+Each question has a QuestionSearchDocument holding its text, its options and
+its subject / topic labels as normalized tokens, plus the filter columns. The
+database indexes the documents (created by migration 0024):
+
+    SQLite      quiz_question_fts, an external-content FTS5 table kept in
+                step with the documents by triggers; ranked with bm25()
+    PostgreSQL  search_vector, a generated tsvector column with a GIN index;
+                ranked with ts_rank()
+
+Filters are index terms too: facet_terms holds one token per exam, subject,
+topic and difficulty (see facet()), so "?topic=Algebra" is an intersection
+of posting lists inside the full-text index rather than a row-by-row check
+on the document table, which is what keeps filtered queries fast at a
+million questions. The columns are still compared exactly afterwards.
+
+Ranking every match of a common word costs time linear in the number of
+matches, so only the newest RANKED_WINDOW matches (by document id) are
+scored. Rare-word queries - most of them - are ranked in full; for words
+that appear in tens of thousands of questions the best of the most recent
+matches come back instead.
+
+Tokenizing happens here rather than in the database so that both backends
+see the same terms. Neither built-in tokenizer handles Devanagari well:
+FTS5's unicode61 and PostgreSQL's default parser both break words at vowel
+signs (matras) and viramas, so "परीक्षा" would become several fragments.
+Documents therefore store space-joined tokens, FTS5 splits them with its
+'ascii' tokenizer (non-ASCII bytes are word characters) and PostgreSQL builds
+the vector with array_to_tsvector(), bypassing the parser. Normalizing:
+
+    - NFKD, drop the nukta, chandrabindu -> anusvara, NFKC (so ज़/ज,
+      हँ/हं and x²/x2 match)
+    - casefold, Devanagari digits -> ASCII digits
+    - tokens are runs of letters, digits and Devanagari signs; the danda
+      ends a token
+    - a short list of English and Hindi stopwords is dropped
+
+Query terms are ANDed and the last one is a prefix match, so results update
+as the user types. Other database backends fall back to an unranked
+substring match on the question terms.
+
+`benchmark_search --check` compares the matches of either backend with a
+scan of the documents; the PostgreSQL path is only exercised by running it
+against a PostgreSQL database.
+"""
+import hashlib
+import re
+import unicodedata
+
+from django.db import connection, transaction
+
+from .models import Answer, Exam, Question, QuestionSearchDocument
+
+FTS_TABLE = 'quiz_question_fts'
+MAX_QUERY_TERMS = 8
+RANKED_WINDOW = 1000
+
+# bm25 column weights: question text > options > subject / topic; facets
+# only filter
+SQLITE_WEIGHTS = (10.0, 4.0, 2.0, 0.0)
+CONTENT_COLUMNS = ('question_terms', 'option_terms', 'label_terms')
+
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'which',
+    'with',
+    'का', 'के', 'की', 'को', 'में', 'से', 'है', 'हैं', 'था', 'थे', 'थी', 'और',
+    'पर', 'यह', 'वह', 'एक', 'भी', 'या', 'तो', 'ही', 'लिए', 'ने',
+))
+
+_TOKEN = re.compile('(?:[^\\W_]|[\u0900-\u0963\u0966-\u097f])+')
+_DEVANAGARI_DIGITS = str.maketrans('०१२३४५६७८९', '0123456789')
+_NUKTA = '\u093c'
+_CHANDRABINDU, _ANUSVARA = '\u0901', '\u0902'
+
+
+# ---------------------------------
+# TOKENIZING
+# ---------------------------------
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = text.replace(_NUKTA, '').replace(_CHANDRABINDU, _ANUSVARA)
+    return unicodedata.normalize('NFKC', text).casefold().translate(_DEVANAGARI_DIGITS)
+
+
+def tokenize(text):
+    """Normalized tokens of `text`, in order, stopwords removed."""
+    return [token for token in _TOKEN.findall(normalize(text)) if token not in STOPWORDS]
+
+
+def terms(*texts):
+    """Space-joined distinct tokens of the texts, first occurrence first."""
+    seen = {}
+    for text in texts:
+        for token in tokenize(text):
+            seen.setdefault(token)
+    return ' '.join(seen)
+
+
+def facet(kind, value):
+    """Index token standing for `kind` = `value`, e.g. facet('topic', 'Algebra')."""
+    digest = hashlib.blake2b(normalize(str(value)).encode(), digest_size=6).hexdigest()
+    return f'{kind}{digest}'
+
+
+# ---------------------------------
+# DOCUMENTS
+# ---------------------------------
+def document_fields(question, option_texts):
+    labels = {
+        'exam': question.exam_id,
+        'subject': question.subject or '',
+        'topic': question.topic or '',
+        'difficulty': question.difficulty or '',
+    }
+    return {
+        'exam_id': question.exam_id,
+        'subject': labels['subject'],
+        'topic': labels['topic'],
+        'difficulty': labels['difficulty'],
+        'question_terms': terms(question.question_text),
+        'option_terms': terms(*option_texts),
+        'label_terms': terms(question.subject, question.topic),
+        'facet_terms': ' '.join(facet(kind, value) for kind, value in labels.items() if value),
+    }
+
+
+def index_question(question_id):
+    """Creates, refreshes or (if the question is gone) deletes one search document."""
+    question = Question.objects.filter(pk=question_id).only(
+        'exam_id', 'question_text', 'subject', 'topic', 'difficulty'
+    ).first()
+    if question is None:
+        QuestionSearchDocument.objects.filter(question_id=question_id).delete()
+        return
+    option_texts = question.answers.values_list('answer_text', flat=True)
+    QuestionSearchDocument.objects.update_or_create(
+        question_id=question_id, defaults=document_fields(question, option_texts)
+    )
+
+
+def _documents(questions):
+    """Unsaved search documents for a batch of questions, two queries."""
+    options = {}
+    for question_id, text in Answer.objects.filter(
+        question_id__in=[q.id for q in questions]
+    ).order_by('order', 'id').values_list('question_id', 'answer_text'):
+        options.setdefault(question_id, []).append(text)
+    return [
+        QuestionSearchDocument(question_id=q.id, **document_fields(q, options.get(q.id, ())))
+        for q in questions
+    ]
+
+
+def _indexed_questions():
+    return Question.objects.only('exam_id', 'question_text', 'subject', 'topic', 'difficulty').order_by('id')
+
+
+def index_questions(question_ids, batch_size=2000):
+    """
+    index_question() for many questions at once, e.g. after a bulk_update
+    that sent no post_save. Documents of deleted questions are dropped.
+    """
+    question_ids = sorted(set(question_ids))
+    for start in range(0, len(question_ids), batch_size):
+        chunk = question_ids[start:start + batch_size]
+        with transaction.atomic():
+            QuestionSearchDocument.objects.filter(question_id__in=chunk).delete()
+            QuestionSearchDocument.objects.bulk_create(_documents(list(_indexed_questions().filter(id__in=chunk))))
+
+
+def rebuild_search_index(batch_size=2000):
+    """Rewrites every search document from the questions. Returns the count."""
+    count = 0
+    with transaction.atomic():
+        QuestionSearchDocument.objects.all().delete()
+        questions = _indexed_questions()
+        last_id = 0
+        while True:
+            batch = list(questions.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            QuestionSearchDocument.objects.bulk_create(_documents(batch))
+            count += len(batch)
+            last_id = batch[-1].id
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+# ---------------------------------
+# QUERIES
+# ---------------------------------
+def _fts5_query(tokens, facets):
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    query = '{%s} : (%s)' % (' '.join(CONTENT_COLUMNS), ' '.join(quoted))
+    if facets:
+        query += ' AND facet_terms : (%s)' % ' '.join(f'"{token}"' for token in facets)
+    return query
+
+
+def _tsquery(tokens, facets):
+    # Content terms carry weights A-C, facets D (see migration 0024)
+    lexemes = [f"'{token}':ABC" for token in tokens]
+    lexemes[-1] = f"'{tokens[-1]}':*ABC"
+    lexemes += [f"'{token}':D" for token in facets]
+    return ' & '.join(lexemes)
+
+
+def _filters(exam, subject, topic, difficulty, category, subcategory, published_only):
+    """Facet tokens, plus SQL conditions on the document table `d` and their parameters."""
+    facets, where, params = [], [], []
+    for kind, column, value in (
+        ('exam', 'exam_id', exam),
+        ('subject', 'subject', subject),
+        ('topic', 'topic', topic),
+        ('difficulty', 'difficulty', difficulty),
+    ):
+        if value:
+            facets.append(facet(kind, value))
+            where.append(f'd.{column} = %s')
+            params.append(value)
+
+    exams = Exam.objects.all()
+    if category:
+        exams = exams.filter(subcategory__category__slug=category)
+    if subcategory:
+        exams = exams.filter(subcategory__slug=subcategory)
+    if published_only:
+        exams = exams.filter(is_active=True, status='published', blueprint__isnull=True)
+    if exams.query.where:
+        sql, exam_params = exams.order_by().values('id').query.sql_with_params()
+        where.append(f'd.exam_id IN ({sql})')
+        params.extend(exam_params)
+    return facets, where, params
+
+
+def search_questions(query, exam=None, subject=None, topic=None, difficulty=None,
+                     category=None, subcategory=None, limit=20, offset=0, published_only=True):
+    """
+    Best matches for `query` as a list of (question id, rank), best first;
+    higher rank is better. Empty when the query has no searchable terms.
+    """
+    tokens = tokenize(query)[:MAX_QUERY_TERMS]
+    if not tokens:
+        return []
+    facets, where, params = _filters(exam, subject, topic, difficulty, category, subcategory, published_only)
+    conditions = ''.join(f' AND {condition}' for condition in where)
+
+    if connection.vendor == 'sqlite':
+        # CROSS JOIN keeps the full-text index as the driving table; the
+        # planner would otherwise probe it once per row of a filter index.
+        matches = (
+            f'FROM {FTS_TABLE} CROSS JOIN quiz_questionsearchdocument d ON d.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s{conditions}'
+        )
+        weights = ', '.join(str(w) for w in SQLITE_WEIGHTS)
+        sql = (
+            f'SELECT d.question_id, -bm25({FTS_TABLE}, {weights}) AS score {matches} '
+            f'AND {FTS_TABLE}.rowid >= COALESCE(('
+            f'SELECT {FTS_TABLE}.rowid {matches} ORDER BY {FTS_TABLE}.rowid DESC LIMIT 1 OFFSET %s'
+            f'), 0) '
+            f'ORDER BY score DESC, d.question_id LIMIT %s OFFSET %s'
+        )
+        match = _fts5_query(tokens, facets)
+        params = [match, *params, match, *params, RANKED_WINDOW - 1, limit, offset]
+    elif connection.vendor == 'postgresql':
+        sql = (
+            'WITH q AS (SELECT CAST(%s AS tsquery) AS query), '
+            'candidates AS ('
+            f'SELECT d.id FROM quiz_questionsearchdocument d, q WHERE d.search_vector @@ q.query{conditions} '
+            'ORDER BY d.id DESC LIMIT %s'
+            ') '
+            'SELECT d.question_id, ts_rank(d.search_vector, q.query) AS score '
+            'FROM candidates JOIN quiz_questionsearchdocument d ON d.id = candidates.id, q '
+            'ORDER BY score DESC, d.question_id LIMIT %s OFFSET %s'
+        )
+        params = [_tsquery(tokens, facets), *params, RANKED_WINDOW, limit, offset]
+    else:
+        return _search_fallback(tokens, where, params, limit, offset)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(question_id, float(score)) for question_id, score in cursor.fetchall()]
+
+
+def _search_fallback(tokens, where, params, limit, offset):
+    """Unranked substring match for databases without a full-text index."""
+    sql = 'SELECT d.question_id FROM quiz_questionsearchdocument d WHERE 1 = 1'
+    for token in tokens:
+        where = where + ['d.question_terms LIKE %s']
+        params = params + [f'%{token}%']
+    for condition in where:
+        sql += f' AND {condition}'
+    sql += ' ORDER BY d.question_id LIMIT %s OFFSET %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit, offset])
+        return [(question_id, 0.0) for (question_id,) in cursor.fetchall()]
@@ -3,12 +3,73 @@ from rest_framework import serializers
 from .models import Exam, Question, Answer, UserAnswer, Category, SubCategory, ContactMessage
 
 
+# --------------------------------------------------
+# SPARSE FIELDSETS (?fields= / ?omit=)
+# --------------------------------------------------
+def _field_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+class SparseFieldsMixin:
+    """
+    Keeps only the fields named in ?fields=a,b and drops those in ?omit=c
+    (unknown names are ignored). Applies when the serializer context holds
+    the request. `field_sources` lists the model columns that method fields
+    read, so sparse_queryset() can defer everything else.
+    """
+    field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        selected = _field_names(request.query_params.get('fields'))
+        omitted = _field_names(request.query_params.get('omit'))
+        for name in list(self.fields):
+            if (selected and name not in selected) or name in omitted:
+                self.fields.pop(name)
+
+    def source_paths(self):
+        """Dotted model paths read by the remaining fields, e.g. 'subcategory.name'."""
+        paths = set()
+        for name, field in self.fields.items():
+            if name in self.field_sources:
+                paths.update(self.field_sources[name])
+            elif field.source != '*':
+                paths.add(field.source)
+        return paths
+
+
+def sparse_queryset(queryset, serializer, keep=()):
+    """
+    Narrows a queryset to what a SparseFieldsMixin serializer will read:
+    unread columns are deferred and only the relations it follows are
+    joined. `keep` names columns needed elsewhere (e.g. the pagination key).
+    """
+    paths = serializer.source_paths()
+    columns = {path.split('.')[0] for path in paths} | set(keep)
+    relations = {'__'.join(path.split('.')[:-1]) for path in paths if '.' in path}
+
+    # Foreign keys stay: they are small, and related managers read them
+    model = queryset.model
+    deferred = [
+        field.name for field in model._meta.concrete_fields
+        if not field.primary_key and not field.is_relation and field.name not in columns
+    ]
+    queryset = queryset.select_related(None)
+    if relations:
+        queryset = queryset.select_related(*sorted(relations))
+    return queryset.defer(*deferred) if deferred else queryset
+
+
 # --------------------------------------------------
 # CATEGORY & SUBCATEGORY SERIALIZERS
 # --------------------------------------------------
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     exam_count = serializers.SerializerMethodField()
     subcategory_count = serializers.SerializerMethodField()
+    field_sources = {'exam_count': (), 'subcategory_count': ()}
     
     class Meta:
         model = Category
@@ -22,10 +83,11 @@ class CategorySerializer(serializers.ModelSerializer):
         return obj.subcategories.filter(is_active=True).count()
 
 
-class SubCategorySerializer(serializers.ModelSerializer):
+class SubCategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     category_slug = serializers.CharField(source='category.slug', read_only=True)
     exam_count = serializers.SerializerMethodField()
+    field_sources = {'exam_count': ()}
     
     class Meta:
         model = SubCategory
@@ -56,9 +118,10 @@ class AnswerSerializerWithCorrect(serializers.ModelSerializer):
 # --------------------------------------------------
 # QUESTION SERIALIZER (WITH IMAGE SUPPORT)
 # --------------------------------------------------
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     answers = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    field_sources = {'answers': (), 'image': ('image',)}
 
     class Meta:
         model = Question
@@ -91,10 +154,19 @@ class QuestionSerializer(serializers.ModelSerializer):
         return None
 
 
+class QuestionBankSerializer(QuestionSerializer):
+    """A question with the exam it came from, for the cross-exam question bank."""
+    exam_title = serializers.CharField(source='exam.title', read_only=True)
+    exam_year = serializers.IntegerField(source='exam.year', read_only=True)
+
+    class Meta(QuestionSerializer.Meta):
+        fields = ['id', 'exam', 'exam_title', 'exam_year'] + QuestionSerializer.Meta.fields[1:] + ['created_at']
+
+
 # --------------------------------------------------
 # EXAM SERIALIZER
 # --------------------------------------------------
-class ExamSerializer(serializers.ModelSerializer):
+class ExamSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     question_count = serializers.IntegerField(read_only=True)
     subcategory_name = serializers.CharField(source='subcategory.name', read_only=True)
     category_name = serializers.CharField(source='subcategory.category.name', read_only=True)
@@ -158,7 +230,8 @@ class UserAnswerSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'answered_at']
 
     def get_correct_answer_text(self, obj):
-        correct_ans = obj.question.answers.filter(is_correct=True).first()
+        # Iterate .all() so prefetched answers are used instead of one query per row
+        correct_ans = next((a for a in obj.question.answers.all() if a.is_correct), None)
         return correct_ans.answer_text if correct_ans else "Unknown"
 
 # --------------------------------------------------
@@ -1,5 +1,5 @@
 import traceback
-from .models import Exam
+from .models import Exam, Question
 from .ai import generate_questions_from_pdf
 
 def extract_questions_async(exam_id):
@@ -30,3 +30,47 @@ def extract_questions_async(exam_id):
     except Exception as e:
         print(f"CRITICAL ERROR in background AI thread for Exam ID {exam_id}: {str(e)}")
         traceback.print_exc()
+
+
+def regrade_questions_async(question_ids):
+    """
+    Regrades past answers to questions whose correct answer changed, one
+    question after the other. Designed to be run in a background thread
+    (see signals.py); regrade_question() locks the question, so runs that
+    overlap with another thread wait instead of applying deltas twice.
+    """
+    from django.db import connection
+
+    try:
+        # Questions deleted since (a cascade also deletes their correct options) have nothing to regrade
+        question_ids = list(Question.objects.filter(id__in=question_ids).order_by('id').values_list('id', flat=True))
+        for question_id in question_ids:
+            regrade_question_async(question_id, close_connection=False)
+    finally:
+        connection.close()
+
+
+def regrade_question_async(question_id, close_connection=True):
+    """
+    Regrades past answers to a question after its correct answer changed.
+    Designed to be run in a background thread (see signals.py).
+    """
+    from django.db import connection
+    from .regrade import regrade_question
+
+    print(f"Starting regrade background thread for Question ID: {question_id}")
+    try:
+        diff = regrade_question(question_id)
+        print(
+            f"Regrade COMPLETED for Question ID {question_id}: "
+            f"{diff['to_correct']} answers now correct, {diff['to_incorrect']} now incorrect, "
+            f"{diff['results_changed'] + diff['packed_attempts_changed']} results updated"
+        )
+    except Question.DoesNotExist:
+        print(f"Question ID {question_id} was deleted before it could be regraded.")
+    except Exception as e:
+        print(f"CRITICAL ERROR in regrade thread for Question ID {question_id}: {str(e)}")
+        traceback.print_exc()
+    finally:
+        if close_connection:
+            connection.close()
@@ -0,0 +1,70 @@
+"""
+Per-session order of an exam's questions and options.
+
+Every student used to see the same paper in the same order. Instead of
+storing a permutation per attempt, the order is recomputed on each request
+from a seed hashed from (session id, exam id): the same session always gets
+the same paper, different sessions get different ones, and nothing is
+written. Grading is unaffected because answers are submitted and graded by
+answer id (answer_key.py), never by position.
+
+The shuffle runs over the cached, serialized payload (one copy shared by
+all sessions, see ExamViewSet.questions) and copies what it reorders, so it
+is O(questions + options) per request and never touches the cache. The
+`order` fields of the copy are renumbered to the shuffled positions, so
+clients that letter options by `order` stay right.
+
+Options that refer to other options by position ("Both A and B", "All of
+the above", "उपर्युक्त सभी") would be wrong in another order; questions
+with such an option keep their options in place. pinned_questions() finds
+them once, when the payload is built.
+"""
+import hashlib
+import random
+import re
+
+_POSITIONAL = re.compile(
+    r'\b(?:above|below|both|neither|all of these|none of these)\b'
+    r'|\(?\b[a-e]\)?\s*(?:and|&|or|,)\s*\(?\b[a-e]\b\)?'
+    r'|उपर्युक्त|उपरोक्त|दोनों|इनमें से',
+    re.IGNORECASE,
+)
+
+
+def seed_for(session_key, exam_id):
+    digest = hashlib.blake2b(f'{session_key}:{exam_id}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def pinned_questions(questions):
+    """Ids of serialized questions whose options must keep their order."""
+    return [
+        question.get('id') for question in questions
+        if any(_POSITIONAL.search(answer.get('answer_text') or '') for answer in question.get('answers') or ())
+    ]
+
+
+def _renumbered(items):
+    return [dict(item, order=position) if 'order' in item else item for position, item in enumerate(items)]
+
+
+def shuffle_questions(questions, seed, pinned=()):
+    """
+    A copy of serialized questions (with their answers) in the order of
+    `seed`; the input is not modified.
+    """
+    rng = random.Random(seed)
+    questions = list(questions)
+    # Questions are drawn first, so their order does not depend on ?fields=
+    rng.shuffle(questions)
+    pinned = set(pinned)
+    shuffled = []
+    for question in _renumbered(questions):
+        answers = question.get('answers')
+        if answers:
+            answers = list(answers)
+            if question.get('id') not in pinned:
+                rng.shuffle(answers)
+            question = dict(question, answers=_renumbered(answers))
+        shuffled.append(question)
+    return shuffled
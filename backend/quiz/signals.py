@@ -0,0 +1,215 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache as quiz_cache
+from .models import Category, SubCategory, Exam, Question, Answer
+from .answer_key import invalidate_answer_key
+
+
+def _invalidate_after_commit(exam_id):
+    if exam_id:
+        transaction.on_commit(lambda: invalidate_answer_key(exam_id))
+
+
+_pending = threading.local()
+
+
+def _once_after_commit(name, key, run):
+    """
+    Collects `key` in a per-thread set and calls run(keys) after the
+    transaction commits, so many saves in one transaction (an admin inline
+    formset, a cascade) do the work once per key. Every call registers the
+    flush; the first one to run takes the whole set. Keys left by a rolled
+    back transaction only ride along with the next flush.
+    """
+    pending = getattr(_pending, name, None)
+    if pending is None:
+        pending = set()
+        setattr(_pending, name, pending)
+    pending.add(key)
+
+    def flush():
+        keys = set(pending)
+        pending.clear()
+        if keys:
+            run(keys)
+
+    transaction.on_commit(flush)
+
+
+# ---------------------------------
+# ANSWER KEY INVALIDATION
+# ---------------------------------
+@receiver([post_save, post_delete], sender=Exam)
+def exam_changed(sender, instance, **kwargs):
+    _invalidate_after_commit(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    _invalidate_after_commit(instance.exam_id)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    # The parent question may already be gone when answers are removed by a
+    # cascade; its own post_delete takes care of the exam in that case.
+    exam_id = Question.objects.filter(pk=instance.question_id).values_list('exam_id', flat=True).first()
+    _invalidate_after_commit(exam_id)
+
+
+# ---------------------------------
+# REGRADING
+# ---------------------------------
+def _regrade_after_commit(question_id):
+    if not getattr(settings, 'QUIZ_AUTO_REGRADE', True):
+        return
+    from .services import regrade_questions_async
+
+    _once_after_commit('regrade', question_id, lambda question_ids: threading.Thread(
+        target=regrade_questions_async,
+        args=(sorted(question_ids),),
+        daemon=True
+    ).start())
+
+
+@receiver(pre_save, sender=Answer)
+def answer_key_before_save(sender, instance, **kwargs):
+    instance._was_correct = (
+        Answer.objects.filter(pk=instance.pk).values_list('is_correct', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Answer)
+def answer_key_saved(sender, instance, created, **kwargs):
+    # Nobody can have picked a newly created option, so only flips matter
+    was_correct = getattr(instance, '_was_correct', None)
+    if not created and was_correct is not None and was_correct != instance.is_correct:
+        _regrade_after_commit(instance.question_id)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_key_deleted(sender, instance, **kwargs):
+    # Deleting a correct option makes answers that picked it wrong. Skip
+    # cascades from a deleted question, which has nothing left to regrade.
+    if instance.is_correct and Question.objects.filter(pk=instance.question_id).exists():
+        _regrade_after_commit(instance.question_id)
+
+
+# ---------------------------------
+# RESPONSE CACHE TAGS
+# ---------------------------------
+def _invalidate_tags_after_commit(*tags):
+    tags = [name for name in tags if not name.endswith(':None')]
+    transaction.on_commit(lambda: quiz_cache.invalidate(*tags))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_cache_changed(sender, instance, **kwargs):
+    _invalidate_tags_after_commit(quiz_cache.CATALOG, quiz_cache.tag('category', instance.pk))
+
+
+@receiver([post_save, post_delete], sender=SubCategory)
+def subcategory_cache_changed(sender, instance, **kwargs):
+    _invalidate_tags_after_commit(
+        quiz_cache.CATALOG,
+        quiz_cache.tag('subcategory', instance.pk),
+        quiz_cache.tag('category', instance.category_id),
+    )
+
+
+@receiver([post_save, post_delete], sender=Exam)
+def exam_cache_changed(sender, instance, **kwargs):
+    _invalidate_tags_after_commit(
+        quiz_cache.CATALOG,
+        quiz_cache.tag('exam', instance.pk),
+        quiz_cache.tag('subcategory', instance.subcategory_id),
+    )
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_cache_changed(sender, instance, **kwargs):
+    # Exam listings carry question counts, so questions touch the catalog too
+    _invalidate_tags_after_commit(
+        quiz_cache.CATALOG,
+        quiz_cache.tag('question', instance.pk),
+        quiz_cache.tag('exam', instance.exam_id),
+    )
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_cache_changed(sender, instance, **kwargs):
+    exam_id = Question.objects.filter(pk=instance.question_id).values_list('exam_id', flat=True).first()
+    _invalidate_tags_after_commit(quiz_cache.tag('question', instance.question_id), quiz_cache.tag('exam', exam_id))
+
+
+# ---------------------------------
+# PRACTICE BUCKETS
+# ---------------------------------
+# Fields that decide whether (and under which bucket) a question is drawn
+# by practice.py; saves that leave them alone keep the buckets.
+PRACTICE_QUESTION_FIELDS = ('exam_id', 'subject', 'topic', 'difficulty')
+PRACTICE_EXAM_FIELDS = ('is_active', 'status', 'blueprint')
+
+
+@receiver(pre_save, sender=Question)
+def question_practice_before_save(sender, instance, **kwargs):
+    instance._practice_labels = (
+        Question.objects.filter(pk=instance.pk).values_list(*PRACTICE_QUESTION_FIELDS).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Question)
+def question_practice_saved(sender, instance, created, **kwargs):
+    labels = tuple(getattr(instance, name) for name in PRACTICE_QUESTION_FIELDS)
+    if created or getattr(instance, '_practice_labels', None) != labels:
+        _invalidate_tags_after_commit(quiz_cache.PRACTICE)
+
+
+@receiver(pre_save, sender=Exam)
+def exam_practice_before_save(sender, instance, **kwargs):
+    instance._practice_state = (
+        Exam.objects.filter(pk=instance.pk).values_list(*PRACTICE_EXAM_FIELDS).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Exam)
+def exam_practice_saved(sender, instance, created, **kwargs):
+    # A new exam has no questions yet; they invalidate as they are added
+    state = tuple(getattr(instance, name) for name in PRACTICE_EXAM_FIELDS)
+    if not created and getattr(instance, '_practice_state', None) != state:
+        _invalidate_tags_after_commit(quiz_cache.PRACTICE)
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Exam)
+def practice_deleted(sender, instance, **kwargs):
+    _invalidate_tags_after_commit(quiz_cache.PRACTICE)
+
+
+# ---------------------------------
+# SEARCH DOCUMENTS
+# ---------------------------------
+def _index_after_commit(question_id):
+    # Saving a question with its options touches it once per row; index it once
+    from .search import index_questions
+
+    _once_after_commit('search', question_id, index_questions)
+
+
+@receiver(post_save, sender=Question)
+def question_search_changed(sender, instance, **kwargs):
+    # Deleting a question cascades to its search document
+    _index_after_commit(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_search_changed(sender, instance, **kwargs):
+    _index_after_commit(instance.question_id)
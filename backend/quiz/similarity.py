@@ -0,0 +1,477 @@
+"""
+Similar-question retrieval over a local TF-IDF index.
+
+Each question becomes a sparse vector of hashed features: the words of its
+text and of its options (tokenized like search.py, so Hindi works the
+same), plus adjacent word pairs of the text. Hashing (crc32 into FEATURES
+buckets) needs no vocabulary, so the index can be built offline and
+extended later. Weights are log(1 + tf) * idf, options counting
+OPTION_WEIGHT per occurrence, and every vector is L2-normalized, so cosine
+similarity is a dot product.
+
+The index is a directory of plain .npy files (settings.QUIZ_SIMILARITY_DIR)
+that workers open with mmap, so every process on a host shares one copy
+through the page cache:
+
+    manifest.json          segments in order, document count, build times
+    <segment>/question_ids row -> question id (ascending), exam_ids alongside
+    <segment>/indptr, indices, data
+                           the vectors as CSR rows (for "similar to X")
+    <segment>/terms, postings_ptr, postings_rows, postings_data
+                           the same weights by feature (inverted lists)
+    <base segment>/idf     inverse document frequency of each feature
+
+`build_similarity_index` writes one base segment from scratch.
+`build_similarity_index --incremental` writes a small segment with the
+questions added since, or edited since (their search document changed);
+idf stays frozen at the last full build, which is what lets old vectors
+stay valid. A newer segment's copy of a question hides the older ones, and
+past MAX_SEGMENTS the incremental build rebuilds everything instead.
+Files are never changed in place: segments are written next to the old
+ones and the manifest is swapped with os.replace, so a reader sees either
+the old index or the new one.
+
+A query runs in two steps per segment. Candidates are ranked by adding
+up the posting lists of the query's rarer features only: features found
+in more than MAX_QUERY_DF of the questions (and at least MIN_SKIPPED_DF)
+make up most of the postings but little of the score. The best RESCORED
+candidates are then scored exactly against their CSR rows, so the
+returned similarities are true cosines. On a synthetic million-question
+bank this finds the same top 10 as scoring every posting, five times
+faster (see benchmark_similarity).
+"""
+import json
+import os
+import shutil
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Answer, Question, QuestionSearchDocument
+from .search import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized
+    fcntl = None
+
+FEATURES = 2 ** 20
+OPTION_WEIGHT = 0.5
+MAX_QUERY_DF = 0.01
+MIN_SKIPPED_DF = 1000  # shorter posting lists are cheap enough to always read
+MIN_QUERY_FEATURES = 3  # rarest features kept even if all of them are common
+RESCORED = 300
+MAX_SEGMENTS = 8
+BATCH_SIZE = 2000
+MANIFEST = 'manifest.json'
+ARRAYS = (
+    'question_ids', 'exam_ids', 'indptr', 'indices', 'data',
+    'terms', 'postings_ptr', 'postings_rows', 'postings_data',
+)
+
+
+# ---------------------------------
+# VECTORS
+# ---------------------------------
+def _feature(token):
+    return zlib.crc32(token.encode()) & (FEATURES - 1)
+
+
+def features(question_text, option_texts=()):
+    """{feature: weighted count} of one question."""
+    counts = {}
+    tokens = tokenize(question_text)
+    for token in tokens:
+        feature = _feature(token)
+        counts[feature] = counts.get(feature, 0) + 1
+    for first, second in zip(tokens, tokens[1:]):
+        feature = _feature(f'{first} {second}')
+        counts[feature] = counts.get(feature, 0) + 1
+    for text in option_texts:
+        for token in tokenize(text):
+            feature = _feature(token)
+            counts[feature] = counts.get(feature, 0) + OPTION_WEIGHT
+    return counts
+
+
+def _idf(df, documents):
+    return (np.log((1 + documents) / (1 + df.astype(np.float64))) + 1).astype(np.float32)
+
+
+def _weigh(indptr, indices, counts, idf):
+    """log(1 + tf) * idf, L2-normalized per row."""
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    weights = np.log1p(counts) * idf[indices]
+    norms = np.sqrt(np.bincount(rows, weights * weights, minlength=len(indptr) - 1))
+    norms[norms == 0] = 1
+    return rows, (weights / norms[rows]).astype(np.float32)
+
+
+def _query_vector(counts, idf):
+    indices = np.fromiter(counts, dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    _, weights = _weigh(np.array([0, len(indices)]), indices, values, idf)
+    return indices, weights
+
+
+# ---------------------------------
+# WRITING
+# ---------------------------------
+def _collect(rows):
+    """
+    Raw CSR arrays (question ids, exam ids, indptr, features, counts) from
+    (question id, exam id, text, option texts) rows in ascending id order.
+    """
+    question_ids, exam_ids, lengths = array('q'), array('q'), array('q')
+    indices, counts = array('i'), array('f')
+    for question_id, exam_id, text, option_texts in rows:
+        vector = features(text, option_texts)
+        question_ids.append(question_id)
+        exam_ids.append(exam_id)
+        lengths.append(len(vector))
+        indices.extend(vector)
+        counts.extend(vector.values())
+    question_ids = np.frombuffer(question_ids, dtype=np.int64)
+    if np.any(np.diff(question_ids) <= 0):
+        raise ValueError('Rows must come in ascending question id order')
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(np.frombuffer(lengths, dtype=np.int64), out=indptr[1:])
+    return (
+        question_ids,
+        np.frombuffer(exam_ids, dtype=np.int64),
+        indptr,
+        np.frombuffer(indices, dtype=np.int32),
+        np.frombuffer(counts, dtype=np.float32),
+    )
+
+
+def _write_segment(path, question_ids, exam_ids, indptr, indices, counts, idf):
+    rows, data = _weigh(indptr, indices, counts, idf)
+    order = np.argsort(indices, kind='stable')
+    terms, starts = np.unique(indices[order], return_index=True)
+    arrays = {
+        'question_ids': question_ids,
+        'exam_ids': exam_ids,
+        'indptr': indptr,
+        'indices': indices,
+        'data': data,
+        'terms': terms.astype(np.int32),
+        'postings_ptr': np.append(starts, len(order)).astype(np.int64),
+        'postings_rows': rows[order].astype(np.int32),
+        'postings_data': data[order],
+    }
+    os.makedirs(path)
+    for name, values in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), values)
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory, manifest):
+    temporary = os.path.join(directory, f'{MANIFEST}.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temporary, os.path.join(directory, MANIFEST))
+    # Segments no longer listed; open readers keep their mapping until they reload
+    for name in os.listdir(directory):
+        if name not in manifest['segments'] and os.path.isdir(os.path.join(directory, name)):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+@contextmanager
+def _build_lock(directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def write_index(rows, directory):
+    """
+    Writes a fresh index of (question id, exam id, text, option texts) rows,
+    in ascending id order, into `directory`, replacing what is there.
+    Returns the manifest.
+    """
+    with _build_lock(directory):
+        question_ids, exam_ids, indptr, indices, counts = _collect(rows)
+        idf = _idf(np.bincount(indices, minlength=FEATURES), len(question_ids))
+        name = f'base-{time.time_ns()}'
+        _write_segment(os.path.join(directory, name), question_ids, exam_ids, indptr, indices, counts, idf)
+        np.save(os.path.join(directory, name, 'idf.npy'), idf)
+        manifest = {
+            'segments': [name],
+            'documents': len(question_ids),
+            'max_question_id': int(question_ids[-1]) if len(question_ids) else 0,
+            'built_at': timezone.now().isoformat(),
+            'updated_at': timezone.now().isoformat(),
+        }
+        _write_manifest(directory, manifest)
+        return manifest
+
+
+def add_to_index(rows, directory, updated_at=None):
+    """
+    Appends a segment with the given rows (new or edited questions, in
+    ascending id order) to the index in `directory`, using the idf of the
+    last full build. Returns the manifest, or None when there is no index.
+    """
+    with _build_lock(directory):
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            return None
+        question_ids, exam_ids, indptr, indices, counts = _collect(rows)
+        if not len(question_ids):
+            return manifest
+        idf = np.load(os.path.join(directory, manifest['segments'][0], 'idf.npy'), mmap_mode='r')
+        name = f'delta-{time.time_ns()}'
+        _write_segment(os.path.join(directory, name), question_ids, exam_ids, indptr, indices, counts, idf)
+        manifest = dict(
+            manifest,
+            segments=manifest['segments'] + [name],
+            max_question_id=max(manifest['max_question_id'], int(question_ids[-1])),
+            updated_at=(updated_at or timezone.now()).isoformat(),
+        )
+        _write_manifest(directory, manifest)
+        return manifest
+
+
+# ---------------------------------
+# BUILDING FROM THE DATABASE
+# ---------------------------------
+def _indexed_questions():
+    # Assembled exams only hold copies of bank questions
+    return Question.objects.filter(exam__blueprint__isnull=True)
+
+
+def _question_rows(questions):
+    """(question id, exam id, text, option texts) for a queryset, in batches."""
+    questions = questions.order_by('id').values_list('id', 'exam_id', 'question_text')
+    last_id = 0
+    while True:
+        batch = list(questions.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return
+        options = {}
+        for question_id, text in Answer.objects.filter(
+            question_id__in=[row[0] for row in batch]
+        ).order_by('order', 'id').values_list('question_id', 'answer_text'):
+            options.setdefault(question_id, []).append(text)
+        for question_id, exam_id, text in batch:
+            yield question_id, exam_id, text, options.get(question_id, ())
+        last_id = batch[-1][0]
+
+
+def build_similarity_index(incremental=False, directory=None):
+    """
+    Indexes every bank question, or with `incremental` only those added or
+    edited since the last build. Returns (questions indexed, manifest).
+    """
+    directory = directory or settings.QUIZ_SIMILARITY_DIR
+    manifest = _read_manifest(directory)
+    if incremental and manifest and len(manifest['segments']) < MAX_SEGMENTS:
+        started = timezone.now()
+        changed = _indexed_questions().filter(id__gt=manifest['max_question_id']).values_list('id', flat=True)
+        edited = QuestionSearchDocument.objects.filter(
+            updated_at__gt=manifest['updated_at']
+        ).values_list('question_id', flat=True)
+        ids = set(changed) | set(edited)
+        if not ids:
+            return 0, manifest
+        rows = list(_question_rows(_indexed_questions().filter(id__in=ids)))
+        # Stamped with the start, so edits made meanwhile are picked up next time
+        manifest = add_to_index(rows, directory, updated_at=started)
+        return len(rows), manifest
+    manifest = write_index(_question_rows(_indexed_questions()), directory)
+    return manifest['documents'], manifest
+
+
+# ---------------------------------
+# READING
+# ---------------------------------
+class _Segment:
+    def __init__(self, path):
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+        self.hidden = None  # rows superseded by a newer segment
+
+    def row_of(self, question_id):
+        row = int(np.searchsorted(self.question_ids, question_id))
+        if row < len(self.question_ids) and self.question_ids[row] == question_id:
+            if self.hidden is None or not self.hidden[row]:
+                return row
+        return None
+
+    def scores(self, indices, weights):
+        """Candidate rows and their dot products with a query vector."""
+        if not len(self.terms):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        positions = np.searchsorted(self.terms, indices)
+        positions = np.minimum(positions, len(self.terms) - 1)
+        found = self.terms[positions] == indices
+        rows, values = [], []
+        for position, weight in zip(positions[found], weights[found]):
+            start, end = self.postings_ptr[position], self.postings_ptr[position + 1]
+            rows.append(self.postings_rows[start:end])
+            values.append(self.postings_data[start:end] * weight)
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        rows, values = np.concatenate(rows), np.concatenate(values)
+        if len(rows) * 8 > len(self.question_ids):
+            totals = np.bincount(rows, values, minlength=len(self.question_ids))
+            candidates = np.flatnonzero(totals)
+            totals = totals[candidates]
+        else:
+            candidates, inverse = np.unique(rows, return_inverse=True)
+            totals = np.bincount(inverse, values)
+        if self.hidden is not None:
+            visible = ~self.hidden[candidates]
+            candidates, totals = candidates[visible], totals[visible]
+        return candidates, totals
+
+    def dot(self, rows, indices, weights):
+        """Exact dot products of rows with a query vector sorted by feature."""
+        starts = np.asarray(self.indptr[rows])
+        lengths = np.asarray(self.indptr[rows + 1]) - starts
+        # Positions of every stored entry of the rows, row after row
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        row_features = self.indices[offsets]
+        positions = np.minimum(np.searchsorted(indices, row_features), len(indices) - 1)
+        products = np.where(indices[positions] == row_features, self.data[offsets] * weights[positions], 0)
+        return np.bincount(np.repeat(np.arange(len(rows)), lengths), products, minlength=len(rows))
+
+
+class SimilarityIndex:
+    """The segments of one manifest, memory-mapped."""
+
+    def __init__(self, directory, manifest):
+        self.manifest = manifest
+        self.segments = [_Segment(os.path.join(directory, name)) for name in manifest['segments']]
+        self.idf = np.load(os.path.join(directory, manifest['segments'][0], 'idf.npy'), mmap_mode='r')
+        # idf falls as df grows: common features are those below this idf
+        common_df = max(MAX_QUERY_DF * manifest['documents'], MIN_SKIPPED_DF)
+        self.common_idf = _idf(np.array(common_df), manifest['documents'])
+        for position, segment in enumerate(self.segments[:-1]):
+            newer = np.concatenate([later.question_ids for later in self.segments[position + 1:]])
+            hidden = np.isin(segment.question_ids, newer)
+            segment.hidden = hidden if hidden.any() else None
+
+    @classmethod
+    def open(cls, directory):
+        manifest = _read_manifest(directory)
+        return cls(directory, manifest) if manifest else None
+
+    def locate(self, question_id):
+        """(segment, row) holding the current vector of a question, or None."""
+        for segment in reversed(self.segments):
+            row = segment.row_of(question_id)
+            if row is not None:
+                return segment, row
+        return None
+
+    def vector_of(self, question_id):
+        """The stored (indices, weights) of an indexed question, or None."""
+        found = self.locate(question_id)
+        if found is None:
+            return None
+        segment, row = found
+        start, end = segment.indptr[row], segment.indptr[row + 1]
+        return np.asarray(segment.indices[start:end], dtype=np.int64), np.asarray(segment.data[start:end])
+
+    def vectorize(self, question_text, option_texts=()):
+        return _query_vector(features(question_text, option_texts), self.idf)
+
+    def search(self, vector, k=10, exclude=()):
+        """Top k (question id, exam id, cosine) for a vector, best first."""
+        indices, weights = vector
+        if not len(indices):
+            return []
+        order = np.argsort(indices)
+        indices, weights = indices[order], weights[order]
+        idf = self.idf[indices]
+        rare = idf >= self.common_idf
+        if rare.sum() < MIN_QUERY_FEATURES:
+            rare[np.argsort(-idf)[:MIN_QUERY_FEATURES]] = True
+        found = []
+        for segment in self.segments:
+            rows, scores = segment.scores(indices[rare], weights[rare])
+            if len(rows) > RESCORED:
+                rows = rows[np.argpartition(-scores, RESCORED)[:RESCORED]]
+            scores = segment.dot(rows, indices, weights)
+            if len(rows) > k + len(exclude):
+                top = np.argpartition(-scores, k + len(exclude))[:k + len(exclude)]
+                rows, scores = rows[top], scores[top]
+            found += zip(segment.question_ids[rows].tolist(), segment.exam_ids[rows].tolist(), scores.tolist())
+        found = [hit for hit in found if hit[0] not in exclude]
+        found.sort(key=lambda hit: -hit[2])
+        return found[:k]
+
+
+_opened = {}
+
+
+def get_index(directory=None):
+    """The current index, reopened when the manifest changes; None if never built."""
+    directory = directory or settings.QUIZ_SIMILARITY_DIR
+    try:
+        version = os.stat(os.path.join(directory, MANIFEST)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _opened.get(directory)
+    if cached is None or cached[0] != version:
+        cached = (version, SimilarityIndex.open(directory))
+        _opened[directory] = cached
+    return cached[1]
+
+
+# ---------------------------------
+# QUERIES
+# ---------------------------------
+def similar_questions(question_id, k=10, index=None):
+    """
+    [(question id, exam id, cosine)] of the questions most like one
+    question, itself excluded. Questions not indexed yet are vectorized
+    from the database. None when there is no index.
+    """
+    index = index or get_index()
+    if index is None:
+        return None
+    vector = index.vector_of(question_id)
+    if vector is None:
+        question = Question.objects.filter(pk=question_id).values_list('question_text', flat=True).first()
+        if question is None:
+            return []
+        options = Answer.objects.filter(question_id=question_id).values_list('answer_text', flat=True)
+        vector = index.vectorize(question, list(options))
+    return index.search(vector, k, exclude={question_id})
+
+
+def find_duplicates(question_ids, threshold=0.9, k=5, index=None):
+    """
+    Yields (question id, other question id, cosine) for near-duplicates of
+    the given questions in other exams, most similar first per question.
+    """
+    index = index or get_index()
+    if index is None:
+        return
+    for question_id in question_ids:
+        found = index.locate(question_id)
+        if found is None:
+            continue
+        segment, row = found
+        own_exam = int(segment.exam_ids[row])
+        vector = index.vector_of(question_id)
+        for other_id, exam_id, score in index.search(vector, k, exclude={question_id}):
+            if score >= threshold and exam_id != own_exam:
+                yield question_id, other_id, score
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api import ExamViewSet, CategoryViewSet, SubCategoryViewSet, submit_contact_message, list_contact_messages, update_contact_message_status, delete_contact_message
+from .api import ExamViewSet, CategoryViewSet, SubCategoryViewSet, submit_contact_message, list_contact_messages, update_contact_message_status, delete_contact_message, export_data, cache_stats, search_questions, question_bank, practice_set, assemble_mock_exam, similar_questions
 from .views_auth import RegisterAPI, CustomLoginAPI, UserProfileAPI, PasswordResetRequestAPI, PasswordResetConfirmAPI
 
 router = DefaultRouter()
@@ -10,6 +10,10 @@ router.register(r'exams', ExamViewSet, basename='exam')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('questions/', question_bank, name='question_bank'),
+    path('questions/search/', search_questions, name='search_questions'),
+    path('questions/<int:question_id>/similar/', similar_questions, name='similar_questions'),
+    path('practice/', practice_set, name='practice_set'),
     path('auth/register/', RegisterAPI.as_view(), name='register'),
     path('auth/login/', CustomLoginAPI.as_view(), name='login'),
     path('auth/user/', UserProfileAPI.as_view(), name='user_profile'),
@@ -21,4 +25,13 @@ urlpatterns = [
     path('admin/contact-messages/', list_contact_messages, name='list_contact_messages'),
     path('admin/contact-messages/<int:message_id>/status/', update_contact_message_status, name='update_message_status'),
     path('admin/contact-messages/<int:message_id>/', delete_contact_message, name='delete_message'),
+
+    # Streaming exports (admin)
+    path('admin/exports/<str:kind>/', export_data, name='export_data'),
+
+    # Mock papers from the question bank (admin)
+    path('admin/exams/assemble/', assemble_mock_exam, name='assemble_mock_exam'),
+
+    # Response cache counters (admin)
+    path('admin/cache-stats/', cache_stats, name='cache_stats'),
 ]
@@ -0,0 +1,185 @@
+"""
+Per-user dashboard aggregates (UserStats), updated from grading.submit_attempt.
+
+A registered user keeps one result per exam, so a retake replaces the old
+result: record_result() takes back the previous percentage and adds the new
+one instead of re-aggregating the user's history. `rebuild_user_stats`
+recomputes rows from UserExamResult and, with --check, reports rows that
+drifted (for example after results were deleted in the admin).
+"""
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Exam, UserExamResult, UserStats
+
+RECENT_SIZE = 7
+PASS_PERCENTAGE = 50
+REGRADE_BATCH = 1000
+
+
+def _passed(percentage):
+    return 1 if percentage >= PASS_PERCENTAGE else 0
+
+
+def _recent_entry(result_id, exam_title, category, percentage, completed_at):
+    return {
+        'result_id': result_id,
+        'exam_title': exam_title,
+        'category': category,
+        'percentage': percentage,
+        'date': completed_at.isoformat(),
+    }
+
+
+# ---------------------------------
+# INCREMENTAL UPDATES
+# ---------------------------------
+def apply_result(stats, result, previous, exam_title, category):
+    """
+    Folds a saved result into `stats` in memory. `previous` is the result as
+    it was before this submission, None for a new result.
+    """
+    categories = stats.categories
+    replaced_in_category = previous is not None and category in categories
+    if previous is None:
+        stats.total_tests += 1
+    else:
+        stats.percentage_sum -= previous.percentage
+        stats.tests_passed -= _passed(previous.percentage)
+    if replaced_in_category:
+        categories[category][0] -= previous.percentage
+
+    stats.percentage_sum = round(stats.percentage_sum + result.percentage, 2)
+    stats.tests_passed += _passed(result.percentage)
+    if category:
+        entry = categories.setdefault(category, [0, 0])
+        entry[0] = round(entry[0] + result.percentage, 2)
+        if not replaced_in_category:
+            entry[1] += 1
+
+    # Ring buffer of recent attempts: a retake moves its result to the front
+    recent = [item for item in stats.recent if item['result_id'] != result.id]
+    recent.insert(0, _recent_entry(result.id, exam_title, category, result.percentage, result.completed_at))
+    stats.recent = recent[:RECENT_SIZE]
+
+
+def record_result(result, previous=None):
+    """Updates the user's stats for a result saved in the current transaction."""
+    if not result.user_id:
+        return
+    stats = UserStats.objects.select_for_update().filter(user_id=result.user_id).first()
+    if stats is None:
+        # First write for this user: start from their whole history, which
+        # already includes `result`
+        try:
+            with transaction.atomic():
+                compute_user_stats(result.user_id).save()
+            return
+        except IntegrityError:
+            stats = UserStats.objects.select_for_update().get(user_id=result.user_id)
+
+    exam_title, category = Exam.objects.filter(pk=result.exam_id).values_list(
+        'title', 'subcategory__category__name'
+    ).get()
+    apply_result(stats, result, previous, exam_title, category)
+    stats.save()
+
+
+def apply_regrades(exam_id, changes):
+    """
+    Moves rescored results of one exam in their users' rows:
+    {user_id: [(result_id, old percentage, new percentage)]}. Completion
+    order is unchanged, so recent entries keep their place. Users without a
+    row are skipped; theirs is computed from their results on first read.
+    """
+    category = Exam.objects.filter(pk=exam_id).values_list('subcategory__category__name', flat=True).first()
+    user_ids = list(changes)
+    for start in range(0, len(user_ids), REGRADE_BATCH):
+        rows = UserStats.objects.select_for_update().in_bulk(user_ids[start:start + REGRADE_BATCH], field_name='user_id')
+        for user_id, stats in rows.items():
+            for result_id, old, new in changes[user_id]:
+                stats.percentage_sum = round(stats.percentage_sum - old + new, 2)
+                stats.tests_passed += _passed(new) - _passed(old)
+                if category in stats.categories:
+                    entry = stats.categories[category]
+                    entry[0] = round(entry[0] - old + new, 2)
+                for item in stats.recent:
+                    if item['result_id'] == result_id:
+                        item['percentage'] = new
+        _write_rows(rows.values())
+
+
+def _write_rows(rows):
+    # One statement run per row: bulk_update's CASE per column grows with the batch
+    fields = [UserStats._meta.get_field(name) for name in ('percentage_sum', 'tests_passed', 'categories', 'recent')]
+    now = timezone.now()
+    params = [
+        [field.get_db_prep_save(getattr(stats, field.attname), connection) for field in fields] + [now, stats.pk]
+        for stats in rows
+    ]
+    assignments = ', '.join(f'{field.column} = %s' for field in fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(f'UPDATE {UserStats._meta.db_table} SET {assignments}, updated_at = %s WHERE id = %s', params)
+
+
+# ---------------------------------
+# REBUILD / CHECK
+# ---------------------------------
+def compute_user_stats(user_id):
+    """An unsaved UserStats computed from the user's results (one query)."""
+    stats = UserStats(user_id=user_id)
+    rows = UserExamResult.objects.filter(user_id=user_id).order_by('-completed_at', '-id').values_list(
+        'id', 'exam__title', 'exam__subcategory__category__name', 'percentage', 'completed_at'
+    )
+    for result_id, exam_title, category, percentage, completed_at in rows:
+        stats.total_tests += 1
+        stats.percentage_sum += percentage
+        stats.tests_passed += _passed(percentage)
+        if category:
+            entry = stats.categories.setdefault(category, [0, 0])
+            entry[0] += percentage
+            entry[1] += 1
+        if len(stats.recent) < RECENT_SIZE:
+            stats.recent.append(_recent_entry(result_id, exam_title, category, percentage, completed_at))
+
+    stats.percentage_sum = round(stats.percentage_sum, 2)
+    for entry in stats.categories.values():
+        entry[0] = round(entry[0], 2)
+    return stats
+
+
+def stats_differ(stored, expected):
+    """Names of the fields where a stored row disagrees with a recomputed one."""
+    fields = []
+    for name in ('total_tests', 'tests_passed'):
+        if getattr(stored, name) != getattr(expected, name):
+            fields.append(name)
+    if abs(stored.percentage_sum - expected.percentage_sum) > 0.01:
+        fields.append('percentage_sum')
+    if stored.categories.keys() != expected.categories.keys() or any(
+        abs(stored.categories[name][0] - total) > 0.01 or stored.categories[name][1] != count
+        for name, (total, count) in expected.categories.items()
+    ):
+        fields.append('categories')
+    if [(item['result_id'], item['percentage']) for item in stored.recent] != [
+        (item['result_id'], item['percentage']) for item in expected.recent
+    ]:
+        fields.append('recent')
+    return fields
+
+
+def get_user_stats(user):
+    """
+    The user's stats row. Users who have not submitted since UserStats was
+    introduced get theirs computed and saved on first read.
+    """
+    stats = UserStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = compute_user_stats(user.id)
+        if stats.total_tests:
+            try:
+                with transaction.atomic():
+                    stats.save()
+            except IntegrityError:
+                stats = UserStats.objects.get(user=user)
+    return stats
@@ -21,14 +21,18 @@ export default function AdminContactMessagesPage() {
     const [loading, setLoading] = useState(true)
     const [filter, setFilter] = useState<"all" | "unread" | "read">("all")
     const [selectedMessage, setSelectedMessage] = useState<ContactMessage | null>(null)
+    const [nextCursor, setNextCursor] = useState<string | null>(null)
+    const [loadingMore, setLoadingMore] = useState(false)
 
     useEffect(() => {
         fetchMessages()
     }, [])
 
-    const fetchMessages = async () => {
+    // Pages are keyset paginated: `next` carries the cursor of the following page
+    const fetchMessages = async (cursor: string | null = null) => {
         try {
-            const res = await apiClient.get('/admin/contact-messages/')
+            const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+            const res = await apiClient.get(`/admin/contact-messages/${query}`)
 
             if (res.status === 403 || res.status === 401) {
                 alert('You do not have permission to access this page.')
@@ -38,15 +42,24 @@ export default function AdminContactMessagesPage() {
 
             if (res.ok) {
                 const data = await res.json()
-                setMessages(data)
+                const page: ContactMessage[] = data.results || data
+                setMessages(prev => cursor ? [...prev, ...page] : page)
+                setNextCursor(data.next ? new URL(data.next).searchParams.get('cursor') : null)
             }
         } catch (error) {
             console.error('Error fetching messages:', error)
         } finally {
             setLoading(false)
+            setLoadingMore(false)
         }
     }
 
+    const loadMore = () => {
+        if (!nextCursor) return
+        setLoadingMore(true)
+        fetchMessages(nextCursor)
+    }
+
     const updateMessageStatus = async (messageId: number, newStatus: "read" | "unread") => {
         try {
             const token = localStorage.getItem('token')
@@ -226,6 +239,18 @@ export default function AdminContactMessagesPage() {
                         </div>
                     </div>
                 )}
+
+                {nextCursor && (
+                    <div className="mt-6 text-center">
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="px-4 py-2 rounded-lg font-medium bg-white dark:bg-slate-800 text-slate-700 dark:text-slate-300 hover:bg-slate-100 dark:hover:bg-slate-700 disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </div>
 
             {/* Message Detail Modal */}
@@ -43,7 +43,8 @@ export default function LeaderboardPage() {
             setLoading(true)
             const examId = selectedExam === "" ? undefined : selectedExam
             const res = await examApi.getLeaderboard(examId)
-            setLeaderboard(res.data)
+            // Both leaderboards are paginated ({ results, next, me }); the array branch covers older backends
+            setLeaderboard(Array.isArray(res.data) ? res.data : res.data.results)
         } catch (err) {
             console.error("Failed to fetch leaderboard", err)
         } finally {
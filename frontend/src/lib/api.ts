@@ -64,8 +64,10 @@ export const examApi = {
   // Get details (questions) for a specific exam
   get: (id: string) => api.get(`/exams/${id}/`),
 
-  // Get questions for the "Taking Interface"
-  getQuestions: (id: string) => api.get(`/exams/${id}/questions/`),
+  // Get questions for the "Taking Interface" (shuffled per session)
+  getQuestions: (id: string) => api.get(`/exams/${id}/questions/`, {
+    params: { session_id: getSessionId() }
+  }),
 
   // Submit a single answer (Background Auto-save)
   submitAnswer: (examId: string, questionId: number, answerId: number) => {